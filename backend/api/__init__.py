@@ -1,2 +1,6 @@
-from api.ai import ai
-from api.read import read
+import os
+from dotenv import load_dotenv
+
+# Load backend/.env once, before any api module reads its settings
+dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.env"))
+load_dotenv(dotenv_path)
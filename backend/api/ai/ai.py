@@ -1,31 +1,73 @@
 import os
+import time
+import asyncio
 import base64
-import anthropic
-from dotenv import load_dotenv
-import re
+import tempfile
+import hashlib
 import json
 from datetime import datetime, timezone
 import uuid
-from bson import Binary
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from PyPDF2 import PdfMerger
 
 
 # Add parent directory to path to import connectDB
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from connectDB import db
+from connectDB import db, storage
+from api.ai.output import OutputParser
+from api.ai.extract import prepare_documents, TEXT_EXTRACTION
+from api.uploads.uploads import SpooledUpload
+from api.documents.documents import store_document, delete_document
+from api.schema.schema import compact_application, store_transcript, full_analysis, load_transcript
+from api.cache.cache import response_cache, APPLICATIONS_TAG, QUEUE_TAG, USERS_TAG, lookup_analysis, store_analysis, forget_analysis
+from api.metrics.metrics import timed, observe, register, Gauge
 
-dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.env"))
-load_dotenv(dotenv_path)
 
+# The model client is built on first use (see get_client)
+client = None
+ANALYSIS_MODEL = "claude-sonnet-4-5-20250929"
 
-client = anthropic.Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
+# Cap on concurrent model analyses per process (AI_MAX_CONCURRENCY in .env).
+# Requests past the cap wait here without blocking the event loop.
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "32"))
+analysis_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+analyses_in_flight = register(Gauge("claimd_analyses_in_flight", "Model analyses running in this process."))
+analyses_waiting = register(Gauge("claimd_analyses_waiting", "Analyses waiting for a slot under AI_MAX_CONCURRENCY."))
+
+# PDF merging is CPU-bound, so it runs in a process pool (PDF_POOL_WORKERS in
+# .env, defaults to the CPU count) instead of on the event loop.
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", "0")) or None
+pdf_pool = None
+pdf_pool_tasks = register(Gauge("claimd_pdf_pool_tasks", "PDF merges and text extractions queued or running in the PDF pool."))
+
+
+def get_client():
+    """
+    The model client. The SDK takes about a second to import, so it is
+    imported here rather than when the backend starts.
+    """
+    global client
+    if client is None:
+        import anthropic
+        client = anthropic.AsyncAnthropic(api_key=os.getenv("CLAUDE_API_KEY"))
+    return client
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    global pdf_pool
+    if pdf_pool is None:
+        pdf_pool = ProcessPoolExecutor(max_workers=PDF_POOL_WORKERS)
+    return pdf_pool
+
+
+def shutdown_pdf_pool():
+    global pdf_pool
+    if pdf_pool is not None:
+        pdf_pool.shutdown(wait=False, cancel_futures=True)
+        pdf_pool = None
 
 # Combine PDFs
 # form_data:
@@ -38,101 +80,39 @@ client = anthropic.Anthropic(api_key=os.getenv("CLAUDE_API_KEY"))
 # state
 # zipCode
 
-async def merge_pdfs(form_data: dict, document_list: list):
-    try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a365d'),
-            spaceAfter=30,
-            alignment=1
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#2d3748'),
-            spaceAfter=12,
-            spaceBefore=20
-        )
-        
-        # Title
-        story.append(Paragraph("SSDI Application Summary", title_style))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Application ID and Date
-        story.append(Paragraph(f"<b>Submission Date:</b> {datetime.now(timezone.utc).strftime('%B %d, %Y')}", styles['Normal']))
-        story.append(Spacer(1, 0.5*inch))
-        
-        # Personal Information Section
-        story.append(Paragraph("Personal Information", heading_style))
-        
-        personal_data = [
-            ["Full Name:", f"{form_data.get('firstName', '')} {form_data.get('lastName', '')}"],
-            ["Date of Birth:", form_data.get('dateOfBirth', 'N/A')],
-            ["Social Security Number:", form_data.get('socialSecurityNumber', 'N/A')],
-        ]
+def cover_fields(form_data: dict) -> dict:
+    """The cover page fields from a submitted form."""
+    return {"firstName":form_data["firstName"], 
+            "lastName":form_data["lastName"], 
+            "dateOfBirth":form_data["dateOfBirth"], 
+            "socialSecurityNumber":form_data["socialSecurityNumber"], 
+            "streetAddress":form_data["address"], 
+            "city":form_data["city"], 
+            "state":form_data["state"], 
+            "zipCode":form_data["zipCode"]}
 
-        personal_table = Table(personal_data, colWidths=[2*inch, 4*inch])
-        personal_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7fafc')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        
-        story.append(personal_table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Address
-                # Address Section
-        story.append(Paragraph("Address", heading_style))
-        
-        address_data = [
-            ["Street Address:", form_data.get('streetAddress', 'N/A')],
-            ["City:", form_data.get('city', 'N/A')],
-            ["State:", form_data.get('state', 'N/A')],
-            ["ZIP Code:", form_data.get('zipCode', 'N/A')],
-        ]
-        
-        address_table = Table(address_data, colWidths=[2*inch, 4*inch])
-        address_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7fafc')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        
-        story.append(address_table)
-        story.append(Spacer(1, 0.5*inch))
-        
-        # Document Information
-        story.append(Paragraph("Attached Documents", heading_style))
-        story.append(Paragraph(f"• Total Documents: {len(document_list)}", styles['Normal']))
-
-                # Build cover page PDF
-        doc.build(story)
-        buffer.seek(0)
-        cover_page_bytes = buffer.getvalue()
+
+async def merge_pdfs(form_data: dict, document_list: list, output_path: str = None):
+    """
+    Build the cover page and merge it with the uploaded PDFs in the PDF
+    process pool. Documents are bytes or paths of spooled uploads (paths are
+    opened by the pool process, so the bytes never cross the process
+    boundary). Returns the merged PDF bytes, or output_path once the merged
+    PDF has been written there.
+    """
+    loop = asyncio.get_running_loop()
+    with timed("pdf_merge"), pdf_pool_tasks.track():
+        return await loop.run_in_executor(get_pdf_pool(), merge_pdfs_sync, form_data, document_list, output_path)
+
+
+def merge_pdfs_sync(form_data: dict, document_list: list, output_path: str = None):
+    # reportlab and PyPDF2 are only needed here, in the pool processes
+    from PyPDF2 import PdfMerger
+    from api.ai.cover import get_cover_renderer
+
+    try:
+        # Cover page from the per-process renderer (styles and layout are built once)
+        cover_page_bytes = get_cover_renderer().render(form_data, len(document_list))
         
         # Merge all PDFs
         merger = PdfMerger()
@@ -141,8 +121,14 @@ async def merge_pdfs(form_data: dict, document_list: list):
         merger.append(BytesIO(cover_page_bytes))
         
         # Add all documents from the list
-        for doc_bytes in document_list:
-            merger.append(BytesIO(doc_bytes))
+        for document in document_list:
+            merger.append(document if isinstance(document, str) else BytesIO(document))
+        
+        if output_path:
+            with open(output_path, "wb") as output_file:
+                merger.write(output_file)
+            merger.close()
+            return output_path
         
         # Write to output buffer
         output_buffer = BytesIO()
@@ -161,287 +147,634 @@ async def merge_pdfs(form_data: dict, document_list: list):
 # --------------------------------------------------------
 # Load prompt.md content
 # --------------------------------------------------------
+PROMPT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../prompt.md"))
+FALLBACK_PROMPT = "You are an AI that analyzes medical and income records for SSDI eligibility."
+
+# Mark the prompt as a cacheable prefix so repeated analyses reuse the
+# provider-side prompt cache (PROMPT_CACHE=false to send it uncached)
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "true").lower() != "false"
+
+# prompt.md as last read, keyed by its modification time
+_prompt = {"mtime": None, "text": None, "version": None}
+
+
 def load_prompt() -> str:
-    prompt_path = os.path.join(os.path.dirname(__file__), "../../prompt.md")
+    """
+    Return prompt.md, read from disk only the first time and again whenever
+    the file's modification time changes.
+    """
     try:
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            return f.read()
+        mtime = os.stat(PROMPT_PATH).st_mtime_ns
+        if mtime != _prompt["mtime"]:
+            with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+                text = f.read()
+            _prompt.update(mtime=mtime, text=text, version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16])
+            print(f"✅ Loaded prompt.md (version {_prompt['version']})")
+        return _prompt["text"]
     except Exception as e:
         print(f"⚠️ Could not load prompt.md: {e}")
-        return "You are an AI that analyzes medical and income records for SSDI eligibility."
+        return FALLBACK_PROMPT
+
+
+def prompt_version() -> str:
+    """Short content hash of the current prompt"""
+    text = load_prompt()
+    if text is FALLBACK_PROMPT:
+        return "fallback"
+    return _prompt["version"]
+
 
 # --------------------------------------------------------
-# Store documents in MongoDB GridFS or as Binary
+# Store documents in MongoDB GridFS
 # --------------------------------------------------------
 async def store_documents_in_db(combinedDocument, combinedDocumentName):
     """
-    Store PDF documents in MongoDB and return document references
+    Store the combined PDF in GridFS and return the document reference.
+    combinedDocument is the PDF bytes or the path of a merged file on disk,
+    which is streamed into GridFS and then removed.
     """
     
     try:
-        document = ""
-        print("MADE IT HERE")
-        print(document)
-        
-        medical_doc = {
-            "filename": combinedDocumentName,
-            "content_type": "application/pdf",
-            "data": Binary(combinedDocument),
-            "uploaded_at": datetime.now(timezone.utc),
-            "document_type": "medical_records"
-        }
-        combined_result = await db.documents.insert_one(medical_doc)
+        with timed("document_store"):
+            if isinstance(combinedDocument, str):
+                length = os.path.getsize(combinedDocument)
+                with open(combinedDocument, "rb") as combined_file:
+                    document_id = await store_document(combined_file, combinedDocumentName, "combined_document")
+            else:
+                length = len(combinedDocument)
+                document_id = await store_document(combinedDocument, combinedDocumentName, "combined_document")
         document = {
-            "document_id": str(combined_result.inserted_id),
+            "document_id": document_id,
             "filename": combinedDocumentName,
-            "document_type": "combined_document"
+            "document_type": "combined_document",
+            "storage": "gridfs",
+            "length": length
         }
-        print("MADE IT HERE")
-        print(document)
+        print(f"✅ Stored document {document_id} in GridFS ({length} bytes)")
         return document
     
     except Exception as e:
         print(f"❌ Error storing documents: {e}")
         return ""
+    finally:
+        if isinstance(combinedDocument, str):
+            try:
+                os.unlink(combinedDocument)
+            except OSError:
+                pass
 
 # --------------------------------------------------------
 # Save application to MongoDB
 # --------------------------------------------------------
-async def save_application_to_db(json_result, document, raw_response):
+async def save_application_to_db(json_result, document, raw_response, session=None, preprocessing=None, fields=None):
     """
-    Save the SSDI application analysis to MongoDB with required fields
+    Save the SSDI application analysis and its compressed transcript.
+    `fields` are extra top-level fields of the application document (e.g.
+    the backlog packet_id). Returns the new application_id; errors are
+    raised to the caller so the surrounding transaction can abort.
     """
-    try:
-        # Generate unique application ID
-        application_id = str(uuid.uuid4())
-        
-        # Prepare the document to insert
-        application_doc = {
-            "application_id": application_id,
-            "documents": document,
-            "claude_confidence_level": json_result.get("confidence_level", 0),
-            "claude_summary": json_result.get("summary", ""),
-            "final_decision": json_result.get("recommendation", "UNKNOWN"),
-            "human_final": False,
-            
-            # Additional useful fields from the analysis
-            "personal_information": json_result.get("personal_information", {}),
-            "assessment_type": json_result.get("assessment_type", ""),
-            "assessment_date": json_result.get("assessment_date", ""),
-            "phase_1_current_work": json_result.get("phase_1_current_work", {}),
-            "phase_2_medical_severity": json_result.get("phase_2_medical_severity", {}),
-            "phase_3_listings": json_result.get("phase_3_listings", {}),
-            "phase_4_rfc": json_result.get("phase_4_rfc", {}),
-            "phase_5_vocational": json_result.get("phase_5_vocational", {}),
-            "overall_assessment": json_result.get("overall_assessment", {}),
-            "next_steps": json_result.get("next_steps", {}),
-            "evidence_summary": json_result.get("evidence_summary", {}),
-            
-            # Metadata
-            "created_at": datetime.now(timezone.utc),
-            "raw_claude_response": raw_response,
-            "full_analysis": json_result
-        }
-        
-        # Insert into MongoDB
-        result = await db.applications.insert_one(application_doc)
-        
-        print(f"✅ Application saved to MongoDB with ID: {application_id}")
-        print(f"   MongoDB _id: {result}")
-        
-        return application_id
-        
-    except Exception as e:
-        print(f"❌ Error saving application to MongoDB: {e}")
-        return None
+    # Generate unique application ID
+    application_id = str(uuid.uuid4())
+    
+    # One canonical copy of the analysis; the raw model output goes to
+    # the application_transcripts collection, compressed
+    application_doc = compact_application(
+        application_id,
+        json_result,
+        document,
+        datetime.now(timezone.utc),
+        preprocessing
+    )
+    if fields:
+        application_doc.update(fields)
+    
+    with timed("application_save"):
+        if session is None:
+            await asyncio.gather(
+                db.applications.insert_one(application_doc),
+                store_transcript(application_id, raw_response)
+            )
+        else:
+            # Operations inside one transaction have to run one after another
+            await db.applications.insert_one(application_doc, session=session)
+            await store_transcript(application_id, raw_response, session=session)
+    
+    print(f"✅ Application saved to MongoDB with ID: {application_id}")
+    return application_id
 
 # SAVE USER TO MONGO
 # --------------------------------------------------------
 # Create or update a user tied to an application
 # --------------------------------------------------------
-async def save_or_update_user(name: str, socialSecurityNumber: str, application_id: str):
+async def save_or_update_user(name: str, socialSecurityNumber: str, application_id: str, session=None):
     """
     Creates a new user if not found, otherwise appends the new application_id
-    to their list of applications.
+    to their list of applications. A single atomic upsert, so two submissions
+    for the same SSN can never create two users (backed by the unique
+    socialSecurityNumber index).
     """
+    new_user_id = str(uuid.uuid4())
+    
+    with timed("user_upsert"):
+        for attempt in range(2):
+            try:
+                existing_user = await db.users.find_one_and_update(
+                    {"socialSecurityNumber": socialSecurityNumber},
+                    {
+                        "$addToSet": {"applications": application_id},  # prevents duplicates
+                        "$setOnInsert": {
+                            "user_id": new_user_id,
+                            "name": name,
+                            "created_at": datetime.now(timezone.utc)
+                        }
+                    },
+                    projection={"user_id": 1, "name": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE,
+                    session=session
+                )
+                break
+            except DuplicateKeyError:
+                # A concurrent upsert inserted the user first; the retry updates it
+                if attempt == 1 or session is not None:
+                    raise
+    
+    if existing_user:
+        print(f"✅ Updated existing user: {existing_user['name']} with application {application_id}")
+        return {
+            "success": True,
+            "user_id": existing_user["user_id"],
+            "updated": True
+        }
+    
+    print(f"👤 Created new user {new_user_id} with application {application_id}")
+    return {
+        "success": True,
+        "user_id": new_user_id,
+        "updated": False
+    }
+
+# --------------------------------------------------------
+# Persist a completed analysis
+# --------------------------------------------------------
+# None until the first attempt shows whether the deployment has transactions
+transactions_supported = None
+
+
+async def persist_application(json_result, document, raw_response, name: str, socialSecurityNumber: str, preprocessing=None, fields=None):
+    """
+    Write the application, its transcript and the user link together. On a
+    replica set (Atlas) this is one transaction; on a standalone mongod,
+    which has no transactions, the writes run back to back and the user is
+    linked last. Returns (application_id, user_result).
+    """
+    global transactions_supported
+    
+    async def write(session=None):
+        application_id = await save_application_to_db(json_result, document, raw_response, session=session, preprocessing=preprocessing, fields=fields)
+        user = await save_or_update_user(name, socialSecurityNumber, application_id, session=session)
+        return application_id, user
+    
+    result = None
+    if transactions_supported is not False and storage.supports_transactions:
+        try:
+            async with await db.client.start_session() as session:
+                result = await session.with_transaction(write)
+        except OperationFailure as e:
+            # IllegalOperation: transactions need a replica set or mongos
+            if e.code != 20:
+                raise
+            transactions_supported = False
+            print("⚠️ MongoDB does not support transactions here; writing without one")
+    
+    if result is None:
+        result = await write()
+    
+    # A new application shows up in the lists, the queue and the user counts
+    response_cache.invalidate(APPLICATIONS_TAG, QUEUE_TAG, USERS_TAG)
+    return result
+
+
+# --------------------------------------------------------
+# Progress reporting
+# --------------------------------------------------------
+PHASES = [
+    "phase_1_current_work",
+    "phase_2_medical_severity",
+    "phase_3_listings",
+    "phase_4_rfc",
+    "phase_5_vocational",
+]
+
+
+def report_progress(progress, stage: str, **data):
+    """Call the optional progress callback; a failing listener never fails the analysis."""
+    if progress is None:
+        return
     try:
-        # Check if user already exists by SSN
-        print(f"🔍 Looking for user with SSN: {socialSecurityNumber}, name: {name}")
-        existing_user = await db.users.find_one({"socialSecurityNumber": socialSecurityNumber})
-
-        if existing_user:
-            # Append new application_id if not already in list
-            await db.users.update_one(
-                {"socialSecurityNumber": socialSecurityNumber},
-                {"$addToSet": {"applications": application_id}}  # prevents duplicates
-            )
-            print(f"✅ Updated existing user: {existing_user['name']} ({socialSecurityNumber}) with application {application_id}")
-            return {
-                "success": True,
-                "user_id": existing_user["user_id"],
-                "updated": True
+        progress(stage, data)
+    except Exception as e:
+        print(f"⚠️ Progress listener failed on {stage}: {e}")
+
+
+class PhaseProgress:
+    """
+    Reports each analysis phase as complete once the output moves on to the
+    next top-level key (or ends).
+    """
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.current = None
+
+    def on_key(self, name: str):
+        self.finish()
+        self.current = name
+
+    def finish(self):
+        if self.current in PHASES:
+            report_progress(self.progress, "phase_completed", phase=self.current, number=PHASES.index(self.current) + 1)
+        self.current = None
+
+
+# --------------------------------------------------------
+# Stream the model analysis through the async client
+# --------------------------------------------------------
+def analysis_request(prompt: str, documents: list, cache_prompt: bool = PROMPT_CACHE) -> dict:
+    """
+    The Messages API parameters for one analysis: the prompt followed by the
+    documents (content blocks, or (media_type, base64_data) pairs for whole
+    PDFs). Shared by run_analysis and the batch backlog ingestion.
+    """
+    prompt_block = {"type": "text", "text": prompt}
+    if cache_prompt:
+        # The instructions are identical for every analysis; only the
+        # documents after them change
+        prompt_block["cache_control"] = {"type": "ephemeral"}
+    
+    content = [prompt_block]
+    for document in documents:
+        if isinstance(document, dict):
+            content.append(document)
+            continue
+        media_type, data = document
+        content.append({
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": data
+            }
+        })
+    
+    return {
+        "model": ANALYSIS_MODEL,
+        "max_tokens": 8000,
+        "messages": [
+            {
+                "role": "user",
+                "content": content
             }
+        ]
+    }
+
+
+async def run_analysis(prompt: str, documents: list, progress=None, cache_prompt: bool = PROMPT_CACHE) -> OutputParser:
+    """
+    Send the prompt plus documents (content blocks, or (media_type,
+    base64_data) pairs for whole PDFs) to the model and
+    follow the streamed response with an OutputParser, which is returned. The
+    stream is closed as soon as the output is complete or can no longer be
+    valid. At most AI_MAX_CONCURRENCY analyses run at once; the rest wait on
+    the semaphore. `progress(stage, data)` is told when the analysis starts,
+    when the first tokens arrive and as each phase of the assessment completes.
+    """
+    phases = PhaseProgress(progress)
+    parser = OutputParser(on_key=phases.on_key if progress is not None else None)
+    
+    if analysis_semaphore.locked():
+        report_progress(progress, "analysis_queued")
+    with timed("analysis_queue"), analyses_waiting.track():
+        await analysis_semaphore.acquire()
+    try:
+        with timed("model_total"), analyses_in_flight.track():
+            report_progress(progress, "analysis_started")
+            start = time.perf_counter()
+            async with get_client().messages.stream(**analysis_request(prompt, documents, cache_prompt)) as stream:
+                async for text in stream.text_stream:
+                    if not parser.chunks:
+                        observe("model_ttft", time.perf_counter() - start)
+                        report_progress(progress, "first_tokens")
+                    if parser.feed(text):
+                        # Leaving the context manager closes the response stream
+                        break
+    finally:
+        analysis_semaphore.release()
+    
+    if parser.state != "invalid":
+        phases.finish()
+    return parser
+
+
+# --------------------------------------------------------
+# Reusing analyses of identical submissions
+# --------------------------------------------------------
+# Submissions being analyzed in this process, by analysis key
+_inflight = {}
+
+
+def buffer_digest(upload: SpooledUpload) -> str:
+    view = upload.buffer()
+    try:
+        return hashlib.sha256(view).hexdigest()
+    finally:
+        view.release()
 
+
+def encode_document(upload: SpooledUpload) -> str:
+    """Base64 text of an upload, encoded straight from its buffer."""
+    view = upload.buffer()
+    try:
+        with timed("base64_encode"):
+            return base64.standard_b64encode(view).decode("ascii")
+    finally:
+        view.release()
+
+
+def normalize_form(form_data: dict) -> dict:
+    """Form fields with case and whitespace differences removed; SSN and ZIP as digits only."""
+    normalized = {}
+    for field, value in form_data.items():
+        value = " ".join(str(value or "").split()).upper()
+        if field in ("socialSecurityNumber", "zipCode"):
+            value = "".join(char for char in value if char.isdigit())
+        normalized[field] = value
+    return normalized
+
+
+def analysis_key(form_data: dict, medical: SpooledUpload, income: SpooledUpload) -> str:
+    """Content address of a submission: file hashes, normalized form, prompt version and model."""
+    identity = {
+        "medical": buffer_digest(medical),
+        "income": buffer_digest(income),
+        "form": normalize_form(form_data),
+        "prompt": prompt_version(),
+        "model": ANALYSIS_MODEL,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def cached_analysis(key: str):
+    """The ai() result for the application cached under `key`, or None."""
+    entry = await lookup_analysis(key)
+    if not entry:
+        return None
+    
+    app = await db.applications.find_one({"application_id": entry["application_id"]}, {"raw_claude_response": 0})
+    if not app:
+        # The application was removed; analyze again
+        await forget_analysis(key)
+        return None
+    
+    return {
+        "success": True,
+        "cached": True,
+        "application_id": app["application_id"],
+        "result": full_analysis(app),
+        "document": app.get("documents"),
+        "raw_response": await load_transcript(app["application_id"])
+    }
+
+
+# --------------------------------------------------------
+# Document pre-stage
+# --------------------------------------------------------
+UPLOAD_LABELS = ["medical_records", "income_documents"]
+
+
+async def prepare_content(uploads: list, labels: list = UPLOAD_LABELS):
+    """
+    Content blocks for the uploads and the pre-stage stats (None when text
+    extraction is off). Extraction runs in the PDF pool; see
+    extract.prepare_documents. `labels` names the uploads in the extracted text.
+    """
+    if not TEXT_EXTRACTION:
+        return [(upload.content_type, encode_document(upload)) for upload in uploads], None
+    
+    loop = asyncio.get_running_loop()
+    with timed("text_extraction"), pdf_pool_tasks.track():
+        prepared = await loop.run_in_executor(
+            get_pdf_pool(),
+            prepare_documents,
+            [(label, upload.source()) for label, upload in zip(labels, uploads)]
+        )
+    
+    documents = []
+    for kind, value in prepared["blocks"]:
+        if kind == "text":
+            documents.append({"type": "text", "text": value})
+        elif kind == "pdf":
+            documents.append(("application/pdf", value))
         else:
-            print(f"👤 Creating new user: {name} with SSN: {socialSecurityNumber}")
-            # Create a new user document
-            user_doc = {
-                "user_id": str(uuid.uuid4()),
-                "name": name,
-                "socialSecurityNumber": socialSecurityNumber,
-                "applications": [application_id],
-                "created_at": datetime.now(timezone.utc)
-            }
+            upload = uploads[value]
+            documents.append((upload.content_type, encode_document(upload)))
+    
+    stats = prepared["stats"]
+    print(f"📝 Pre-stage: {stats['text_pages']} text, {stats['scanned_pages']} scanned, "
+          f"{stats['blank_pages']} blank, {stats['duplicate_pages']} duplicate pages; "
+          f"~{stats['estimated_tokens_saved']} tokens saved")
+    return documents, stats
 
-            result = await db.users.insert_one(user_doc)
-            print(f"✅ Created new user with ID: {user_doc['user_id']}")
-            return {
-                "success": True,
-                "user_id": user_doc["user_id"],
-                "inserted_id": str(result.inserted_id),
-                "updated": False
-            }
 
+# --------------------------------------------------------
+# MAIN AI FUNCTION
+# --------------------------------------------------------
+async def ai(form_data, medicalRecordsFile, incomeDocumentsFile, progress=None, use_cache=True):
+    """
+    Analyze a submission and save it as an application. An identical earlier
+    submission (same files, same normalized form, same prompt) returns its
+    stored application instead of running the model again, and an identical
+    submission still in progress is joined rather than repeated. With
+    use_cache=False the analysis always runs and replaces the cached one.
+    """
+    medical = income = None
+    try:
+        # Read each upload once; large ones are spooled to disk
+        with timed("upload_read"):
+            medical = await SpooledUpload.from_upload(medicalRecordsFile, "medical_records.pdf")
+            income = await SpooledUpload.from_upload(incomeDocumentsFile, "income_documents.pdf")
+        report_progress(progress, "upload_received", bytes=medical.size + income.size)
+        
+        key = analysis_key(form_data, medical, income)
+        if use_cache:
+            cached = await cached_analysis(key)
+            if cached:
+                print(f"♻️ Reusing analysis of application {cached['application_id']}")
+                report_progress(progress, "cache_hit", application_id=cached["application_id"])
+                medical.close()
+                income.close()
+                return cached
+            
+            pending = _inflight.get(key)
+            if pending is not None:
+                print("♻️ Identical submission already in progress; waiting for it")
+                report_progress(progress, "joined_in_progress")
+                medical.close()
+                income.close()
+                return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
     except Exception as e:
-        print(f"❌ Error saving or updating user: {e}")
+        print(f"❌ Error in AI function: {e}")
+        for upload in (medical, income):
+            if upload is not None:
+                upload.close()
         return {
             "success": False,
             "error": str(e)
         }
+    
+    result = {"success": False, "error": "Analysis was interrupted"}
+    try:
+        result = await analyze(form_data, medical, income, progress)
+        if result.get("success") and result.get("application_id"):
+            try:
+                await store_analysis(key, result["application_id"], (result.get("document") or {}).get("document_id"), prompt_version())
+            except Exception as e:
+                print(f"⚠️ Could not cache analysis: {e}")
+        return result
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+        future.set_result(result)
+        medical.close()
+        income.close()
 
 
+# Merges still running for failed analyses (kept referenced until they finish)
+_abandoned_merges = set()
 
-# --------------------------------------------------------
-# MAIN AI FUNCTION
-# --------------------------------------------------------
-async def ai(form_data, medicalRecordsFile, incomeDocumentsFile):
+
+def remove_file(path: str):
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def discard_merge(task, merged_path: str):
+    """Done-callback for a merge nobody awaits: consume its outcome and remove its file."""
+    _abandoned_merges.discard(task)
+    if not task.cancelled():
+        task.exception()
+    remove_file(merged_path)
+
+
+async def analyze(form_data, medical: SpooledUpload, income: SpooledUpload, progress=None):
+    """Merge, analyze and persist one submission whose files have been read."""
+    merge_task = None
+    merged_path = None
     try:
-        # Read file contents
-        medical_bytes = await medicalRecordsFile.read()
-        income_bytes = await incomeDocumentsFile.read()
-        
-        # Get filenames
-        medical_filename = medicalRecordsFile.filename or "medical_records.pdf"
-        income_filename = incomeDocumentsFile.filename or "income_documents.pdf"
+        # Spooled uploads are merged file to file so no process holds the
+        # whole merged PDF in memory
+        if medical.spooled or income.spooled:
+            merged_fd, merged_path = tempfile.mkstemp(prefix="merged-", suffix=".pdf")
+            os.close(merged_fd)
+        
+        # Start merging the PDFs right away so it overlaps the model call
+        merge_task = asyncio.ensure_future(merge_pdfs(
+            cover_fields(form_data),
+            [medical.source(), income.source()],
+            merged_path))
         
         # Load prompt
         prompt = load_prompt()
         
-        # Encode files to base64
-        medical_base64 = base64.standard_b64encode(medical_bytes).decode("utf-8")
-        income_base64 = base64.standard_b64encode(income_bytes).decode("utf-8")
-        
-        # Determine media types
-        medical_media_type = medicalRecordsFile.content_type or "application/pdf"
-        income_media_type = incomeDocumentsFile.content_type or "application/pdf"
-        
-        # Create streaming message
-        response_text = ""
-        
-        with client.messages.stream(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=8000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "document",
-                            "source": {
-                                "type": "base64",
-                                "media_type": medical_media_type,
-                                "data": medical_base64
-                            }
-                        },
-                        {
-                            "type": "document",
-                            "source": {
-                                "type": "base64",
-                                "media_type": income_media_type,
-                                "data": income_base64
-                            }
-                        }
-                    ]
-                }
-            ]
-        ) as stream:
-            for text in stream.text_stream:
-                response_text += text
-        
-        print("\n\n--- PROCESSING COMPLETE ---\n")
-        
-        # Extract JSON after streaming is complete
-        json_match = re.search(r'<START_OUTPUT>(.*?)<END_OUTPUT>', response_text, re.DOTALL)
-
-        if json_match:
-            json_str = json_match.group(1).strip()
-            
-            json_str = re.sub(r'^```json\s*', '', json_str)
-            json_str = re.sub(r'\s*```$', '', json_str)
-        
-            try:
-                jsonResult = json.loads(json_str)
-                print("✅ JSON parsed successfully")
-
-                # Store documents in MongoDB
-                print("\n📄 Storing documents in MongoDB...")
-                
-                combinedDoc = await merge_pdfs(
-                    {"firstName":form_data["firstName"], 
-                     "lastName":form_data["lastName"], 
-                     "dateOfBirth":form_data["dateOfBirth"], 
-                     "socialSecurityNumber":form_data["socialSecurityNumber"], 
-                     "streetAddress":form_data["address"], 
-                     "city":form_data["city"], 
-                     "state":form_data["state"], 
-                     "zipCode":form_data["zipCode"]},
-                    [medical_bytes, income_bytes])
-                
-                document = await store_documents_in_db(
-                    combinedDoc, "combined_document.pdf"
-                )
-                
-                # Save application to MongoDB
-                print("\n💾 Saving application to MongoDB...")
-                application_id = await save_application_to_db(
-                    jsonResult, 
-                    document, 
-                    response_text
-                )
-                
-                if application_id:
-                    await save_or_update_user(form_data["firstName"]+" "+form_data["lastName"], form_data["socialSecurityNumber"], application_id)
-                
-                return {
-                    "success": True,
-                    "application_id": application_id,
-                    "result": jsonResult,
-                    "document": document,
-                    "raw_response": response_text
-                }
-                
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing error: {e}")
-                return {
-                    "success": False,
-                    "error": f"Failed to parse JSON response: {str(e)}",
-                    "raw_response": response_text
-                }
-        else:
-            print("❌ Could not find <START_OUTPUT> and <END_OUTPUT> tags in response")
+        # Send extracted text where the PDFs have a text layer
+        documents, preprocessing = await prepare_content([medical, income])
+        if preprocessing:
+            report_progress(progress, "documents_prepared", **preprocessing)
+        
+        # Stream the analysis without blocking the event loop; the parser
+        # stops reading once the output is complete or cannot be valid.
+        # The base64 copies only live for the duration of the request.
+        parser = await run_analysis(prompt, documents, progress)
+        documents = None
+        response_text = parser.text()
+        
+        try:
+            with timed("json_parse"):
+                jsonResult = parser.result()
+        except ValueError as e:
+            print(f"❌ Invalid analysis output: {e}")
             return {
                 "success": False,
-                "error": "Output tags not found in response",
+                "error": str(e),
                 "raw_response": response_text
             }
+        # Store documents in MongoDB
+        combinedDoc = await merge_task
+        
+        document = await store_documents_in_db(
+            combinedDoc, "combined_document.pdf"
+        )
+        if document:
+            report_progress(progress, "documents_stored", document_id=document["document_id"])
+        
+        # Save application, transcript and user link together
+        try:
+            application_id, _ = await persist_application(
+                jsonResult, 
+                document, 
+                response_text,
+                form_data["firstName"]+" "+form_data["lastName"],
+                form_data["socialSecurityNumber"],
+                preprocessing
+            )
+        except Exception as e:
+            print(f"❌ Error saving application to MongoDB: {e}")
+            # Don't leave an orphaned PDF behind
+            if document:
+                try:
+                    await delete_document(document["document_id"])
+                except Exception as cleanup_error:
+                    print(f"⚠️ Could not remove stored document: {cleanup_error}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+        
+        report_progress(progress, "application_saved", application_id=application_id)
+        
+        return {
+            "success": True,
+            "application_id": application_id,
+            "result": jsonResult,
+            "document": document,
+            "raw_response": response_text
+        }
             
     except Exception as e:
         print(f"❌ Error in AI function: {e}")
         return {
             "success": False,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+    finally:
+        if merge_task is not None and not merge_task.done() and merged_path:
+            # The analysis failed before the merge was needed. A merge the
+            # pool has started cannot be cancelled and would write the file
+            # after we removed it, so remove it once the merge is done
+            _abandoned_merges.add(merge_task)
+            merge_task.add_done_callback(lambda task: discard_merge(task, merged_path))
+        else:
+            # Drop the merge if the analysis failed before it was needed
+            if merge_task is not None and not merge_task.done():
+                merge_task.cancel()
+            elif merge_task is not None and not merge_task.cancelled():
+                merge_task.exception()
+            # store_documents_in_db removes the merged file once stored; this
+            # covers the paths that never got that far
+            remove_file(merged_path)
\ No newline at end of file
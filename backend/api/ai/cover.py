@@ -0,0 +1,223 @@
+from io import BytesIO
+from datetime import datetime, timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Frame, Flowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+
+
+# Page geometry used by SimpleDocTemplate: 1 inch margins, 6pt frame padding
+MARGIN = inch
+FRAME_PADDING = 6
+
+TABLE_COL_WIDTHS = [2*inch, 4*inch]
+
+# Placeholder applicant used to lay out the skeleton page once per process
+SKELETON_FORM = {
+    "firstName": "First",
+    "lastName": "Last",
+    "dateOfBirth": "YYYY-MM-DD",
+    "socialSecurityNumber": "000-00-0000",
+    "streetAddress": "Street",
+    "city": "City",
+    "state": "ST",
+    "zipCode": "00000",
+}
+
+
+def personal_rows(form_data: dict) -> list:
+    return [
+        ["Full Name:", f"{form_data.get('firstName', '')} {form_data.get('lastName', '')}"],
+        ["Date of Birth:", form_data.get('dateOfBirth', 'N/A')],
+        ["Social Security Number:", form_data.get('socialSecurityNumber', 'N/A')],
+    ]
+
+
+def address_rows(form_data: dict) -> list:
+    return [
+        ["Street Address:", form_data.get('streetAddress', 'N/A')],
+        ["City:", form_data.get('city', 'N/A')],
+        ["State:", form_data.get('state', 'N/A')],
+        ["ZIP Code:", form_data.get('zipCode', 'N/A')],
+    ]
+
+
+class _Slot(Flowable):
+    """
+    Stand-in flowable used while laying out the skeleton. It measures like the
+    wrapped flowable but only records where the frame would draw it.
+    """
+    def __init__(self, key, flowable):
+        Flowable.__init__(self)
+        self.key = key
+        self.flowable = flowable
+        self.hAlign = getattr(flowable, "hAlign", "LEFT")
+        self.placement = None
+
+    def wrap(self, availWidth, availHeight):
+        self.size = self.flowable.wrap(availWidth, availHeight)
+        return self.size
+
+    def getSpaceBefore(self):
+        return self.flowable.getSpaceBefore()
+
+    def getSpaceAfter(self):
+        return self.flowable.getSpaceAfter()
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self.placement = (x, y, _sW)
+
+
+# --------------------------------------------------------
+# Cover page renderer
+# --------------------------------------------------------
+class CoverPageRenderer:
+    """
+    Renders the "SSDI Application Summary" cover page.
+
+    Styles, table styles, the static paragraphs and the position of every
+    element on the page are computed once. Each render only builds the
+    applicant tables and draws everything at the precomputed positions. If an
+    applicant's values change the layout (e.g. a value with a line break), the
+    page is built through the regular platypus flow instead.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
+
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1a365d'),
+            spaceAfter=30,
+            alignment=1
+        )
+
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#2d3748'),
+            spaceAfter=12,
+            spaceBefore=20
+        )
+
+        # Both tables share one style
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f7fafc')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ])
+
+        # Static flowables, shared by every page
+        self.title = Paragraph("SSDI Application Summary", self.title_style)
+        self.personal_heading = Paragraph("Personal Information", self.heading_style)
+        self.address_heading = Paragraph("Address", self.heading_style)
+        self.documents_heading = Paragraph("Attached Documents", self.heading_style)
+        self.small_gap = Spacer(1, 0.3*inch)
+        self.large_gap = Spacer(1, 0.5*inch)
+
+        page_width, page_height = letter
+        self.frame_args = (MARGIN, MARGIN, page_width - 2*MARGIN, page_height - 2*MARGIN)
+        self.avail_width = page_width - 2*MARGIN - 2*FRAME_PADDING
+        self.avail_height = page_height - 2*MARGIN - 2*FRAME_PADDING
+
+        self.dynamic_paragraphs = {}
+        self.skeleton = self.layout_skeleton()
+
+    def story(self, form_data: dict, document_count: int, submission_date: str) -> list:
+        """
+        The cover page as (key, flowable) pairs. Keyed entries change per
+        applicant; entries without a key are identical on every page.
+        """
+        return [
+            (None, self.title),
+            (None, self.small_gap),
+            ("date", self.paragraph(f"<b>Submission Date:</b> {submission_date}")),
+            (None, self.large_gap),
+            (None, self.personal_heading),
+            ("personal", self.table(personal_rows(form_data))),
+            (None, self.small_gap),
+            (None, self.address_heading),
+            ("address", self.table(address_rows(form_data))),
+            (None, self.large_gap),
+            (None, self.documents_heading),
+            ("documents", self.paragraph(f"• Total Documents: {document_count}")),
+        ]
+
+    def layout_skeleton(self) -> list:
+        """
+        Run the placeholder page through a real frame once and record where
+        each element lands.
+        """
+        slots = [_Slot(key, flowable) for key, flowable in self.story(SKELETON_FORM, 0, "January 01, 2000")]
+
+        frame = Frame(*self.frame_args)
+        canvas = Canvas(BytesIO(), pagesize=letter)
+        for slot in slots:
+            if not frame.add(slot, canvas):
+                raise ValueError("Cover page skeleton does not fit on one page")
+
+        return [(slot.size, slot.placement) for slot in slots]
+
+    def paragraph(self, text: str) -> Paragraph:
+        # Submission dates and document counts repeat constantly, so their
+        # paragraphs are parsed once and reused
+        paragraph = self.dynamic_paragraphs.get(text)
+        if paragraph is None:
+            if len(self.dynamic_paragraphs) > 64:
+                self.dynamic_paragraphs.clear()
+            paragraph = Paragraph(text, self.normal_style)
+            self.dynamic_paragraphs[text] = paragraph
+        return paragraph
+
+    def table(self, rows: list) -> Table:
+        return Table(rows, colWidths=TABLE_COL_WIDTHS, style=self.table_style)
+
+    def render(self, form_data: dict, document_count: int) -> bytes:
+        """
+        Render the cover page for one applicant and return the PDF bytes
+        """
+        submission_date = datetime.now(timezone.utc).strftime('%B %d, %Y')
+        story = self.story(form_data, document_count, submission_date)
+
+        buffer = BytesIO()
+        canvas = Canvas(buffer, pagesize=letter)
+
+        for (key, flowable), (size, (x, y, sW)) in zip(story, self.skeleton):
+            if key is not None and flowable.wrap(self.avail_width, self.avail_height) != size:
+                return self.render_flowing(story)
+            flowable.drawOn(canvas, x, y, _sW=sW)
+
+        canvas.showPage()
+        canvas.save()
+        return buffer.getvalue()
+
+    def render_flowing(self, story: list) -> bytes:
+        """Lay the page out from scratch with SimpleDocTemplate."""
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        doc.build([flowable for _, flowable in story])
+        return buffer.getvalue()
+
+
+cover_renderer = None
+
+
+def get_cover_renderer() -> CoverPageRenderer:
+    """Return this process's renderer, building it on first use."""
+    global cover_renderer
+    if cover_renderer is None:
+        cover_renderer = CoverPageRenderer()
+    return cover_renderer
@@ -0,0 +1,169 @@
+import os
+import base64
+import hashlib
+from io import BytesIO
+
+# TEXT_EXTRACTION=false sends the uploads to the model as whole PDFs again.
+# A page that also draws graphics is sent as text from EXTRACT_MIN_CHARS
+# non-whitespace characters of extracted text; below that it is sent as PDF.
+TEXT_EXTRACTION = os.getenv("TEXT_EXTRACTION", "true").lower() != "false"
+EXTRACT_MIN_CHARS = int(os.getenv("EXTRACT_MIN_CHARS", "40"))
+
+# Rough token estimates used for the recorded savings: ~4 characters per
+# text token, and a fixed cost for the image the model gets of every PDF page
+CHARS_PER_TOKEN = 4
+PAGE_IMAGE_TOKENS = 1600
+
+
+def estimate_text_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+# Content stream operators that show text, and those that paint anything
+# else: paths, shadings, XObjects (images and forms) and inline images
+TEXT_OPERATORS = {b"Tj", b"TJ", b"'", b'"'}
+PAINT_OPERATORS = {b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"sh", b"Do", b"INLINE IMAGE"}
+
+
+def page_content(page) -> tuple:
+    """
+    (marks, draws) for a page: whether its content stream shows text or
+    paints anything at all, and whether it paints more than text (a scan, a
+    chart, a signature). Graphics state alone marks nothing. A content stream
+    that cannot be parsed counts as both, so the page is kept as a PDF.
+    """
+    from PyPDF2.generic import ContentStream
+
+    contents = page.get_contents()
+    if contents is None:
+        return False, False
+    try:
+        operators = {operator for _, operator in ContentStream(contents, page.pdf).operations}
+    except Exception:
+        return True, True
+    draws = bool(operators & PAINT_OPERATORS)
+    return draws or bool(operators & TEXT_OPERATORS), draws
+
+
+def read_pdf(source):
+    """PdfReader for an upload's bytes or spooled file path."""
+    from PyPDF2 import PdfReader
+
+    return PdfReader(source if isinstance(source, str) else BytesIO(source))
+
+
+def source_size(source) -> int:
+    return os.path.getsize(source) if isinstance(source, str) else len(source)
+
+
+# --------------------------------------------------------
+# Pre-stage: text instead of whole PDFs
+# --------------------------------------------------------
+def prepare_documents(documents: list) -> dict:
+    """
+    Split the uploads into what the model actually needs. `documents` is a
+    list of (label, source) where source is the PDF bytes or a file path.
+
+    For every page the text layer is extracted. Pages with enough text, and
+    short text pages that draw nothing else, are sent as text. Pages
+    without a usable text layer that still mark the page (scans, vector
+    drawings, text the extractor cannot read) are collected into a smaller
+    PDF and sent as a document. Only pages with no extracted text and
+    nothing in their content stream, and text pages that repeat an earlier
+    page, are dropped. A file that cannot be parsed, whose pages all need
+    the PDF, or of which nothing would be left, is sent unchanged.
+
+    Runs in the PDF process pool. Returns {"blocks": [...], "stats": {...}};
+    a block is ("text", text), ("pdf", base64 data) or ("original", index)
+    for a file the caller should encode itself.
+    """
+    from PyPDF2 import PdfWriter
+
+    blocks = []
+    seen_pages = set()
+    stats = {
+        "pages": 0,
+        "text_pages": 0,
+        "scanned_pages": 0,
+        "blank_pages": 0,
+        "duplicate_pages": 0,
+        "original_bytes": 0,
+        "sent_bytes": 0,
+        "estimated_tokens_before": 0,
+        "estimated_tokens_after": 0,
+    }
+
+    for index, (label, source) in enumerate(documents):
+        size = source_size(source)
+        stats["original_bytes"] += size
+
+        try:
+            reader = read_pdf(source)
+            pages = [(page, (page.extract_text() or "").strip()) for page in reader.pages]
+        except Exception as e:
+            print(f"⚠️ Could not extract text from {label}, sending the PDF: {e}")
+            blocks.append(("original", index))
+            stats["sent_bytes"] += size
+            stats["estimated_tokens_before"] += PAGE_IMAGE_TOKENS
+            stats["estimated_tokens_after"] += PAGE_IMAGE_TOKENS
+            continue
+
+        text_parts = []
+        scanned = PdfWriter()
+        scanned_count = 0
+        blank_count = 0
+
+        for number, (page, text) in enumerate(pages, start=1):
+            stats["pages"] += 1
+            text_tokens = estimate_text_tokens(text)
+            stats["estimated_tokens_before"] += PAGE_IMAGE_TOKENS + text_tokens
+
+            marks, draws = page_content(page)
+            if not text and not marks:
+                stats["blank_pages"] += 1
+                blank_count += 1
+                continue
+
+            # A short text layer is the whole page only when nothing else is drawn
+            as_text = bool(text) and (len("".join(text.split())) >= EXTRACT_MIN_CHARS or not draws)
+            fingerprint = hashlib.sha256(" ".join(text.split()).encode("utf-8")).digest() if as_text else None
+            if fingerprint is not None and fingerprint in seen_pages:
+                stats["duplicate_pages"] += 1
+                continue
+            if fingerprint is not None:
+                seen_pages.add(fingerprint)
+
+            if as_text:
+                stats["text_pages"] += 1
+                stats["estimated_tokens_after"] += text_tokens
+                text_parts.append(f"--- Page {number} ---\n{text}")
+            else:
+                stats["scanned_pages"] += 1
+                stats["estimated_tokens_after"] += PAGE_IMAGE_TOKENS + text_tokens
+                scanned.add_page(page)
+                scanned_count += 1
+
+        if scanned_count == len(pages) or blank_count == len(pages):
+            # Nothing to gain from rebuilding the file, or nothing would be
+            # left of it: the model gets the file as uploaded
+            if blank_count == len(pages):
+                stats["estimated_tokens_after"] += PAGE_IMAGE_TOKENS * max(1, len(pages))
+            blocks.append(("original", index))
+            stats["sent_bytes"] += size
+            continue
+
+        if text_parts:
+            text = f"<document name=\"{label}\" source=\"extracted text\">\n" + "\n\n".join(text_parts) + "\n</document>"
+            blocks.append(("text", text))
+            stats["sent_bytes"] += len(text.encode("utf-8"))
+
+        if scanned_count:
+            buffer = BytesIO()
+            scanned.write(buffer)
+            data = buffer.getvalue()
+            blocks.append(("pdf", base64.standard_b64encode(data).decode("ascii")))
+            stats["sent_bytes"] += len(data)
+
+    stats["bytes_saved"] = stats["original_bytes"] - stats["sent_bytes"]
+    stats["estimated_tokens_saved"] = stats["estimated_tokens_before"] - stats["estimated_tokens_after"]
+    return {"blocks": blocks, "stats": stats}
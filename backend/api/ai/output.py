@@ -0,0 +1,255 @@
+import re
+import json
+from typing import Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+
+START_TAG = "<START_OUTPUT>"
+END_TAG = "<END_OUTPUT>"
+
+# Characters that matter to the structure scanner outside and inside strings
+STRUCTURE = re.compile(r'[{}\[\]",:]')
+STRING_END = re.compile(r'["\\]')
+CLOSERS = {"}": "{", "]": "["}
+
+# What may surround the JSON object between the tags
+FENCE_OPENERS = ("```json", "```")
+
+
+# --------------------------------------------------------
+# Output schema (see prompt.md)
+# --------------------------------------------------------
+class Phase(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    status: str
+    evaluation_complete: Optional[bool] = None
+    confidence_percent: Optional[float] = None
+
+
+class AnalysisOutput(BaseModel):
+    """The fields of the analysis JSON the rest of the backend relies on."""
+    model_config = ConfigDict(extra="allow")
+
+    recommendation: Literal["APPROVE", "REJECT", "FURTHER REVIEW"]
+    confidence_level: float = Field(ge=0, le=1)
+    summary: str
+    phase_1_current_work: Phase
+    phase_2_medical_severity: Phase
+    phase_3_listings: Phase
+    phase_4_rfc: Phase
+    phase_5_vocational: Phase
+
+    @field_validator("recommendation", mode="before")
+    @classmethod
+    def normalize_recommendation(cls, value):
+        if isinstance(value, str):
+            return value.strip().upper().replace("_", " ")
+        return value
+
+
+def validate_output(result: dict) -> dict:
+    """
+    Check the parsed output against AnalysisOutput and return it with the
+    recommendation normalized. Raises ValueError describing the first problems.
+    """
+    try:
+        output = AnalysisOutput.model_validate(result)
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()[:5]
+        )
+        raise ValueError(f"Analysis output does not match the expected schema: {problems}")
+
+    result["recommendation"] = output.recommendation
+    return result
+
+
+# --------------------------------------------------------
+# Incremental parser
+# --------------------------------------------------------
+class OutputParser:
+    """
+    Follows the model's streamed text chunk by chunk. It finds the
+    <START_OUTPUT> tag, tracks the nesting of the JSON object after it, and
+    reports once the output is finished (<END_OUTPUT> seen, or the object
+    closed and something else follows) or can no longer be valid JSON, so the
+    caller can stop reading the stream.
+
+    Chunks are kept in a list and joined once, and only the JSON part is
+    scanned, so the cost is linear in the response length.
+
+    on_key(name) is called for every top-level key of the object as soon as
+    the key is complete.
+    """
+
+    def __init__(self, on_key=None):
+        self.on_key = on_key
+        self.chunks = []
+        self.pending = ""       # text not yet scanned (possible partial tag)
+        self.state = "before"   # before -> prefix -> object -> after -> done | invalid
+        self.error = None
+        self.body = []          # JSON text of the object
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.key_start = None   # index in self.key_text while reading a top-level key
+        self.key_text = []
+        self.expect_key = False
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "invalid")
+
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, text: str) -> bool:
+        """Consume a chunk. Returns True once no more text is needed."""
+        self.chunks.append(text)
+        if self.finished:
+            return True
+
+        data = self.pending + text
+        self.pending = ""
+
+        if self.state == "before":
+            index = data.find(START_TAG)
+            if index < 0:
+                # Keep just enough to catch a tag split across chunks
+                self.pending = data[-(len(START_TAG) - 1):]
+                return False
+            data = data[index + len(START_TAG):]
+            self.state = "prefix"
+
+        if self.state == "prefix":
+            data = self.feed_prefix(data)
+            if data is None:
+                return self.finished
+
+        if self.state == "object":
+            data = self.feed_object(data)
+            if data is None:
+                return self.finished
+
+        if self.state == "after":
+            self.feed_after(data)
+
+        return self.finished
+
+    def feed_prefix(self, data: str):
+        """Skip whitespace and an optional code fence before the opening brace."""
+        index = data.find("{")
+        prefix = (data if index < 0 else data[:index]).strip()
+        if prefix and not any(opener.startswith(prefix) or prefix == opener for opener in FENCE_OPENERS):
+            self.fail(f"Unexpected text before the JSON object: {prefix[:40]!r}")
+            return None
+        if index < 0:
+            self.pending = data
+            return None
+        self.state = "object"
+        return data[index:]
+
+    def feed_object(self, data: str):
+        position = 0
+        length = len(data)
+        while position < length:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                    position += 1
+                    continue
+                match = STRING_END.search(data, position)
+                if match is None:
+                    if self.key_start is not None:
+                        self.key_text.append(data[position:])
+                    position = length
+                    break
+                if match.group() == "\\":
+                    if self.key_start is not None:
+                        self.key_text.append(data[position:match.start()])
+                    self.escaped = True
+                    position = match.end()
+                    continue
+                if self.key_start is not None:
+                    self.key_text.append(data[position:match.start()])
+                    self.finish_key()
+                self.in_string = False
+                position = match.end()
+                continue
+
+            match = STRUCTURE.search(data, position)
+            if match is None:
+                position = length
+                break
+            char = match.group()
+            position = match.end()
+
+            if char == '"':
+                self.in_string = True
+                if len(self.stack) == 1 and self.expect_key:
+                    self.key_start = position
+                    self.key_text = []
+                    self.expect_key = False
+            elif char in "{[":
+                self.stack.append(char)
+                self.expect_key = char == "{" and len(self.stack) == 1
+            elif char in "}]":
+                if not self.stack or self.stack[-1] != CLOSERS[char]:
+                    self.body.append(data[:position])
+                    self.fail(f"Unbalanced {char!r} in the JSON output")
+                    return None
+                self.stack.pop()
+                if not self.stack:
+                    self.body.append(data[:position])
+                    self.state = "after"
+                    return data[position:]
+            elif char == "," and len(self.stack) == 1:
+                self.expect_key = True
+
+        self.body.append(data)
+        return None
+
+    def finish_key(self):
+        name = "".join(self.key_text)
+        self.key_start = None
+        self.key_text = []
+        if self.on_key is not None:
+            self.on_key(name)
+
+    def feed_after(self, data: str):
+        """Wait for the end tag; anything but whitespace, a fence or the tag ends the output too."""
+        data = data.lstrip()
+        if data.startswith("```"):
+            data = data[3:].lstrip()
+        if not data:
+            return
+        if data.startswith(END_TAG) or not END_TAG.startswith(data[:len(END_TAG)]):
+            self.state = "done"
+            return
+        # A partial end tag; wait for the rest
+        self.pending = data
+
+    def fail(self, error: str):
+        self.state = "invalid"
+        self.error = error
+
+    def result(self) -> dict:
+        """
+        Parse and validate the collected JSON. Raises ValueError when the
+        output is missing, malformed or does not match the schema.
+        """
+        if self.state == "invalid":
+            raise ValueError(self.error)
+        if self.state in ("before", "prefix"):
+            raise ValueError("Output tags not found in response")
+        if self.state == "object":
+            raise ValueError("Response ended before the JSON output was complete")
+
+        try:
+            result = json.loads("".join(self.body))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse JSON response: {str(e)}")
+        if not isinstance(result, dict):
+            raise ValueError("Analysis output is not a JSON object")
+        return validate_output(result)
@@ -0,0 +1 @@
+from .backlog import ingest_backlog, discover_packets
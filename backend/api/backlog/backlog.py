@@ -0,0 +1,438 @@
+import os
+import re
+import sys
+import glob
+import json
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+from pymongo import UpdateOne, ReturnDocument
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+from api.ai.output import OutputParser
+from api.ai.ai import (
+    analysis_request, cover_fields, load_prompt, merge_pdfs, prepare_content,
+    store_documents_in_db, persist_application, save_or_update_user
+)
+from api.uploads.uploads import SpooledUpload, PDF_MAGIC, HEADER_WINDOW
+from api.documents.documents import delete_document
+
+# Requests per message batch and the most request data (in bytes) put in one
+# batch; the provider accepts up to 100,000 requests or 256 MB per batch.
+BACKLOG_BATCH_SIZE = int(os.getenv("BACKLOG_BATCH_SIZE", "1000"))
+BACKLOG_BATCH_MAX_BYTES = int(os.getenv("BACKLOG_BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+# Seconds between batch status checks, and how many finished claims are
+# merged and saved at once
+BACKLOG_POLL_INTERVAL = float(os.getenv("BACKLOG_POLL_INTERVAL", "60"))
+BACKLOG_SAVE_CONCURRENCY = int(os.getenv("BACKLOG_SAVE_CONCURRENCY", "8"))
+
+# Packet states in the backlog_packets collection
+PACKET_STATUSES = ["pending", "submitted", "saving", "saved", "failed"]
+
+# Document labels by file name prefix, in the order they are sent
+FILE_LABELS = [
+    ("Medical_Records", "medical_records"),
+    ("Financial_Records", "income_documents"),
+    ("Income", "income_documents"),
+    ("General_Applicant_Info", "applicant_information"),
+]
+
+# "123 Main St, San Francisco, CA 94102"
+ADDRESS = re.compile(r"^(?P<street>.+?),\s*(?P<city>[^,]+?),\s*(?P<state>[A-Za-z]{2})\s+(?P<zip>\d{5}(?:-\d{4})?)$")
+
+
+# --------------------------------------------------------
+# Claim packets
+# --------------------------------------------------------
+def packet_form(applicant_info: dict) -> dict:
+    """The form_data of /api/benefit-application from a packet's applicant_info."""
+    names = (applicant_info.get("full_name") or "").split()
+    address = (applicant_info.get("address") or "").strip()
+    match = ADDRESS.match(address)
+    return {
+        "firstName": names[0] if names else "",
+        "lastName": " ".join(names[1:]),
+        "dateOfBirth": applicant_info.get("date_of_birth", ""),
+        "address": match.group("street") if match else address,
+        "city": match.group("city") if match else "",
+        "state": match.group("state").upper() if match else "",
+        "zipCode": match.group("zip") if match else "",
+        "socialSecurityNumber": applicant_info.get("social_security_number", ""),
+    }
+
+
+def file_label(filename: str) -> str:
+    for prefix, label in FILE_LABELS:
+        if filename.startswith(prefix):
+            return label
+    return os.path.splitext(filename)[0]
+
+
+def order_files(files: list) -> list:
+    """Sort a claim's files into the order of FILE_LABELS (medical records first)."""
+    order = [label for _, label in FILE_LABELS]
+    return sorted(files, key=lambda file: order.index(file["label"]) if file["label"] in order else len(order))
+
+
+def is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return PDF_MAGIC in f.read(HEADER_WINDOW)
+
+
+def index_pdfs(directory: str) -> dict:
+    """File name -> path of every PDF under `directory`, for remapping paths recorded elsewhere."""
+    pdfs = {}
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.pdf"), recursive=True)):
+        pdfs.setdefault(os.path.basename(path), os.path.abspath(path))
+    return pdfs
+
+
+def discover_packets(directory: str) -> list:
+    """
+    Find the claim packets under `directory`: every form_submission_*.json
+    plus the PDFs it lists in pdf_document_ids. Those paths come from the
+    machine that wrote the packet, so the files are looked up by name
+    anywhere under `directory`. Files that are missing or not PDFs are
+    reported on the packet and left out.
+
+    The packet id is a hash of the form JSON, so it stays the same between
+    runs (it is also the batch request's custom_id).
+    """
+    pdfs = index_pdfs(directory)
+    packets = []
+    for form_path in sorted(glob.glob(os.path.join(directory, "**", "form_submission_*.json"), recursive=True)):
+        with open(form_path, "rb") as f:
+            raw = f.read()
+        try:
+            form = json.loads(raw)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Skipping {form_path}: {e}")
+            continue
+
+        files, problems = [], []
+        for original in form.get("pdf_document_ids", []):
+            name = os.path.basename(original)
+            path = pdfs.get(name)
+            if path is None:
+                problems.append(f"{name}: not found")
+            elif not is_pdf(path):
+                problems.append(f"{name}: not a PDF")
+            else:
+                files.append({"label": file_label(name), "filename": name, "path": path})
+
+        packets.append({
+            "packet_id": "pkt_" + hashlib.sha256(raw).hexdigest()[:32],
+            "form_path": os.path.abspath(form_path),
+            "form_data": packet_form(form.get("applicant_info", {})),
+            "submission_date": form.get("submission_date"),
+            "files": order_files(files),
+            "problems": problems,
+        })
+    return packets
+
+
+async def register_packets(packets: list):
+    """Add packets not seen before as pending; known packets keep their state."""
+    if not packets:
+        return
+    now = datetime.now(timezone.utc)
+    await db.backlog_packets.bulk_write([
+        UpdateOne(
+            {"packet_id": packet["packet_id"]},
+            {"$setOnInsert": {
+                "packet_id": packet["packet_id"],
+                "form_path": packet["form_path"],
+                "status": "pending",
+                "created_at": now,
+                "updated_at": now,
+            }},
+            upsert=True
+        )
+        for packet in packets
+    ], ordered=False)
+
+
+async def set_status(packet_ids: list, status: str, **fields):
+    await db.backlog_packets.update_many(
+        {"packet_id": {"$in": packet_ids}},
+        {"$set": dict(fields, status=status, updated_at=datetime.now(timezone.utc))}
+    )
+
+
+# --------------------------------------------------------
+# Submit
+# --------------------------------------------------------
+async def build_request(packet: dict, prompt: str):
+    """
+    The batch request for one packet and its pre-stage stats. Uses the same
+    content as an interactive analysis (see ai.analysis_request).
+    """
+    uploads = [SpooledUpload.from_file(file["path"], file["filename"]) for file in packet["files"]]
+    try:
+        documents, preprocessing = await prepare_content(uploads, [file["label"] for file in packet["files"]])
+    finally:
+        for upload in uploads:
+            upload.close()
+    return {"custom_id": packet["packet_id"], "params": analysis_request(prompt, documents)}, preprocessing
+
+
+def request_size(request: dict) -> int:
+    size = 0
+    for block in request["params"]["messages"][0]["content"]:
+        size += len(block["text"]) if block["type"] == "text" else len(block["source"]["data"])
+    return size
+
+
+async def submit_pending(batch_client, packets: dict, batch_size: int, max_bytes: int) -> list:
+    """
+    Submit every pending packet, batch_size requests (or max_bytes of
+    request data) at a time. Returns the new batch ids.
+    """
+    pending = [doc["packet_id"] async for doc in db.backlog_packets.find({"status": "pending"}, {"packet_id": 1})]
+    pending = [packet_id for packet_id in pending if packet_id in packets]
+    prompt = load_prompt()
+    batch_ids = []
+
+    async def submit(requests, stats):
+        batch = await batch_client.messages.batches.create(requests=requests)
+        now = datetime.now(timezone.utc)
+        await db.backlog_packets.bulk_write([
+            UpdateOne(
+                {"packet_id": request["custom_id"]},
+                {"$set": {
+                    "status": "submitted",
+                    "batch_id": batch.id,
+                    "preprocessing": stats.get(request["custom_id"]),
+                    "updated_at": now,
+                }}
+            )
+            for request in requests
+        ], ordered=False)
+        batch_ids.append(batch.id)
+        print(f"📝 Submitted batch {batch.id} with {len(requests)} claims")
+
+    requests, stats, size = [], {}, 0
+    for packet_id in pending:
+        packet = packets[packet_id]
+        if not packet["files"]:
+            await set_status([packet_id], "failed", error="No PDF documents: " + "; ".join(packet["problems"]))
+            continue
+        try:
+            request, preprocessing = await build_request(packet, prompt)
+        except Exception as e:
+            print(f"❌ Could not prepare {packet['form_path']}: {e}")
+            await set_status([packet_id], "failed", error=str(e))
+            continue
+
+        if requests and (len(requests) >= batch_size or size + request_size(request) > max_bytes):
+            await submit(requests, stats)
+            requests, stats, size = [], {}, 0
+        requests.append(request)
+        stats[packet_id] = preprocessing
+        size += request_size(request)
+
+    if requests:
+        await submit(requests, stats)
+    return batch_ids
+
+
+# --------------------------------------------------------
+# Collect
+# --------------------------------------------------------
+async def wait_for_batch(batch_client, batch_id: str, poll_interval: float):
+    while True:
+        batch = await batch_client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == "ended":
+            return batch
+        counts = batch.request_counts
+        print(f"⏳ Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded, {counts.errored} errored")
+        await asyncio.sleep(poll_interval)
+
+
+async def save_packet(packet: dict, response_text: str, preprocessing=None) -> dict:
+    """
+    Parse one batch result and push it through the interactive path: merge
+    the PDFs behind the cover page, store the merged document and persist
+    the application, transcript and user link together. The application is
+    tagged with the packet_id (unique), so a packet an interrupted run
+    already saved is not saved again; only its user link is rewritten.
+    """
+    form_data = packet["form_data"]
+    name = form_data["firstName"] + " " + form_data["lastName"]
+    existing = await db.applications.find_one({"packet_id": packet["packet_id"]}, {"application_id": 1})
+    if existing:
+        await save_or_update_user(name, form_data["socialSecurityNumber"], existing["application_id"])
+        return {"success": True, "application_id": existing["application_id"]}
+
+    parser = OutputParser()
+    parser.feed(response_text)
+    try:
+        result = parser.result()
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    merged_fd, merged_path = tempfile.mkstemp(prefix="merged-", suffix=".pdf")
+    os.close(merged_fd)
+    document = None
+    try:
+        await merge_pdfs(cover_fields(form_data), [file["path"] for file in packet["files"]], merged_path)
+        document = await store_documents_in_db(merged_path, "combined_document.pdf")
+        if not document:
+            return {"success": False, "error": "Could not store the merged document"}
+        application_id, _ = await persist_application(
+            result,
+            document,
+            response_text,
+            name,
+            form_data["socialSecurityNumber"],
+            preprocessing,
+            fields={"packet_id": packet["packet_id"]}
+        )
+        return {"success": True, "application_id": application_id}
+    except Exception as e:
+        if document:
+            try:
+                await delete_document(document["document_id"])
+            except Exception as cleanup_error:
+                print(f"⚠️ Could not remove stored document: {cleanup_error}")
+        return {"success": False, "error": str(e)}
+    finally:
+        if os.path.exists(merged_path):
+            os.unlink(merged_path)
+
+
+def response_text(message) -> str:
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+async def collect_batch(batch_client, batch_id: str, packets: dict, poll_interval: float, concurrency: int) -> dict:
+    """
+    Wait for a batch to end and save its results, `concurrency` claims at a
+    time. A packet is claimed (submitted -> saving) before it is saved, so a
+    result is saved once even if two runs collect the same batch. Errored
+    requests are marked failed; expired or canceled ones go back to pending.
+    """
+    await wait_for_batch(batch_client, batch_id, poll_interval)
+    counts = {"saved": 0, "failed": 0, "requeued": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    running = set()
+    errors = []
+
+    async def handle(entry):
+        # Results for packets outside this directory are left for a run on theirs
+        packet = packets.get(entry.custom_id)
+        if packet is None:
+            return
+        claimed = await db.backlog_packets.find_one_and_update(
+            {"packet_id": entry.custom_id, "batch_id": batch_id, "status": "submitted"},
+            {"$set": {"status": "saving", "updated_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER
+        )
+        if claimed is None:
+            return
+
+        if entry.result.type in ("expired", "canceled"):
+            await set_status([entry.custom_id], "pending", batch_id=None)
+            counts["requeued"] += 1
+            return
+        if entry.result.type != "succeeded":
+            error = getattr(getattr(entry.result, "error", None), "error", None)
+            await set_status([entry.custom_id], "failed", error=getattr(error, "message", "Request errored"))
+            counts["failed"] += 1
+            return
+
+        text = response_text(entry.result.message)
+        saved = await save_packet(packet, text, claimed.get("preprocessing"))
+        if saved["success"]:
+            await set_status([entry.custom_id], "saved", application_id=saved["application_id"], error=None)
+            counts["saved"] += 1
+        else:
+            print(f"❌ {packet['form_path']}: {saved['error']}")
+            await set_status([entry.custom_id], "failed", error=saved["error"], raw_response=text)
+            counts["failed"] += 1
+
+    def finished(task):
+        running.discard(task)
+        semaphore.release()
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    # A handler starts only when one of the `concurrency` slots is free, so a
+    # large batch never has more than that many claims in progress
+    async for entry in await batch_client.messages.batches.results(batch_id):
+        await semaphore.acquire()
+        if errors:
+            semaphore.release()
+            break
+        task = asyncio.ensure_future(handle(entry))
+        running.add(task)
+        task.add_done_callback(finished)
+    await asyncio.gather(*running, return_exceptions=True)
+    if errors:
+        raise errors[0]
+
+    # Requests the results did not mention cannot be collected any more
+    await db.backlog_packets.update_many(
+        {"batch_id": batch_id, "status": "submitted"},
+        {"$set": {"status": "pending", "batch_id": None, "updated_at": datetime.now(timezone.utc)}}
+    )
+    print(f"✅ Batch {batch_id}: {counts['saved']} saved, {counts['failed']} failed, {counts['requeued']} requeued")
+    return counts
+
+
+# --------------------------------------------------------
+# Ingest a backlog directory
+# --------------------------------------------------------
+async def ingest_backlog(batch_client, directory: str, batch_size: int = BACKLOG_BATCH_SIZE,
+                         max_bytes: int = BACKLOG_BATCH_MAX_BYTES, poll_interval: float = BACKLOG_POLL_INTERVAL,
+                         concurrency: int = BACKLOG_SAVE_CONCURRENCY, retry_failed: bool = False) -> dict:
+    """
+    Analyze and save every claim packet under `directory` through the
+    message batch API. Progress is kept per packet in backlog_packets, so a
+    run that is interrupted (or re-run on the same directory) collects the
+    batches already submitted, submits only what is left and skips packets
+    that are saved. Returns the packet counts by status.
+    """
+    packets = {packet["packet_id"]: packet for packet in discover_packets(directory)}
+    print(f"📄 Found {len(packets)} claim packets in {directory}")
+    await register_packets(list(packets.values()))
+
+    ids = list(packets)
+    # A run that stopped while saving left its claims in "saving"; save_packet
+    # finds the applications it had already written
+    await db.backlog_packets.update_many(
+        {"packet_id": {"$in": ids}, "status": "saving"},
+        {"$set": {"status": "submitted"}}
+    )
+    if retry_failed:
+        await db.backlog_packets.update_many(
+            {"packet_id": {"$in": ids}, "status": "failed"},
+            {"$set": {"status": "pending", "batch_id": None}}
+        )
+
+    open_batches = await db.backlog_packets.distinct("batch_id", {"packet_id": {"$in": ids}, "status": "submitted"})
+    if open_batches:
+        print(f"♻️ Resuming {len(open_batches)} submitted batches")
+
+    # Collecting and submitting repeat until nothing is pending, since
+    # expired requests are requeued
+    while True:
+        new_batches = await submit_pending(batch_client, packets, batch_size, max_bytes)
+        batch_ids = [batch_id for batch_id in open_batches if batch_id] + new_batches
+        if not batch_ids:
+            break
+        await asyncio.gather(*(
+            collect_batch(batch_client, batch_id, packets, poll_interval, concurrency) for batch_id in batch_ids
+        ))
+        open_batches = []
+
+    counts = {status: 0 for status in PACKET_STATUSES}
+    async for doc in db.backlog_packets.aggregate([
+        {"$match": {"packet_id": {"$in": ids}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[doc["_id"]] = doc["count"]
+    return counts
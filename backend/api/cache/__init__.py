@@ -0,0 +1 @@
+from .cache import response_cache
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+from api.metrics.metrics import register, Counter
+
+# Entries kept and how long they stay fresh, in seconds. The cache is per
+# process, so the TTL also bounds how stale another worker's copy can get.
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "256"))
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "30"))
+
+# Completed analyses reused for identical resubmissions: how long an entry
+# stays valid in seconds (0 disables) and how many entries are kept
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+
+# Tags used by the admin readers and the writes that invalidate them
+APPLICATIONS_TAG = "applications"   # /api/applications pages
+QUEUE_TAG = "queue"                 # /api/users/filtered
+USERS_TAG = "users"                 # /api/users/all
+
+
+def application_tag(application_id: str) -> str:
+    """Tag for /api/application/{application_id}"""
+    return f"application:{application_id}"
+
+
+# --------------------------------------------------------
+# LRU + TTL cache of serialized responses
+# --------------------------------------------------------
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized JSON responses. Every entry carries tags;
+    writes invalidate all entries with a given tag.
+    """
+
+    def __init__(self, max_entries: int = READ_CACHE_SIZE, ttl: float = READ_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()   # key -> (expires_at, body, tags)
+        self.tagged = {}               # tag -> set of keys
+        # Bumped by every invalidation so a load that raced a write is not stored
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        
+        expires_at, body, _ = entry
+        if expires_at < time.monotonic():
+            self.remove(key)
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return body
+
+    def put(self, key, body: bytes, tags: list):
+        if not self.enabled:
+            return
+        
+        self.remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, body, tags)
+        for tag in tags:
+            self.tagged.setdefault(tag, set()).add(key)
+        
+        while len(self.entries) > self.max_entries:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.stats["evictions"] += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tagged.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags."""
+        self.generation += 1
+        for tag in tags:
+            for key in list(self.tagged.get(tag, ())):
+                self.remove(key)
+                self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+        self.tagged.clear()
+
+    async def get_or_load(self, key, tags: list, load, envelope: bool = True):
+        """
+        Return (body, result). On a hit, body is the cached JSON and result is
+        None. On a miss, load() is awaited; successful results are serialized
+        (wrapped as {"data": result} when envelope is set) and cached. Failed
+        results come back as (None, result) and are not cached.
+        """
+        body = self.get(key)
+        if body is not None:
+            return body, None
+        
+        generation = self.generation
+        result = await load()
+        if not result or not result.get("success"):
+            return None, result
+        
+        body = json.dumps({"data": result} if envelope else result, default=str).encode("utf-8")
+        if generation == self.generation:
+            self.put(key, body, tags)
+        return body, result
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl
+        }
+
+
+response_cache = ResponseCache()
+register(Counter(
+    "claimd_read_cache_events_total", "Admin read cache hits, misses, evictions, expirations and invalidations.",
+    lambda: dict(response_cache.stats), label="event"
+))
+
+
+
+# --------------------------------------------------------
+# Content-addressed analysis cache (MongoDB, shared by all workers)
+# --------------------------------------------------------
+async def lookup_analysis(key: str):
+    """
+    Return the cached entry for `key` ({"application_id", "document_id", ...})
+    or None. Expired entries are ignored even before the TTL index removes them.
+    """
+    if ANALYSIS_CACHE_TTL <= 0:
+        return None
+    
+    entry = await db.analysis_cache.find_one_and_update(
+        {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"$inc": {"hits": 1}, "$set": {"last_hit_at": datetime.now(timezone.utc)}}
+    )
+    return entry
+
+
+async def store_analysis(key: str, application_id: str, document_id, prompt_version: str):
+    """Remember which application holds the analysis for `key`, then trim the cache to size."""
+    if ANALYSIS_CACHE_TTL <= 0:
+        return
+    
+    now = datetime.now(timezone.utc)
+    await db.analysis_cache.replace_one(
+        {"_id": key},
+        {
+            "application_id": application_id,
+            "document_id": document_id,
+            "prompt_version": prompt_version,
+            "hits": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ANALYSIS_CACHE_TTL)
+        },
+        upsert=True
+    )
+    
+    excess = await db.analysis_cache.estimated_document_count() - ANALYSIS_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = db.analysis_cache.find({}, {"_id": 1}).sort("created_at", 1).limit(excess)
+        await db.analysis_cache.delete_many({"_id": {"$in": [entry["_id"] async for entry in oldest]}})
+
+
+async def forget_analysis(key: str):
+    await db.analysis_cache.delete_one({"_id": key})
@@ -1,32 +1,60 @@
 # connectDB.py
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
 import os
-import certifi
+import sys
 
+# Add the backend directory to path to import the storage backends
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.storage.storage import create_storage, MONGO_WARM_CONNECTIONS
 
-# Load environment variables from .env file
-dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.env"))
-load_dotenv(dotenv_path)
+# The global storage: MongoDB (MONGO_URI, with the pool and timeout settings
+# in api/storage) or, with STORAGE_BACKEND=memory, an in-process store. It is
+# created on first use, normally by the app's lifespan handler, so importing
+# the backend does not build clients.
+_storage = None
 
-# Get MongoDB URI from environment
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "Main"
 
-if not MONGO_URI:
-    print("❌ MONGO_URI not found in environment variables!")
-    print(f"   Looking for .env at: {dotenv_path}")
-    raise ValueError("MONGO_URI is required but not found in .env file")
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
 
-# ✅ Create global Mongo client with SSL certificate verification
-client = AsyncIOMotorClient(
-    MONGO_URI,
-    tls=True,
-    tlsCAFile=certifi.where()
-)
 
-# Access specific database
-db = client[DB_NAME]
+async def open_storage(warm_connections: int = MONGO_WARM_CONNECTIONS):
+    """
+    Create the storage and open `warm_connections` pooled connections. A
+    database that cannot be reached yet is not fatal here; requests retry.
+    """
+    storage = get_storage()
+    if warm_connections > 0:
+        try:
+            await storage.warm(warm_connections)
+        except Exception as e:
+            print(f"⚠️ Could not open database connections: {e}")
+    return storage
 
-print("✅ MongoDB connection initialized (global client)")
-print(f"   Database: {DB_NAME}")
+
+def close_storage():
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+
+
+class LazyStorage:
+    """Stands in for an object of the storage until it exists; attribute and item access go through."""
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+
+# `from connectDB import db` keeps working in every module
+storage = LazyStorage(get_storage)
+client = LazyStorage(lambda: get_storage().client)
+db = LazyStorage(lambda: get_storage().db)
@@ -0,0 +1 @@
+from .documents import store_document, open_document
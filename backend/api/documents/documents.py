@@ -0,0 +1,166 @@
+import os
+import sys
+from io import BytesIO
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorGridOut
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db, storage
+
+# GridFS chunk size for stored PDFs, also used as the read size when streaming
+DOCUMENT_CHUNK_SIZE = int(os.getenv("DOCUMENT_CHUNK_SIZE", str(255 * 1024)))
+
+_bucket = None
+
+
+def get_bucket():
+    """The PDF bucket of the storage, created with the first document stored or read."""
+    global _bucket
+    if _bucket is None:
+        _bucket = storage.bucket("pdfs", DOCUMENT_CHUNK_SIZE)
+    return _bucket
+
+
+# --------------------------------------------------------
+# Store a PDF in GridFS
+# --------------------------------------------------------
+async def store_document(data, filename: str, document_type: str, content_type: str = "application/pdf", metadata: dict = None):
+    """
+    Write the PDF to GridFS chunk by chunk and return its file id as a string.
+    Unlike a single Binary field this is not bound by the 16 MB document limit.
+    `data` is bytes or a binary file object, which is read one chunk at a time.
+    `metadata` adds fields to the file's metadata.
+    """
+    grid_in = get_bucket().open_upload_stream(
+        filename,
+        metadata={
+            **(metadata or {}),
+            "content_type": content_type,
+            "document_type": document_type,
+            "uploaded_at": datetime.now(timezone.utc)
+        }
+    )
+    try:
+        # GridIn reads the buffer one chunk at a time; BytesIO shares the
+        # underlying bytes instead of copying them
+        await grid_in.write(data if hasattr(data, "read") else BytesIO(data))
+    except Exception:
+        await grid_in.abort()
+        raise
+    await grid_in.close()
+    return str(grid_in._id)
+
+
+# --------------------------------------------------------
+# Open a stored PDF for streaming
+# --------------------------------------------------------
+class StoredDocument:
+    """
+    A stored PDF that can be streamed in byte ranges. Backed by GridFS, or by
+    the legacy `documents` collection where the whole PDF is one Binary field.
+    """
+    def __init__(self, filename, content_type, length, grid_out=None, data=None):
+        self.filename = filename
+        self.content_type = content_type
+        self.length = length
+        self.grid_out = grid_out
+        self.data = data
+
+    async def iter_range(self, start: int, end: int):
+        """Yield the bytes from start to end (inclusive) in chunk-sized pieces."""
+        if self.grid_out is None:
+            view = memoryview(self.data)
+            for offset in range(start, end + 1, DOCUMENT_CHUNK_SIZE):
+                yield bytes(view[offset:min(offset + DOCUMENT_CHUNK_SIZE, end + 1)])
+            return
+        
+        self.grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await self.grid_out.read(min(DOCUMENT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def open_document(document_id: str):
+    """
+    Look up a document by id in GridFS, falling back to the legacy
+    `documents` collection. Returns None if it does not exist.
+    """
+    try:
+        object_id = ObjectId(document_id)
+    except InvalidId:
+        return None
+    
+    file_info = await db["pdfs.files"].find_one({"_id": object_id})
+    if file_info:
+        # Reuse the file document we already have instead of fetching it again
+        grid_out = AsyncIOMotorGridOut(db["pdfs"], file_document=file_info)
+        metadata = file_info.get("metadata") or {}
+        return StoredDocument(
+            file_info.get("filename") or "document.pdf",
+            metadata.get("content_type", "application/pdf"),
+            file_info["length"],
+            grid_out=grid_out
+        )
+    
+    legacy = await db.documents.find_one({"_id": object_id})
+    if legacy:
+        return StoredDocument(
+            legacy.get("filename") or "document.pdf",
+            legacy.get("content_type", "application/pdf"),
+            len(legacy["data"]),
+            data=legacy["data"]
+        )
+    
+    return None
+
+
+def parse_range(range_header: str, length: int):
+    """
+    Parse a single `bytes=start-end` Range header. Returns (start, end)
+    inclusive, None when the header should be ignored, or raises ValueError
+    when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        start = int(start_text) if start_text else None
+        end = int(end_text) if end_text else None
+    except ValueError:
+        # Malformed ranges are ignored and the whole document is sent
+        return None
+    
+    if start is None:
+        # Suffix range: the last `end` bytes
+        if not end or length == 0:
+            raise ValueError(f"Range not satisfiable: {range_header}")
+        return max(length - end, 0), length - 1
+    
+    if end is None:
+        end = length - 1
+    if start >= length or end < start:
+        raise ValueError(f"Range not satisfiable: {range_header}")
+    return start, min(end, length - 1)
+
+
+async def download_document(document_id: str, target):
+    """Copy a GridFS document into the file object `target`, one chunk at a time."""
+    grid_out = await get_bucket().open_download_stream(ObjectId(document_id))
+    while True:
+        chunk = await grid_out.read(DOCUMENT_CHUNK_SIZE)
+        if not chunk:
+            break
+        target.write(chunk)
+
+
+async def delete_document(document_id: str):
+    """Remove a GridFS document and its chunks."""
+    await get_bucket().delete(ObjectId(document_id))
@@ -0,0 +1 @@
+from .events import application_events, submission_events, event_hub
@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime, timezone, timedelta
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db, storage
+from api.read.read import bson_to_json
+from api.cache.cache import response_cache, application_tag, APPLICATIONS_TAG, QUEUE_TAG, USERS_TAG
+
+# EVENTS_MODE: "auto" uses a change stream when the deployment supports one
+# (replica set / Atlas) and falls back to polling otherwise; "poll" forces
+# polling. The poll interval and the keepalive interval are in seconds.
+EVENTS_MODE = os.getenv("EVENTS_MODE", "auto").lower()
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "2"))
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+# Events kept for clients reconnecting with Last-Event-ID, and events a slow
+# client may have pending before it is disconnected
+EVENT_HISTORY = 256
+SUBSCRIBER_QUEUE_SIZE = 512
+
+# Fields that change what the reviewer queue shows
+WATCHED_FIELDS = ["human_final", "final_decision", "admin_status"]
+
+# Fields sent with every event, enough to update a queue row in place
+EVENT_FIELDS = [
+    "application_id",
+    "final_decision",
+    "human_final",
+    "admin_status",
+    "claude_confidence_level",
+    "personal_information.name",
+    "created_at",
+]
+
+# Timestamps written by new submissions and by status/decision updates,
+# used by the polling fallback
+CHANGE_TIMESTAMPS = ["created_at", "status_updated_at", "decision_updated_at"]
+
+# Polling re-reads this far behind its watermark so writes whose timestamps
+# were taken just before the previous poll are not missed
+POLL_OVERLAP = timedelta(seconds=5)
+
+# Change stream error codes meaning "not supported on this deployment"
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324, 136}
+
+
+def change_stream_pipeline() -> list:
+    """Inserts plus updates touching the reviewer-visible fields, trimmed to EVENT_FIELDS"""
+    return [
+        {"$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace"]}},
+                {
+                    "operationType": "update",
+                    "$or": [{f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in WATCHED_FIELDS]
+                },
+            ]
+        }},
+        {"$project": {
+            "operationType": 1,
+            **{f"fullDocument.{field}": 1 for field in EVENT_FIELDS}
+        }},
+    ]
+
+
+def polling_filter(since: datetime) -> dict:
+    return {"$or": [{field: {"$gte": since}} for field in CHANGE_TIMESTAMPS]}
+
+
+def event_payload(document: dict) -> dict:
+    return bson_to_json({key: value for key, value in document.items() if key != "_id"})
+
+
+# --------------------------------------------------------
+# Broadcast hub
+# --------------------------------------------------------
+class EventHub:
+    """
+    Fans application changes out to connected reviewers. One watcher per
+    process reads the change stream (or polls), however many clients are
+    connected, so database load follows the write rate, not the viewer count.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.history = deque(maxlen=EVENT_HISTORY)
+        self.last_id = 0
+        self.mode = None
+        self.watcher = None
+
+    def publish(self, event_type: str, data: dict):
+        self.last_id += 1
+        event = (self.last_id, event_type, data)
+        self.history.append(event)
+
+        # Changes made by other workers also make this process's cached reads stale
+        response_cache.invalidate(APPLICATIONS_TAG, QUEUE_TAG, USERS_TAG, application_tag(data.get("application_id")))
+
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind; drop it and let the browser reconnect with Last-Event-ID
+                self.subscribers.discard(queue)
+
+    def subscribe(self, last_event_id: int = None) -> asyncio.Queue:
+        self.ensure_watcher()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if last_event_id is not None:
+            for event in self.history:
+                if event[0] > last_event_id:
+                    queue.put_nowait(event)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def ensure_watcher(self):
+        """Start the watcher with the first subscriber."""
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            await asyncio.gather(self.watcher, return_exceptions=True)
+            self.watcher = None
+
+    async def watch(self):
+        if EVENTS_MODE != "poll" and storage.supports_change_streams:
+            try:
+                await self.watch_change_stream()
+                return
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code not in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                print("⚠️ Change streams are not supported here; polling for application events")
+        await self.poll()
+
+    async def watch_change_stream(self):
+        self.mode = "change_stream"
+        resume_token = None
+        while True:
+            try:
+                async with db.applications.watch(
+                    change_stream_pipeline(),
+                    full_document="updateLookup",
+                    resume_after=resume_token
+                ) as stream:
+                    print("✅ Watching applications change stream")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        document = change.get("fullDocument")
+                        if not document:
+                            continue
+                        event_type = "application.created" if change["operationType"] == "insert" else "application.updated"
+                        self.publish(event_type, event_payload(document))
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                print(f"❌ Application change stream failed, resuming: {e}")
+                await asyncio.sleep(EVENTS_POLL_INTERVAL)
+            except PyMongoError as e:
+                print(f"❌ Application change stream failed, resuming: {e}")
+                await asyncio.sleep(EVENTS_POLL_INTERVAL)
+
+    async def poll(self):
+        """
+        Fallback for standalone mongod: query applications created or updated
+        since the last poll and publish the ones whose watched fields changed.
+        """
+        self.mode = "poll"
+        projection = {field: 1 for field in EVENT_FIELDS + CHANGE_TIMESTAMPS}
+        watermark = datetime.now(timezone.utc)
+        # application_id -> last published values, to skip rows re-read in the overlap window
+        seen = OrderedDict()
+
+        while True:
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+            try:
+                since = watermark - POLL_OVERLAP
+                cursor = db.applications.find(polling_filter(since), projection)
+                async for document in cursor:
+                    stamps = [document.get(field) for field in CHANGE_TIMESTAMPS if isinstance(document.get(field), datetime)]
+                    newest = max(stamps).replace(tzinfo=timezone.utc) if stamps else watermark
+                    watermark = max(watermark, newest)
+
+                    application_id = document.get("application_id")
+                    fingerprint = tuple(document.get(field) for field in WATCHED_FIELDS)
+                    if seen.get(application_id) == fingerprint:
+                        continue
+
+                    event_type = "application.updated" if application_id in seen else "application.created"
+                    created_at = document.get("created_at")
+                    if isinstance(created_at, datetime) and created_at.replace(tzinfo=timezone.utc) < since:
+                        event_type = "application.updated"
+
+                    seen[application_id] = fingerprint
+                    seen.move_to_end(application_id)
+                    if len(seen) > EVENT_HISTORY * 4:
+                        seen.popitem(last=False)
+
+                    for field in CHANGE_TIMESTAMPS[1:]:
+                        document.pop(field, None)
+                    self.publish(event_type, event_payload(document))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Could not poll for application events: {e}")
+
+
+event_hub = EventHub()
+
+
+# --------------------------------------------------------
+# Server-Sent Events stream
+# --------------------------------------------------------
+def format_event(event_id: int, event_type: str, data: dict) -> bytes:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+
+
+async def application_events(last_event_id: str = None):
+    """
+    Async generator of SSE frames for one reviewer. Sends the events missed
+    since `last_event_id` (when still in history), then live events, with a
+    comment line every EVENTS_KEEPALIVE seconds to keep proxies from closing
+    the connection.
+    """
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    queue = event_hub.subscribe(resume_from)
+    try:
+        yield f"retry: {int(EVENTS_POLL_INTERVAL * 1000)}\n\n".encode("utf-8")
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield format_event(*event)
+            if queue.empty() and queue not in event_hub.subscribers:
+                # Dropped for falling behind; the browser reconnects with Last-Event-ID
+                return
+    finally:
+        event_hub.unsubscribe(queue)
+
+
+# --------------------------------------------------------
+# Submission progress stream
+# --------------------------------------------------------
+async def submission_events(run, summarize):
+    """
+    Async generator of SSE frames for one submission. `run(progress)` starts
+    the analysis pipeline, reporting stages through progress(stage, data);
+    each stage is sent as an event of that name. The last event is
+    "complete" with summarize(result), or "error".
+
+    If the client goes away the pipeline still finishes, so the application
+    is saved and a retry is not needed to get it on record.
+    """
+    queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    def progress(stage: str, data: dict):
+        queue.put_nowait((stage, data))
+
+    task = asyncio.ensure_future(run(progress))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    event_id = 0
+    yield format_event(event_id, "accepted", {"elapsed_ms": 0})
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE)
+        except asyncio.TimeoutError:
+            yield b": keepalive\n\n"
+            continue
+        if item is None:
+            break
+        stage, data = item
+        event_id += 1
+        yield format_event(event_id, stage, {**data, "elapsed_ms": round((time.perf_counter() - started) * 1000)})
+
+    result = task.result()
+    event_id += 1
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    if result and result.get("success"):
+        yield format_event(event_id, "complete", {**summarize(result), "elapsed_ms": elapsed_ms})
+    else:
+        error = result.get("error", "Unknown error") if result else "No response from AI"
+        yield format_event(event_id, "error", {"success": False, "error": error, "elapsed_ms": elapsed_ms})
@@ -0,0 +1 @@
+from .indexes import ensure_indexes, explain_hot_queries
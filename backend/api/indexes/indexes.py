@@ -0,0 +1,150 @@
+import os
+import sys
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+from api.read.read import filtered_applications_pipeline
+from api.events.events import polling_filter
+
+# Index definitions by version: (collection, keys, options). Bump the version
+# (append a new entry) whenever an index is added or changed; ensure_indexes()
+# applies every definition up to the latest version.
+INDEX_VERSIONS = [
+    (1, [
+        ("users", [("socialSecurityNumber", ASCENDING)], {"unique": True, "name": "ssn_unique"}),
+        ("users", [("applications", ASCENDING)], {"name": "applications"}),
+        ("applications", [("application_id", ASCENDING)], {"unique": True, "name": "application_id_unique"}),
+        ("applications", [("human_final", ASCENDING), ("created_at", ASCENDING)], {"name": "review_queue"}),
+        ("applications", [("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "created_at_desc"}),
+        ("application_transcripts", [("application_id", ASCENDING)], {"unique": True, "name": "application_id_unique"}),
+        ("jobs", [("job_id", ASCENDING)], {"unique": True, "name": "job_id_unique"}),
+        ("jobs", [("status", ASCENDING), ("created_at", ASCENDING)], {"name": "status_created_at"}),
+    ]),
+    # Polling fallback of /api/events
+    (2, [
+        ("applications", [("status_updated_at", ASCENDING)], {"sparse": True, "name": "status_updated_at"}),
+        ("applications", [("decision_updated_at", ASCENDING)], {"sparse": True, "name": "decision_updated_at"}),
+    ]),
+    # Analysis cache: entries expire on their own; the oldest are trimmed first
+    (3, [
+        ("analysis_cache", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0, "name": "expires_at_ttl"}),
+        ("analysis_cache", [("created_at", ASCENDING)], {"name": "created_at"}),
+    ]),
+    # Backlog ingestion progress
+    (4, [
+        ("backlog_packets", [("packet_id", ASCENDING)], {"unique": True, "name": "packet_id_unique"}),
+        ("backlog_packets", [("status", ASCENDING), ("batch_id", ASCENDING)], {"name": "status_batch_id"}),
+    ]),
+    # Legacy local_storage import: one application per legacy claim
+    (5, [
+        ("applications", [("legacy_id", ASCENDING)], {"unique": True, "sparse": True, "name": "legacy_id_unique"}),
+        ("pdfs.files", [("metadata.legacy_id", ASCENDING)], {"sparse": True, "name": "legacy_id"}),
+    ]),
+    # Backlog ingestion: one application per claim packet
+    (6, [
+        ("applications", [("packet_id", ASCENDING)], {"unique": True, "sparse": True, "name": "packet_id_unique"}),
+    ]),
+]
+
+INDEX_VERSION = INDEX_VERSIONS[-1][0]
+
+
+# --------------------------------------------------------
+# Create indexes
+# --------------------------------------------------------
+async def ensure_indexes(force: bool = False):
+    """
+    Create any missing indexes and record the applied version in the
+    schema_meta collection. Costs a single read when already up to date.
+    """
+    meta = await db.schema_meta.find_one({"_id": "indexes"})
+    applied = meta.get("version", 0) if meta else 0
+    
+    if applied >= INDEX_VERSION and not force:
+        return {"success": True, "version": applied, "created": [], "errors": []}
+    
+    created, errors = [], []
+    for version, specs in INDEX_VERSIONS:
+        if version <= applied and not force:
+            continue
+        for collection, keys, options in specs:
+            try:
+                name = await db[collection].create_index(keys, **options)
+                created.append(f"{collection}.{name}")
+            except OperationFailure as e:
+                # e.g. duplicate SSNs blocking the unique index; keep going
+                # with the rest and report it
+                print(f"❌ Could not create index {collection}.{options.get('name')}: {e}")
+                errors.append({"index": f"{collection}.{options.get('name')}", "error": str(e)})
+    
+    if not errors:
+        await db.schema_meta.update_one(
+            {"_id": "indexes"},
+            {"$set": {"version": INDEX_VERSION, "applied_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        print(f"✅ Indexes at version {INDEX_VERSION}")
+    
+    return {
+        "success": not errors,
+        "version": INDEX_VERSION if not errors else applied,
+        "created": created,
+        "errors": errors
+    }
+
+
+# --------------------------------------------------------
+# Query plans for the hot queries
+# --------------------------------------------------------
+def hot_queries():
+    """(name, collection, filter or pipeline) for the queries that must use an index"""
+    return [
+        ("user by SSN", "users", {"socialSecurityNumber": "000-00-0000"}),
+        ("application by id", "applications", {"application_id": "00000000-0000-0000-0000-000000000000"}),
+        ("transcript by application id", "application_transcripts", {"application_id": "00000000-0000-0000-0000-000000000000"}),
+        ("review queue", "applications", filtered_applications_pipeline()),
+        ("user by application id", "users", {"applications": "00000000-0000-0000-0000-000000000000"}),
+        ("queued jobs", "jobs", {"status": "queued"}),
+        ("changed applications", "applications", polling_filter(datetime.now(timezone.utc))),
+    ]
+
+
+def plan_stages(plan) -> list:
+    """All stage names in the chosen plans of an explain() result"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+async def explain_hot_queries():
+    """
+    Run explain() for each hot query and report its plan stages. Any
+    COLLSCAN means the query lost its index.
+    """
+    results = []
+    for name, collection, query in hot_queries():
+        if isinstance(query, list):
+            explain = await db.command("aggregate", collection, pipeline=query, explain=True)
+        else:
+            explain = await db[collection].find(query).explain()
+        
+        stages = plan_stages(explain)
+        results.append({
+            "query": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return results
@@ -0,0 +1 @@
+from .jobs import enqueue_job, get_job_status, start_workers, stop_workers
@@ -0,0 +1,338 @@
+import os
+import sys
+import uuid
+import asyncio
+import tempfile
+from datetime import datetime, timezone, timedelta
+from starlette.datastructures import Headers, UploadFile
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+from api.ai.ai import ai
+from api.documents.documents import store_document, download_document, delete_document
+from api.uploads.uploads import UPLOAD_SPOOL_BYTES
+from api.metrics.metrics import register, Gauge
+
+# Number of background workers per process, how often idle workers re-check
+# the jobs collection, and how long a claimed job stays leased before another
+# worker may pick it up again (e.g. after a crash). The worker running a job
+# renews its lease every third of JOB_LEASE_SECONDS.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Claims per job before a job whose worker keeps disappearing is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+JOB_STATUSES = ["queued", "running", "done", "failed"]
+
+_worker_tasks = []
+_wakeup = asyncio.Event()
+
+
+async def queued_job_count() -> int:
+    # Counted on the (status, created_at) index
+    return await db.jobs.count_documents({"status": "queued"})
+
+
+jobs_queued = register(Gauge("claimd_jobs_queued", "Async submissions waiting for a job worker (all processes).", queued_job_count))
+jobs_running = register(Gauge("claimd_jobs_running", "Jobs this process's workers are running."))
+
+
+# --------------------------------------------------------
+# Enqueue a submission for background processing
+# --------------------------------------------------------
+async def enqueue_job(form_data: dict, medicalRecordsFile, incomeDocumentsFile, use_cache: bool = True):
+    """
+    Store the uploaded files in GridFS and the form data in the jobs
+    collection, and return the new job id. The files are read here so the
+    request can finish immediately. If anything fails, the files already
+    stored are removed again.
+    """
+    job_id = str(uuid.uuid4())
+    uploads = {}
+    try:
+        for field, upload in (("medicalRecordsFile", medicalRecordsFile), ("incomeDocumentsFile", incomeDocumentsFile)):
+            filename = upload.filename or f"{field}.pdf"
+            content_type = upload.content_type or "application/pdf"
+            await upload.seek(0)
+            uploads[field] = {
+                "filename": filename,
+                "content_type": content_type,
+                # Streamed from the spooled upload instead of read into memory
+                "document_id": await store_document(upload.file, filename, "job_upload", content_type)
+            }
+        
+        now = datetime.now(timezone.utc)
+        job_doc = {
+            "job_id": job_id,
+            "status": "queued",
+            "form_data": form_data,
+            "uploads": uploads,
+            "use_cache": use_cache,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+        
+        await db.jobs.insert_one(job_doc)
+    except Exception:
+        await delete_uploads({"job_id": job_id, "uploads": uploads})
+        raise
+    _wakeup.set()
+    
+    print(f"📥 Queued job {job_id}")
+    return job_id
+
+
+# --------------------------------------------------------
+# Read job status
+# --------------------------------------------------------
+async def get_job_status(job_id: str):
+    """
+    Return the public status of a job (without the stored upload bytes)
+    """
+    try:
+        job = await db.jobs.find_one({"job_id": job_id}, {"_id": 0, "uploads": 0, "form_data": 0, "lease_id": 0})
+        if not job:
+            return {"success": False, "error": f"No job found with ID {job_id}"}
+        
+        for key in ("created_at", "updated_at", "started_at", "finished_at", "lease_expires_at"):
+            if isinstance(job.get(key), datetime):
+                job[key] = job[key].isoformat()
+        
+        return {"success": True, "job": job}
+    
+    except Exception as e:
+        print(f"❌ Error in get_job_status(): {e}")
+        return {"success": False, "error": str(e)}
+
+
+# --------------------------------------------------------
+# Claim the oldest runnable job
+# --------------------------------------------------------
+async def claim_job():
+    """
+    Atomically move one job to "running" under a new lease id. Queued jobs
+    are taken first-in first-out; running jobs whose lease has expired are
+    picked up again until they have been claimed JOB_MAX_ATTEMPTS times.
+    """
+    now = datetime.now(timezone.utc)
+    return await db.jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$lt": JOB_MAX_ATTEMPTS}}
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "lease_id": str(uuid.uuid4()),
+                "started_at": now,
+                "updated_at": now,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS)
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=True
+    )
+
+
+async def fail_abandoned_job() -> bool:
+    """
+    Mark one job failed whose lease expired on its last allowed attempt (its
+    worker kept disappearing, e.g. crashing on it) and remove its uploads.
+    Returns False when there is none.
+    """
+    now = datetime.now(timezone.utc)
+    job = await db.jobs.find_one_and_update(
+        {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+        {
+            "$set": {
+                "status": "failed",
+                "error": f"Job did not finish after {JOB_MAX_ATTEMPTS} attempts",
+                "finished_at": now,
+                "updated_at": now
+            },
+            "$unset": {"uploads": "", "lease_id": "", "lease_expires_at": ""}
+        }
+    )
+    if not job:
+        return False
+    
+    print(f"❌ Job {job['job_id']} failed after {JOB_MAX_ATTEMPTS} attempts")
+    await delete_uploads(job)
+    return True
+
+
+async def keep_lease(job_id: str, lease_id: str):
+    """Renew a job's lease while it runs. Returns once another worker holds the lease."""
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        now = datetime.now(timezone.utc)
+        try:
+            result = await db.jobs.update_one(
+                {"job_id": job_id, "lease_id": lease_id},
+                {"$set": {"lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now}}
+            )
+        except Exception as e:
+            # Try again at the next renewal; the lease still has two thirds left
+            print(f"⚠️ Could not renew the lease of job {job_id}: {e}")
+            continue
+        if result.matched_count == 0:
+            return
+
+
+async def to_upload_file(upload: dict) -> UploadFile:
+    """
+    Rebuild an UploadFile from a stored upload so ai() can consume it
+    unchanged. The upload is streamed into a spooled file, which moves to
+    disk above UPLOAD_SPOOL_BYTES like a received upload.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    try:
+        await download_document(upload["document_id"], spooled)
+    except Exception:
+        spooled.close()
+        raise
+    size = spooled.tell()
+    spooled.seek(0)
+    return UploadFile(
+        file=spooled,
+        size=size,
+        filename=upload["filename"],
+        headers=Headers({"content-type": upload["content_type"]})
+    )
+
+
+async def delete_uploads(job: dict):
+    """Uploads are no longer needed once the job has finished."""
+    for upload in (job.get("uploads") or {}).values():
+        try:
+            await delete_document(upload["document_id"])
+        except Exception as e:
+            print(f"⚠️ Could not delete upload {upload['document_id']} for job {job['job_id']}: {e}")
+
+
+async def analyze_job(job: dict):
+    uploads = []
+    try:
+        for field in ("medicalRecordsFile", "incomeDocumentsFile"):
+            uploads.append(await to_upload_file(job["uploads"][field]))
+        return await ai(job["form_data"], *uploads, use_cache=job.get("use_cache", True))
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        for upload in uploads:
+            await upload.close()
+
+
+async def run_job(job: dict):
+    """
+    Run the ai() pipeline for a claimed job, renewing its lease meanwhile,
+    and record the outcome. If another worker takes over the lease, this
+    run is abandoned and records nothing.
+    """
+    job_id = job["job_id"]
+    lease_id = job["lease_id"]
+    print(f"⚙️  Running job {job_id} (attempt {job.get('attempts', 1)})")
+    
+    analysis = asyncio.create_task(analyze_job(job))
+    lease = asyncio.create_task(keep_lease(job_id, lease_id))
+    try:
+        await asyncio.wait({analysis, lease}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        lease.cancel()
+        if not analysis.done():
+            analysis.cancel()
+            await asyncio.gather(analysis, return_exceptions=True)
+    
+    if analysis.cancelled():
+        print(f"⚠️ Job {job_id} lost its lease to another worker; abandoning this run")
+        return
+    result = analysis.result()
+    
+    now = datetime.now(timezone.utc)
+    if result and result.get("success"):
+        update = {
+            "status": "done",
+            "application_id": result.get("application_id"),
+            "analysis": result.get("result", {})
+        }
+        print(f"✅ Job {job_id} done (application {update['application_id']})")
+    else:
+        update = {
+            "status": "failed",
+            "error": result.get("error", "Unknown error") if result else "No response from AI"
+        }
+        print(f"❌ Job {job_id} failed: {update['error']}")
+    
+    # Only the holder of the current lease records the outcome
+    recorded = await db.jobs.update_one(
+        {"job_id": job_id, "lease_id": lease_id},
+        {
+            "$set": {**update, "finished_at": now, "updated_at": now},
+            "$unset": {"uploads": "", "lease_id": "", "lease_expires_at": ""}
+        }
+    )
+    if recorded.matched_count == 0:
+        print(f"⚠️ Job {job_id} was taken over by another worker; its outcome is theirs to record")
+        return
+    
+    await delete_uploads(job)
+
+
+# --------------------------------------------------------
+# Worker pool
+# --------------------------------------------------------
+async def worker_loop(worker_number: int):
+    while True:
+        _wakeup.clear()
+        try:
+            job = await claim_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Job worker {worker_number} could not claim a job: {e}")
+            job = None
+        
+        if job:
+            try:
+                with jobs_running.track():
+                    await run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Job worker {worker_number} could not record job {job['job_id']}: {e}")
+            continue
+        
+        try:
+            if await fail_abandoned_job():
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Job worker {worker_number} could not check for abandoned jobs: {e}")
+        
+        # Nothing to do: sleep until a new job is queued or the poll interval passes
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(count: int = JOB_WORKERS):
+    """Start `count` background job workers on the running event loop."""
+    for worker_number in range(count):
+        _worker_tasks.append(asyncio.create_task(worker_loop(worker_number)))
+    print(f"✅ Started {count} job workers")
+
+
+async def stop_workers():
+    """Cancel all running job workers. Leased jobs are retried after their lease expires."""
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
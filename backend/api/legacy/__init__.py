@@ -0,0 +1 @@
+from .legacy import import_legacy, group_claims
@@ -0,0 +1,317 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import uuid
+import asyncio
+import tempfile
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+from api.ai.ai import cover_fields, merge_pdfs
+from api.backlog.backlog import packet_form, file_label, order_files, index_pdfs, is_pdf
+from api.documents.documents import store_document, delete_document
+from api.schema.schema import compact_application
+
+# Applications per insert_many, and claims merged and streamed into GridFS at once
+LEGACY_IMPORT_BATCH_SIZE = int(os.getenv("LEGACY_IMPORT_BATCH_SIZE", "100"))
+LEGACY_IMPORT_WORKERS = int(os.getenv("LEGACY_IMPORT_WORKERS", "4"))
+
+# The file-based intake suffixed every file with the time of the upload
+TIMESTAMP = re.compile(r"_(\d{8}_\d{6})\.(?:pdf|json)$")
+
+LEGACY_SUMMARY = "Imported from the file-based intake; no analysis on record."
+
+# MongoDB duplicate key error
+DUPLICATE_KEY = 11000
+
+
+# --------------------------------------------------------
+# Group the archive into claims
+# --------------------------------------------------------
+def file_timestamp(filename: str):
+    match = TIMESTAMP.search(filename)
+    return match.group(1) if match else None
+
+
+def parse_submission_date(value) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def group_claims(root: str):
+    """
+    Walk a local_storage tree and group its files into claims. Uploads that
+    share a timestamp belong to one submission; the form_submission_*.json
+    that lists them (in pdf_document_ids, as paths from the machine that
+    wrote them) supplies the applicant. Paths are remapped to the PDFs under
+    `root` by file name.
+
+    Returns (claims, incomplete): incomplete lists the upload timestamps
+    without a form, or with a form but no applicant SSN, which cannot be
+    tied to a user and are not imported.
+    """
+    pdfs = index_pdfs(root)
+    uploads = {}
+    for name, path in pdfs.items():
+        timestamp = file_timestamp(name)
+        if timestamp:
+            uploads.setdefault(timestamp, {})[name] = path
+
+    claims, claimed = [], set()
+    incomplete = []
+    for form_path in sorted(glob.glob(os.path.join(root, "**", "form_submission_*.json"), recursive=True)):
+        with open(form_path, "r", encoding="utf-8") as f:
+            try:
+                form = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Skipping {form_path}: {e}")
+                continue
+
+        listed = [os.path.basename(path) for path in form.get("pdf_document_ids", [])]
+        timestamps = {file_timestamp(name) for name in listed} - {None}
+        names = set(listed)
+        for timestamp in timestamps:
+            names.update(uploads.get(timestamp, {}))
+        claimed.update(timestamps)
+
+        form_data = packet_form(form.get("applicant_info", {}))
+        legacy_id = "legacy_" + (file_timestamp(os.path.basename(form_path)) or os.path.basename(form_path))
+        if not form_data["socialSecurityNumber"]:
+            incomplete.append(legacy_id)
+            continue
+
+        files, skipped = [], []
+        for name in sorted(names):
+            path = pdfs.get(name)
+            if path is None:
+                skipped.append(f"{name}: not found")
+            elif not is_pdf(path):
+                skipped.append(f"{name}: not a PDF")
+            else:
+                files.append({"label": file_label(name), "filename": name, "path": path})
+
+        claims.append({
+            "legacy_id": legacy_id,
+            "form_path": os.path.relpath(form_path, root),
+            "form_data": form_data,
+            "created_at": parse_submission_date(form.get("submission_date")),
+            "files": order_files(files),
+            "skipped": skipped,
+        })
+
+    incomplete.extend(f"legacy_{timestamp}" for timestamp in sorted(set(uploads) - claimed))
+    return claims, incomplete
+
+
+# --------------------------------------------------------
+# Import
+# --------------------------------------------------------
+async def build_application(claim: dict, root: str) -> dict:
+    """
+    Merge a claim's PDFs behind a cover page, stream the merged file into
+    GridFS and return its application document (not yet inserted).
+    """
+    merged_fd, merged_path = tempfile.mkstemp(prefix="legacy-", suffix=".pdf")
+    os.close(merged_fd)
+    try:
+        await merge_pdfs(cover_fields(claim["form_data"]), [file["path"] for file in claim["files"]], merged_path)
+        with open(merged_path, "rb") as merged_file:
+            document_id = await store_document(
+                merged_file, "combined_document.pdf", "combined_document", metadata={"legacy_id": claim["legacy_id"]}
+            )
+        document = {
+            "document_id": document_id,
+            "filename": "combined_document.pdf",
+            "document_type": "combined_document",
+            "storage": "gridfs",
+            "length": os.path.getsize(merged_path)
+        }
+    finally:
+        os.unlink(merged_path)
+
+    form_data = claim["form_data"]
+    application = compact_application(
+        str(uuid.uuid4()),
+        {
+            "summary": LEGACY_SUMMARY,
+            "personal_information": {
+                "name": f"{form_data['firstName']} {form_data['lastName']}".strip(),
+                "date_of_birth": form_data["dateOfBirth"],
+            },
+        },
+        document,
+        claim["created_at"]
+    )
+    # Archived claims were handled under the old intake: human_final=True
+    # keeps them out of the review queue; final_decision stays UNKNOWN
+    application["human_final"] = True
+    application["legacy_id"] = claim["legacy_id"]
+    application["legacy_source"] = {
+        "root": os.path.abspath(root),
+        "form": claim["form_path"],
+        "files": [os.path.relpath(file["path"], root) for file in claim["files"]],
+        "skipped": claim["skipped"],
+    }
+    return application
+
+
+async def link_users(links: list):
+    """
+    Upsert the users for (name, ssn, application_id) links in one unordered
+    bulk write. $addToSet makes it safe to repeat. An upsert that loses a
+    race for a new SSN fails with a duplicate key error and is retried once,
+    when it finds the user.
+    """
+    operations = [
+        UpdateOne(
+            {"socialSecurityNumber": ssn},
+            {
+                "$addToSet": {"applications": application_id},
+                "$setOnInsert": {"user_id": str(uuid.uuid4()), "name": name, "created_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+        for name, ssn, application_id in links
+    ]
+    for attempt in range(2):
+        if not operations:
+            return
+        try:
+            await db.users.bulk_write(operations, ordered=False)
+            return
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if attempt == 1 or any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            operations = [operations[error["index"]] for error in errors]
+
+
+async def insert_applications(batch: list) -> int:
+    """
+    insert_many(ordered=False) a batch of (claim, application). Claims that
+    are already in the collection (the unique legacy_id index rejects them)
+    drop the document stored for them. Returns the number inserted.
+    """
+    if not batch:
+        return 0
+    duplicates = set()
+    try:
+        await db.applications.insert_many([application for _, application in batch], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+
+    links = []
+    for index, (claim, application) in enumerate(batch):
+        if index in duplicates:
+            await delete_document(application["documents"]["document_id"])
+            continue
+        form_data = claim["form_data"]
+        links.append((f"{form_data['firstName']} {form_data['lastName']}".strip(), form_data["socialSecurityNumber"], application["application_id"]))
+    await link_users(links)
+    return len(links)
+
+
+async def resume_state(claims: list) -> dict:
+    """
+    legacy_id -> application_id of the claims imported by an earlier run.
+    Their user links are written again (a run may have stopped between the
+    two writes), and GridFS files stored for claims that never made it into
+    the applications collection are removed.
+    """
+    ids = [claim["legacy_id"] for claim in claims]
+    imported, documents = {}, set()
+    async for application in db.applications.find(
+        {"legacy_id": {"$in": ids}}, {"legacy_id": 1, "application_id": 1, "documents.document_id": 1}
+    ):
+        imported[application["legacy_id"]] = application["application_id"]
+        documents.add((application.get("documents") or {}).get("document_id"))
+
+    async for stored in db["pdfs.files"].find({"metadata.legacy_id": {"$in": ids}}, {"_id": 1}):
+        if str(stored["_id"]) not in documents:
+            await delete_document(str(stored["_id"]))
+
+    by_id = {claim["legacy_id"]: claim for claim in claims}
+    await link_users([
+        (f"{by_id[legacy_id]['form_data']['firstName']} {by_id[legacy_id]['form_data']['lastName']}".strip(),
+         by_id[legacy_id]["form_data"]["socialSecurityNumber"], application_id)
+        for legacy_id, application_id in imported.items()
+    ])
+    return imported
+
+
+async def import_legacy(root: str, batch_size: int = LEGACY_IMPORT_BATCH_SIZE, workers: int = LEGACY_IMPORT_WORKERS,
+                        dry_run: bool = False) -> dict:
+    """
+    Import the claims of a local_storage tree into applications, users and
+    GridFS. `workers` claims are merged and streamed in at once; finished
+    applications are inserted batch_size at a time. Safe to re-run: claims
+    already imported are skipped. Returns counts and the throughput.
+    """
+    claims, incomplete = group_claims(root)
+    summary = {"claims": len(claims), "imported": 0, "already_imported": 0, "incomplete": len(incomplete), "failed": 0}
+    if incomplete:
+        print(f"⚠️ {len(incomplete)} submissions have no usable form and are not imported: {', '.join(incomplete[:10])}")
+
+    imported = await resume_state(claims) if not dry_run else {}
+    summary["already_imported"] = len(imported)
+    todo = [claim for claim in claims if claim["legacy_id"] not in imported]
+    if dry_run:
+        for claim in todo:
+            print(f"📄 {claim['legacy_id']}: {len(claim['files'])} PDFs, {len(claim['skipped'])} skipped")
+        return summary
+
+    queue = asyncio.Queue()
+    for claim in todo:
+        queue.put_nowait(claim)
+    batch = []
+    start = time.perf_counter()
+
+    async def flush():
+        nonlocal batch
+        pending, batch = batch, []
+        summary["imported"] += await insert_applications(pending)
+        elapsed = time.perf_counter() - start
+        print(f"📝 {summary['imported']}/{len(todo)} claims imported ({summary['imported'] / elapsed:.1f} claims/s)")
+
+    async def worker():
+        while True:
+            try:
+                claim = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if not claim["files"]:
+                print(f"❌ {claim['legacy_id']}: no PDFs ({'; '.join(claim['skipped'])})")
+                summary["failed"] += 1
+                continue
+            try:
+                application = await build_application(claim, root)
+            except Exception as e:
+                print(f"❌ {claim['legacy_id']}: {e}")
+                summary["failed"] += 1
+                continue
+            # After the await: a flush may have replaced the batch meanwhile
+            batch.append((claim, application))
+            if len(batch) >= batch_size:
+                await flush()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    if batch:
+        await flush()
+
+    elapsed = time.perf_counter() - start
+    summary["seconds"] = round(elapsed, 2)
+    summary["claims_per_second"] = round(summary["imported"] / elapsed, 2) if elapsed > 0 else 0
+    return summary
@@ -0,0 +1 @@
+from .metrics import render, observe, timed, timed_query, timed_cursor, MetricsMiddleware
@@ -0,0 +1,275 @@
+import os
+import time
+import inspect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# SERVER_TIMING=false stops sending the per-request stage timings to clients
+# in the Server-Timing header; /metrics is unaffected
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() != "false"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket bounds in seconds: pipeline stages run from milliseconds (encoding)
+# to minutes (the model); database calls are expected well under a second
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+# --------------------------------------------------------
+# Metric types (Prometheus text exposition format)
+# --------------------------------------------------------
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative histogram per label set. Observations come from the event loop
+    and from the threads the drivers use, hence the lock.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.series = {}   # label values -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self.series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(float(bound))}"'
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {count}"
+
+
+class Gauge:
+    """
+    A value set or moved by the code, or read from `function` at scrape time
+    (sync or async). A function may return {value of `label`: number}.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, function=None, label: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.label = label
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    @contextmanager
+    def track(self):
+        """Count the block as in progress while it runs."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    async def read(self):
+        if self.function is None:
+            return self.value
+        value = self.function()
+        return await value if inspect.isawaitable(value) else value
+
+
+class Counter(Gauge):
+    """A gauge that only goes up; here always read from a function, e.g. existing stats."""
+
+    type = "counter"
+
+
+# --------------------------------------------------------
+# Registry
+# --------------------------------------------------------
+registry = []
+
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+
+async def render() -> str:
+    """All metrics in the Prometheus text format."""
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if isinstance(metric, Histogram):
+            lines.extend(metric.samples())
+            continue
+        try:
+            value = await metric.read()
+        except Exception as e:
+            print(f"⚠️ Could not read metric {metric.name}: {e}")
+            continue
+        if isinstance(value, dict):
+            for label, number in sorted(value.items()):
+                lines.append(f"{metric.name}{format_labels((metric.label,), (label,))} {format_value(number)}")
+        else:
+            lines.append(f"{metric.name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = register(Histogram(
+    "claimd_stage_seconds", "Time spent in each stage of a submission.", ("stage",)
+))
+db_operation_seconds = register(Histogram(
+    "claimd_db_operation_seconds", "Time spent waiting on MongoDB per admin read operation.",
+    ("function", "operation"), DB_BUCKETS
+))
+http_request_seconds = register(Histogram(
+    "claimd_http_request_seconds", "Time until the response headers were sent, per route.", ("method", "route")
+))
+requests_in_flight = register(Gauge("claimd_http_requests_in_flight", "HTTP requests being handled."))
+
+
+# --------------------------------------------------------
+# Timing
+# --------------------------------------------------------
+# Stage name -> seconds for the request being handled (Server-Timing)
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def record(name: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def observe(stage: str, seconds: float):
+    """Record a pipeline stage (stage_seconds, and the Server-Timing of the current request)."""
+    stage_seconds.observe(seconds, stage)
+    record(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block as a pipeline stage, e.g. `with timed("pdf_merge"):`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def timed_query(function: str, operation: str):
+    """Time one database call, e.g. timed_query("read_all_users", "users.find")."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        db_operation_seconds.observe(elapsed, function, operation)
+        record(f"db_{function}", elapsed)
+
+
+async def timed_cursor(cursor, function: str, operation: str):
+    """
+    Iterate a cursor, timing only the waits on the database (the first batch
+    and every getMore), not the work done on each document in between.
+    """
+    elapsed = 0.0
+    iterator = cursor.__aiter__()
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                document = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield document
+    finally:
+        db_operation_seconds.observe(elapsed, function, operation)
+        record(f"db_{function}", elapsed)
+
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+# --------------------------------------------------------
+# ASGI middleware
+# --------------------------------------------------------
+class MetricsMiddleware:
+    """
+    Counts requests in flight, times each request per route and adds the
+    stages timed while handling it as a Server-Timing header. Stages that end
+    after the headers are sent (streamed responses) only reach /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                http_request_seconds.observe(elapsed, scope["method"], getattr(route, "path", "unmatched"))
+                if SERVER_TIMING:
+                    timings["total"] = elapsed
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", server_timing(timings).encode("latin-1"))
+                    ]}
+            await send(message)
+
+        try:
+            with requests_in_flight.track():
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -1,16 +1,33 @@
 import os
+import re
+import json
+import base64
 from bson import ObjectId
-from dotenv import load_dotenv
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from connectDB import db
-import base64
-from bson import Binary
-
-
-# Load environment
-dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.env"))
-load_dotenv(dotenv_path)
+from api.schema.schema import full_analysis, load_transcript
+from api.cache.cache import response_cache, application_tag, APPLICATIONS_TAG, QUEUE_TAG
+from api.metrics.metrics import timed_query, timed_cursor
+
+
+# Users fetched per round trip by the full dump (READ_BATCH_SIZE in .env)
+READ_BATCH_SIZE = int(os.getenv("READ_BATCH_SIZE", "200"))
+
+# Application list paging and the columns the admin list view shows
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LIST_FIELDS = [
+    "application_id",
+    "claude_confidence_level",
+    "claude_summary",
+    "final_decision",
+    "human_final",
+    "admin_status",
+    "personal_information.name",
+    "created_at",
+]
+FIELD_NAME = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
 
 # --------------------------------------------------------
 # Utility: Convert MongoDB BSON → JSON-safe
@@ -42,22 +59,19 @@ async def read_application_by_id(application_id: str):
     """
     Given an application_id, find and return the full application data
     """
-    print(f"Fetching application: {application_id}")
     try:
-        app = await db.applications.find_one({"application_id": application_id})
+        # The raw model transcript is only loaded on request (/transcript)
+        with timed_query("read_application_by_id", "applications.find_one"):
+            app = await db.applications.find_one({"application_id": application_id}, {"raw_claude_response": 0})
         if not app:
             return {"success": False, "error": f"No application found with application_id {application_id}"}
         
-        docs = app["documents"]
-        doc_id = docs["document_id"]
-        print(doc_id)
-                
-        doc = await db.documents.find_one({"_id": ObjectId(doc_id)})
-        
-        if not doc:
-            return {"success": False, "application": bson_to_json(app)} 
+        app["full_analysis"] = full_analysis(app)
         
-        app["document"] = base64.b64encode(doc["data"]).decode("utf-8")
+        # The PDF itself is streamed separately from /api/document/{id}
+        doc_id = (app.get("documents") or {}).get("document_id")
+        if doc_id:
+            app["document_url"] = document_url(doc_id)
 
         return {"success": True, "application": bson_to_json(app)}
 
@@ -67,57 +81,117 @@ async def read_application_by_id(application_id: str):
 
 
 # --------------------------------------------------------
-# Main read function
+# Paginated application list
 # --------------------------------------------------------
-async def read_all_applications():
+def encode_cursor(app: Dict[str, Any]) -> str:
+    """Opaque cursor for the position of `app` in (created_at, _id) order"""
+    created_at = app.get("created_at")
+    position = {
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "_id": str(app["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    created_at = position.get("created_at")
+    return {
+        "created_at": datetime.fromisoformat(created_at) if created_at else None,
+        "_id": ObjectId(position["_id"])
+    }
+
+
+def list_projection(fields: Optional[str]):
+    """
+    Projection for the application list. Defaults to the list-view columns;
+    `fields` is a comma-separated list of extra/alternative fields, or "all".
+    """
+    if fields == "all":
+        return None
+    
+    names = LIST_FIELDS if not fields else [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if not FIELD_NAME.match(name):
+            raise ValueError(f"Invalid field name: {name}")
+    
+    # The cursor needs created_at and _id
+    projection = {name: 1 for name in names}
+    projection.update({"application_id": 1, "created_at": 1, "_id": 1})
+    return projection
+
+
+async def read_all_applications(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, fields: Optional[str] = None):
     """
-    Get all applications from the database for admin dashboard
+    Get one page of applications for the admin dashboard, newest first.
+    Pass the returned next_cursor as `after` to get the following page.
     """
-    print("Fetching all applications")
     try:
-        # Find all applications
-        cursor = db.applications.find({})
-        applications = []
+        projection = list_projection(fields)
+        
+        query = {}
+        if after:
+            try:
+                position = decode_cursor(after)
+            except Exception:
+                return {"success": False, "error": "Invalid cursor"}
+            # Keyset: everything strictly after the cursor in (created_at, _id) desc order
+            query = {"$or": [
+                {"created_at": {"$lt": position["created_at"]}},
+                {"created_at": position["created_at"], "_id": {"$lt": position["_id"]}}
+            ]}
         
-        async for app in cursor:
-            applications.append(bson_to_json(app))
+        cursor = db.applications.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+        with timed_query("read_all_applications", "applications.find"):
+            page = await cursor.to_list(length=limit + 1)
+        
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1]) if has_more and page else None
 
         response_data = {
             "success": True,
-            "applications": applications,
-            "application_count": len(applications)
+            "applications": [bson_to_json(app) for app in page],
+            "application_count": len(page),
+            "next_cursor": next_cursor
         }
 
         return response_data
 
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
         print(f"❌ Error in read_all_applications(): {e}")
         return {"success": False, "error": str(e)}
 
-async def get_document_data(document_ref: Dict[str, Any]):
+async def read_application_transcript(application_id: str):
+    """
+    Get the raw model output for an application from cold storage
+    """
     try:
-        if not document_ref or "document_id" not in document_ref:
-            return None
-        
-        document_id = document_ref["document_id"]
-        doc = await db.documents.find_one({"_id": ObjectId(document_id)})
+        with timed_query("read_application_transcript", "application_transcripts.find_one"):
+            transcript = await load_transcript(application_id)
+        if transcript is None:
+            return {"success": False, "error": f"No transcript found for application {application_id}"}
         
-        if not doc:
-            return None
-
-        return doc.get["data"]
+        return {"success": True, "application_id": application_id, "raw_claude_response": transcript}
+    
     except Exception as e:
-        print(f"ERROR FETCHING DOCUMENT DATA: {e}")
-        return None
+        print(f"❌ Error in read_application_transcript(): {e}")
+        return {"success": False, "error": str(e)}
+
+def document_url(document_id: str) -> str:
+    """URL the frontend uses to stream a stored PDF"""
+    return f"/api/document/{document_id}"
 
 async def read_applications_by_user_ssn(ssn: str):
     """
     Get all applications for a specific user by their SSN
     """
-    print(f"Fetching applications for user with SSN: {ssn}")
     try:
         # First find the user by SSN
-        user = await db.users.find_one({"socialSecurityNumber": ssn})
+        with timed_query("read_applications_by_user_ssn", "users.find_one"):
+            user = await db.users.find_one({"socialSecurityNumber": ssn})
         
         if not user:
             return {"success": False, "error": f"No user found with SSN {ssn}"}
@@ -137,13 +211,12 @@ async def read_applications_by_user_ssn(ssn: str):
         cursor = db.applications.find({"application_id": {"$in": application_ids}})
         applications = []
         
-        async for app in cursor:
+        async for app in timed_cursor(cursor, "read_applications_by_user_ssn", "applications.find"):
             app_json = bson_to_json(app)
             
-            document_ref = app.get("documents")
-            document_data = await get_document_data(document_ref)
-            
-            app_json["document_full"] = document_data
+            document_ref = app.get("documents") or {}
+            if document_ref.get("document_id"):
+                app_json["document_url"] = document_url(document_ref["document_id"])
             
             applications.append(app_json)
 
@@ -173,20 +246,22 @@ async def update_application_status(application_id: str, status: str, admin_note
             return {"success": False, "error": f"Invalid status. Must be one of: {valid_statuses}"}
         
         # Update the application
-        result = await db.applications.update_one(
-            {"application_id": application_id},
-            {
-                "$set": {
-                    "admin_status": status.upper(),
-                    "admin_notes": admin_notes,
-                    "status_updated_at": datetime.now(timezone.utc)
+        with timed_query("update_application_status", "applications.update_one"):
+            result = await db.applications.update_one(
+                {"application_id": application_id},
+                {
+                    "$set": {
+                        "admin_status": status.upper(),
+                        "admin_notes": admin_notes,
+                        "status_updated_at": datetime.now(timezone.utc)
+                    }
                 }
-            }
-        )
+            )
         
         if result.matched_count == 0:
             return {"success": False, "error": f"No application found with ID {application_id}"}
         
+        response_cache.invalidate(APPLICATIONS_TAG, QUEUE_TAG, application_tag(application_id))
         print(f"✅ Application {application_id} status updated to {status}")
         return {"success": True, "message": f"Application status updated to {status}"}
 
@@ -197,12 +272,10 @@ async def update_application_status(application_id: str, status: str, admin_note
 
 async def get_pending_users():
     try:
-        print("Fetching pending users")
-        
         users_cursor = db.users.find({})
         users = []
         
-        async for user in users_cursor:
+        async for user in timed_cursor(users_cursor, "get_pending_users", "users.find"):
             users.append({
                 "user_id": user.get("user_id"),
                 "name": user.get("name"),
@@ -216,39 +289,53 @@ async def get_pending_users():
         print(f"❌ Error in read_all_users(): {e}")
         return {"success": False, "error": str(e)}
 
+def filtered_applications_pipeline():
+    """
+    Aggregation for the reviewer queue: applications still awaiting a human
+    decision, joined with the user who submitted them. Runs as a single
+    server-side query on the (human_final, created_at) index.
+    """
+    return [
+        {"$match": {"human_final": False}},
+        {"$sort": {"created_at": 1}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "application_id",
+            "foreignField": "applications",
+            "as": "user",
+            "pipeline": [
+                {"$project": {"_id": 0, "user_id": 1, "name": 1, "socialSecurityNumber": 1, "email": 1, "phone": 1}}
+            ]
+        }},
+        # Applications that no user links to are not part of the queue
+        {"$unwind": "$user"}
+    ]
+
+
 async def get_filtered_applications():
     """
     Get all applications where human_final is False, with user details appended
     """
     try:
-        print("Fetching filtered applications (human_final = False)")
-        
-        # Get all users
-        users_cursor = db.users.find({})
+        cursor = db.applications.aggregate(filtered_applications_pipeline())
         filtered_applications = []
         
-        async for user in users_cursor:
-            # Get application IDs for this user
-            app_ids = user.get("applications", [])
+        async for app in timed_cursor(cursor, "get_filtered_applications", "applications.aggregate"):
+            user = app.pop("user")
             
-            # Fetch each application
-            for app_id in app_ids:
-                app = await db.applications.find_one({"application_id": app_id})
-                
-                if app and app.get("human_final") == False:
-                    # Convert to JSON-safe format
-                    app_json = bson_to_json(app)
-                    
-                    # Append user details
-                    app_json["user_details"] = {
-                        "user_id": user.get("user_id"),
-                        "name": user.get("name"),
-                        "socialSecurityNumber": user.get("socialSecurityNumber"),
-                        "email": user.get("email"),
-                        "phone": user.get("phone")
-                    }
-                    
-                    filtered_applications.append(app_json)
+            # Convert to JSON-safe format
+            app_json = bson_to_json(app)
+            
+            # Append user details
+            app_json["user_details"] = {
+                "user_id": user.get("user_id"),
+                "name": user.get("name"),
+                "socialSecurityNumber": user.get("socialSecurityNumber"),
+                "email": user.get("email"),
+                "phone": user.get("phone")
+            }
+            
+            filtered_applications.append(app_json)
         
         return {
             "success": True,
@@ -266,12 +353,10 @@ async def read_all_users():
     Get all users with basic info (no full application data)
     """
     try:
-        print("Fetching all users")
-        
         users_cursor = db.users.find({})
         users = []
         
-        async for user in users_cursor:
+        async for user in timed_cursor(users_cursor, "read_all_users", "users.find"):
             users.append({
                 "user_id": user.get("user_id"),
                 "name": user.get("name"),
@@ -286,33 +371,53 @@ async def read_all_users():
         return {"success": False, "error": str(e)}
 
 
+async def iter_users_with_applications(batch_size: int = READ_BATCH_SIZE):
+    """
+    Yield each user with their full applications. Users are read in batches
+    and each batch's applications are fetched with a single $in query, so
+    memory stays bounded by the batch size.
+    """
+    users_cursor = db.users.find({}).batch_size(batch_size)
+    batch = []
+    
+    async for user in timed_cursor(users_cursor, "iter_users_with_applications", "users.find"):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            async for user_with_apps in join_applications(batch):
+                yield user_with_apps
+            batch = []
+    
+    if batch:
+        async for user_with_apps in join_applications(batch):
+            yield user_with_apps
+
+
+async def join_applications(users: list):
+    """Fetch the applications for a batch of users in one query and attach them."""
+    app_ids = [app_id for user in users for app_id in user.get("applications", [])]
+    apps_by_id = {}
+    
+    if app_ids:
+        cursor = db.applications.find({"application_id": {"$in": app_ids}})
+        async for app in timed_cursor(cursor, "join_applications", "applications.find"):
+            apps_by_id[app["application_id"]] = bson_to_json(app)
+    
+    for user in users:
+        # Keep the user's own application order
+        applications = [apps_by_id[app_id] for app_id in user.get("applications", []) if app_id in apps_by_id]
+        yield {
+            **bson_to_json(user),
+            "applications_full": applications,
+            "application_count": len(applications)
+        }
+
+
 async def read():
     """
     Get all users and all their applications (full data)
     """
     try:
-        print("Fetching all users with their applications")
-
-        users_cursor = db.users.find({})
-        users_with_apps = []
-
-        async for user in users_cursor:
-            # Extract application IDs for this user
-            app_ids = user.get("applications", [])
-            applications = []
-
-            # Fetch each application by ID
-            for app_id in app_ids:
-                app = await db.applications.find_one({"application_id": app_id})
-                if app:
-                    applications.append(bson_to_json(app))
-
-            # Add user + their applications to list
-            users_with_apps.append({
-                **bson_to_json(user),
-                "applications_full": applications,
-                "application_count": len(applications)
-            })
+        users_with_apps = [user async for user in iter_users_with_applications()]
 
         # Final response
         return {
@@ -326,6 +431,25 @@ async def read():
         return {"success": False, "error": str(e)}
 
 
+async def stream_read():
+    """
+    Stream the same {"data": {...}} body as read() as a chunked JSON document,
+    one user at a time. The first bytes go out before any query has finished.
+    Totals and the success flag come last since they are only known at the end.
+    """
+    yield '{"data": {"users": ['
+    
+    total_users = 0
+    try:
+        async for user in iter_users_with_applications():
+            yield ("," if total_users else "") + json.dumps(user, default=str)
+            total_users += 1
+        yield f'], "total_users": {total_users}, "success": true}}}}'
+    
+    except Exception as e:
+        print(f"❌ Error in stream_read(): {e}")
+        yield f'], "total_users": {total_users}, "success": false, "error": {json.dumps(str(e))}}}}}'
+
 
 async def approve_application(application_id: str):
     """
@@ -333,20 +457,22 @@ async def approve_application(application_id: str):
     """
     print(f"Approving application: {application_id}")
     try:
-        result = await db.applications.update_one(
-            {"application_id": application_id},
-            {
-                "$set": {
-                    "human_final": True,
-                    "final_decision": "APPROVE",
-                    "decision_updated_at": datetime.now(timezone.utc)
+        with timed_query("approve_application", "applications.update_one"):
+            result = await db.applications.update_one(
+                {"application_id": application_id},
+                {
+                    "$set": {
+                        "human_final": True,
+                        "final_decision": "APPROVE",
+                        "decision_updated_at": datetime.now(timezone.utc)
+                    }
                 }
-            }
-        )
+            )
 
         if result.matched_count == 0:
             return {"success": False, "error": f"No application found with ID {application_id}"}
 
+        response_cache.invalidate(APPLICATIONS_TAG, QUEUE_TAG, application_tag(application_id))
         print(f"✅ Application {application_id} approved")
         return {
             "success": True,
@@ -369,20 +495,22 @@ async def deny_application(application_id: str):
     """
     print(f"Denying application: {application_id}")
     try:
-        result = await db.applications.update_one(
-            {"application_id": application_id},
-            {
-                "$set": {
-                    "human_final": True,
-                    "final_decision": "REJECT",
-                    "decision_updated_at": datetime.now(timezone.utc)
+        with timed_query("deny_application", "applications.update_one"):
+            result = await db.applications.update_one(
+                {"application_id": application_id},
+                {
+                    "$set": {
+                        "human_final": True,
+                        "final_decision": "REJECT",
+                        "decision_updated_at": datetime.now(timezone.utc)
+                    }
                 }
-            }
-        )
+            )
 
         if result.matched_count == 0:
             return {"success": False, "error": f"No application found with ID {application_id}"}
 
+        response_cache.invalidate(APPLICATIONS_TAG, QUEUE_TAG, application_tag(application_id))
         print(f"✅ Application {application_id} denied")
         return {
             "success": True,
@@ -0,0 +1 @@
+from .schema import compact_application, full_analysis, store_transcript, load_transcript
@@ -0,0 +1,197 @@
+import os
+import sys
+import zlib
+from datetime import datetime, timezone
+from bson import Binary
+from pymongo import UpdateOne, ReplaceOne
+
+# Add parent directory to path to import connectDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connectDB import db
+
+# Version 1: every analysis field stored twice (top level and full_analysis)
+#            plus the raw model transcript in the same document.
+# Version 2: one canonical copy of the analysis at the top level; the
+#            transcript lives compressed in application_transcripts.
+SCHEMA_VERSION = 2
+
+# Analysis keys that already have a dedicated top-level field
+RENAMED_FIELDS = {
+    "recommendation": "claude_recommendation",
+    "confidence_level": "claude_confidence_level",
+    "summary": "claude_summary",
+}
+
+# Fields the application document always carries, as save_application_to_db
+# has always written them
+ANALYSIS_DEFAULTS = {
+    "personal_information": {},
+    "assessment_type": "",
+    "assessment_date": "",
+    "phase_1_current_work": {},
+    "phase_2_medical_severity": {},
+    "phase_3_listings": {},
+    "phase_4_rfc": {},
+    "phase_5_vocational": {},
+    "overall_assessment": {},
+    "next_steps": {},
+    "evidence_summary": {},
+}
+
+# Bookkeeping fields an analysis key must never overwrite
+RESERVED_FIELDS = {
+    "_id", "application_id", "documents", "final_decision", "human_final",
+    "admin_status", "admin_notes", "status_updated_at", "decision_updated_at",
+    "created_at", "schema_version", "raw_claude_response", "full_analysis",
+    "preprocessing", "legacy_id", "legacy_source", "packet_id",
+}
+
+
+# --------------------------------------------------------
+# Compact application documents
+# --------------------------------------------------------
+def analysis_fields(json_result: dict) -> dict:
+    """Top-level fields holding the single canonical copy of an analysis"""
+    fields = dict(ANALYSIS_DEFAULTS)
+    fields["claude_recommendation"] = "UNKNOWN"
+    fields["claude_confidence_level"] = 0
+    fields["claude_summary"] = ""
+    
+    for key, value in json_result.items():
+        key = RENAMED_FIELDS.get(key, key)
+        if key not in RESERVED_FIELDS:
+            fields[key] = value
+    return fields
+
+
+def compact_application(application_id: str, json_result: dict, document, created_at: datetime, preprocessing: dict = None) -> dict:
+    """
+    Build a version 2 application document for a new analysis. `preprocessing`
+    holds the document pre-stage stats, when the pre-stage ran.
+    """
+    application = {
+        "application_id": application_id,
+        "documents": document,
+        "final_decision": json_result.get("recommendation", "UNKNOWN"),
+        "human_final": False,
+        **analysis_fields(json_result),
+        "created_at": created_at,
+        "schema_version": SCHEMA_VERSION
+    }
+    if preprocessing:
+        application["preprocessing"] = preprocessing
+    return application
+
+
+def full_analysis(app: dict) -> dict:
+    """
+    Rebuild the model's analysis JSON from an application document
+    (either schema version).
+    """
+    if app.get("full_analysis"):
+        return app["full_analysis"]
+    
+    renamed = {value: key for key, value in RENAMED_FIELDS.items()}
+    analysis = {}
+    for key, value in app.items():
+        if key in RESERVED_FIELDS:
+            continue
+        analysis[renamed.get(key, key)] = value
+    return analysis
+
+
+# --------------------------------------------------------
+# Raw model transcripts (cold storage)
+# --------------------------------------------------------
+def transcript_document(application_id: str, raw_response: str) -> dict:
+    raw_bytes = (raw_response or "").encode("utf-8")
+    compressed = zlib.compress(raw_bytes, 6)
+    return {
+        "application_id": application_id,
+        "encoding": "zlib",
+        "data": Binary(compressed),
+        "raw_length": len(raw_bytes),
+        "compressed_length": len(compressed),
+        "created_at": datetime.now(timezone.utc)
+    }
+
+
+async def store_transcript(application_id: str, raw_response: str, session=None):
+    """Compress the raw model output into the application_transcripts collection"""
+    await db.application_transcripts.replace_one(
+        {"application_id": application_id},
+        transcript_document(application_id, raw_response),
+        upsert=True,
+        session=session
+    )
+
+
+async def load_transcript(application_id: str):
+    """
+    Return the raw model output for an application, or None. Applications
+    that have not been migrated yet still carry it inline.
+    """
+    transcript = await db.application_transcripts.find_one({"application_id": application_id})
+    if transcript:
+        return zlib.decompress(transcript["data"]).decode("utf-8")
+    
+    app = await db.applications.find_one({"application_id": application_id}, {"raw_claude_response": 1})
+    if app:
+        return app.get("raw_claude_response")
+    return None
+
+
+# --------------------------------------------------------
+# Migration from schema version 1
+# --------------------------------------------------------
+async def migrate_applications(batch_size: int = 500, dry_run: bool = False):
+    """
+    Convert version 1 application documents in place. Each batch writes the
+    compressed transcripts first and then rewrites the applications, so an
+    interrupted run can simply be started again.
+    """
+    migrated = 0
+    cursor = db.applications.find({"schema_version": {"$ne": SCHEMA_VERSION}}).batch_size(batch_size)
+    
+    transcripts, updates = [], []
+    async for app in cursor:
+        analysis = app.get("full_analysis") or full_analysis(app)
+        fields = analysis_fields(analysis)
+        
+        # Keep any values the application already had at the top level
+        # (they may have been edited after the analysis was stored)
+        for key in list(fields):
+            if key in app:
+                del fields[key]
+        
+        if "raw_claude_response" in app:
+            transcripts.append(ReplaceOne(
+                {"application_id": app["application_id"]},
+                transcript_document(app["application_id"], app["raw_claude_response"]),
+                upsert=True
+            ))
+        updates.append(UpdateOne(
+            {"_id": app["_id"]},
+            {
+                "$set": {**fields, "schema_version": SCHEMA_VERSION},
+                "$unset": {"full_analysis": "", "raw_claude_response": ""}
+            }
+        ))
+        
+        if len(updates) >= batch_size:
+            migrated += await write_migration_batch(transcripts, updates, dry_run)
+            transcripts, updates = [], []
+    
+    if updates:
+        migrated += await write_migration_batch(transcripts, updates, dry_run)
+    
+    return migrated
+
+
+async def write_migration_batch(transcripts: list, updates: list, dry_run: bool) -> int:
+    if not dry_run:
+        if transcripts:
+            await db.application_transcripts.bulk_write(transcripts, ordered=False)
+        await db.applications.bulk_write(updates, ordered=False)
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {len(updates)} applications")
+    return len(updates)
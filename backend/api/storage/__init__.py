@@ -0,0 +1 @@
+from .storage import create_storage, Storage, MotorStorage, MemoryStorage
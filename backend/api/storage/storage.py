@@ -0,0 +1,306 @@
+import os
+import asyncio
+from abc import ABC, abstractmethod
+import certifi
+from bson import ObjectId
+from api import dotenv_path
+
+# STORAGE_BACKEND: "mongo" uses MONGO_URI; "memory" keeps everything in
+# process (mongomock-motor), to measure the app without database latency
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "Main")
+# Atlas needs TLS; a local mongod (e.g. for load tests) usually runs without it
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() != "false"
+
+# Connections per process. Size the pool for the requests one worker has in
+# flight: each waits for a free connection once the pool is exhausted
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))
+# Connections the app opens at startup, before the first requests need them
+MONGO_WARM_CONNECTIONS = int(os.getenv("MONGO_WARM_CONNECTIONS", "10"))
+# Wire compression, in order of preference, e.g. "zstd,snappy,zlib" (zstd and
+# snappy need the zstandard / python-snappy packages; zlib is built in)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+# 0 leaves these unbounded (the driver default)
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+
+
+# --------------------------------------------------------
+# Interface
+# --------------------------------------------------------
+class Storage(ABC):
+    """
+    The database behind connectDB.db. `db` is a Motor-style database: the
+    backend uses find, find_one, insert_one, insert_many, update_one,
+    find_one_and_update, bulk_write and aggregate on its collections.
+    `bucket()` stores the PDFs. Transactions and change streams are optional;
+    without them the backend writes back to back and polls for events.
+    """
+
+    name = "storage"
+    supports_transactions = False
+    supports_change_streams = False
+
+    def __init__(self, client, db):
+        self.client = client
+        self.db = db
+
+    @abstractmethod
+    def bucket(self, bucket_name: str, chunk_size: int):
+        """A GridFS-style bucket: open_upload_stream, open_download_stream, delete."""
+
+    async def ping(self):
+        await self.db.command("ping")
+
+    async def warm(self, connections: int = 1):
+        """Open up to `connections` pooled connections before the first request needs them."""
+        await asyncio.gather(*(self.ping() for _ in range(max(1, connections))))
+
+    def close(self):
+        self.client.close()
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "database": self.db.name}
+
+
+# --------------------------------------------------------
+# MongoDB (Motor)
+# --------------------------------------------------------
+def client_options(max_pool_size: int = MONGO_MAX_POOL_SIZE, min_pool_size: int = MONGO_MIN_POOL_SIZE,
+                   compressors: str = MONGO_COMPRESSORS, tls: bool = MONGO_TLS) -> dict:
+    """AsyncIOMotorClient keyword arguments; unset (0 / empty) settings keep the driver defaults."""
+    options = {
+        "tls": tls,
+        "tlsCAFile": certifi.where() if tls else None,
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min_pool_size,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if compressors:
+        options["compressors"] = compressors
+    if MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    return options
+
+
+class MotorStorage(Storage):
+    """
+    MongoDB through Motor. Transactions and change streams are attempted and
+    given up on at the first error a standalone mongod raises for them.
+    """
+
+    name = "mongo"
+    supports_transactions = True
+    supports_change_streams = True
+
+    def __init__(self, uri: str = MONGO_URI, db_name: str = MONGO_DB_NAME, **options):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        if not uri:
+            print("❌ MONGO_URI not found in environment variables!")
+            print(f"   Looking for .env at: {dotenv_path}")
+            raise ValueError("MONGO_URI is required but not found in .env file")
+
+        self.options = client_options(**options)
+        client = AsyncIOMotorClient(uri, **self.options)
+        super().__init__(client, client[db_name])
+
+    def bucket(self, bucket_name: str, chunk_size: int):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        return AsyncIOMotorGridFSBucket(self.db, bucket_name=bucket_name, chunk_size_bytes=chunk_size)
+
+    def describe(self) -> dict:
+        return {
+            **super().describe(),
+            "max_pool_size": self.options["maxPoolSize"],
+            "min_pool_size": self.options["minPoolSize"],
+            "compressors": self.options.get("compressors", ""),
+        }
+
+
+# --------------------------------------------------------
+# In memory (mongomock-motor)
+# --------------------------------------------------------
+def project(document: dict, projection: dict) -> dict:
+    """Apply a top-level $project of field inclusions (plus `_id: 0`) in Python."""
+    keep = {field for field, value in projection.items() if value and field != "_id"}
+    return {
+        field: value for field, value in document.items()
+        if field in keep or (field == "_id" and projection.get("_id", 1))
+    }
+
+
+class ProjectedCursor:
+    """An aggregate cursor that applies $lookup sub-pipeline projections to the joined documents."""
+
+    def __init__(self, cursor, projections: dict):
+        self.cursor = cursor
+        self.projections = projections
+
+    def apply(self, document: dict) -> dict:
+        for field, stages in self.projections.items():
+            joined = document.get(field)
+            for projection in stages:
+                if isinstance(joined, list):
+                    joined = [project(item, projection) for item in joined]
+                elif isinstance(joined, dict):
+                    joined = project(joined, projection)
+            if field in document:
+                document[field] = joined
+        return document
+
+    def __aiter__(self):
+        return self.iterate()
+
+    async def iterate(self):
+        async for document in self.cursor:
+            yield self.apply(document)
+
+    async def to_list(self, length=None):
+        return [self.apply(document) for document in await self.cursor.to_list(length)]
+
+
+class MemoryCollection:
+    """
+    A mongomock collection. mongomock cannot run a $lookup that has both
+    localField/foreignField and a sub-pipeline (the review queue's join), so
+    such a lookup runs without the sub-pipeline and its $project stages are
+    applied to the results afterwards.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def aggregate(self, pipeline: list, *args, **kwargs):
+        stages, projections = [], {}
+        for stage in pipeline:
+            lookup = stage.get("$lookup")
+            if lookup and "pipeline" in lookup and "localField" in lookup:
+                for inner in lookup["pipeline"]:
+                    if set(inner) != {"$project"}:
+                        raise ValueError(f"the in-memory store only supports $project in $lookup sub-pipelines, not {inner}")
+                projections[lookup["as"]] = [inner["$project"] for inner in lookup["pipeline"]]
+                stage = {"$lookup": {key: value for key, value in lookup.items() if key != "pipeline"}}
+            stages.append(stage)
+        cursor = self.collection.aggregate(stages, *args, **kwargs)
+        return ProjectedCursor(cursor, projections) if projections else cursor
+
+
+class MemoryDatabase:
+    def __init__(self, db):
+        self.database = db
+
+    def __getitem__(self, name):
+        return MemoryCollection(self.database[name])
+
+    def __getattr__(self, name):
+        attribute = getattr(self.database, name)
+        # Attribute access on a database is a collection, as with Motor
+        return MemoryCollection(attribute) if hasattr(attribute, "find_one_and_update") else attribute
+
+
+class MemoryUpload:
+    def __init__(self, collection, filename: str, metadata: dict):
+        self._id = ObjectId()
+        self.collection = collection
+        self.filename = filename
+        self.metadata = metadata
+        self.parts = []
+
+    async def write(self, data):
+        self.parts.append(data.read() if hasattr(data, "read") else bytes(data))
+
+    async def abort(self):
+        self.parts = []
+
+    async def close(self):
+        await self.collection.insert_one({
+            "_id": self._id,
+            "filename": self.filename,
+            "content_type": self.metadata.get("content_type", "application/pdf"),
+            "data": b"".join(self.parts),
+            "metadata": self.metadata,
+        })
+
+
+class MemoryDownload:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    async def read(self, size: int = -1):
+        end = len(self.data) if size is None or size < 0 else self.position + size
+        chunk = self.data[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+
+class MemoryBucket:
+    """
+    The part of AsyncIOMotorGridFSBucket the backend uses. mongomock has no
+    GridFS, so each PDF is kept whole in the legacy `documents` collection,
+    which open_document still reads.
+    """
+
+    def __init__(self, db):
+        self.collection = db.documents
+
+    def open_upload_stream(self, filename: str, metadata: dict = None):
+        return MemoryUpload(self.collection, filename, metadata or {})
+
+    async def open_download_stream(self, file_id):
+        document = await self.collection.find_one({"_id": file_id})
+        return MemoryDownload(document["data"])
+
+    async def delete(self, file_id):
+        await self.collection.delete_one({"_id": file_id})
+
+
+class MemoryStorage(Storage):
+    """
+    Everything in process, through mongomock-motor (an optional dependency:
+    pip install mongomock-motor). No transactions, change streams or GridFS,
+    and nothing survives a restart; for measuring the app on its own.
+    """
+
+    name = "memory"
+
+    def __init__(self, db_name: str = MONGO_DB_NAME):
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise ValueError("STORAGE_BACKEND=memory needs mongomock-motor (pip install mongomock-motor)")
+
+        client = AsyncMongoMockClient()
+        super().__init__(client, MemoryDatabase(client[db_name]))
+
+    def bucket(self, bucket_name: str, chunk_size: int):
+        return MemoryBucket(self.db)
+
+    async def warm(self, connections: int = 1):
+        # No connections to open
+        return None
+
+
+STORAGE_BACKENDS = {"mongo": MotorStorage, "memory": MemoryStorage}
+
+
+def create_storage(backend: str = STORAGE_BACKEND, **options) -> Storage:
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected one of: {', '.join(STORAGE_BACKENDS)})")
+    return STORAGE_BACKENDS[backend](**options)
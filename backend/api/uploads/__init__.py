@@ -0,0 +1 @@
+from .uploads import inspect_upload, SpooledUpload, UploadRejected, UploadLimitMiddleware
@@ -0,0 +1,209 @@
+import os
+import mmap
+import shutil
+import tempfile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+# Largest accepted upload per file, and the size above which an upload is
+# kept in a temp file on disk instead of in memory (both in bytes)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Largest accepted request body for an upload endpoint: two files at the
+# limit plus room for the form fields and multipart framing
+UPLOAD_BODY_MAX_BYTES = int(os.getenv("UPLOAD_BODY_MAX_BYTES", str(2 * UPLOAD_MAX_BYTES + 1024 * 1024)))
+
+# A PDF header must appear within the first 1024 bytes
+PDF_MAGIC = b"%PDF-"
+HEADER_WINDOW = 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """An upload that cannot be processed; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+# --------------------------------------------------------
+# Request body limit
+# --------------------------------------------------------
+class BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """
+    Answers 413 for a request to one of `paths` whose body is larger than
+    `max_bytes`, before the form is parsed: at once from Content-Length, or
+    as soon as a chunked body passes the limit. Nothing more is received.
+    """
+
+    def __init__(self, app, paths: tuple, max_bytes: int = UPLOAD_BODY_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def reject(self, scope, receive, send, size: int = None):
+        if size is None:
+            message = f"Request body is over the limit of {self.max_bytes} bytes"
+        else:
+            message = f"Request body is {size} bytes; the limit is {self.max_bytes} bytes"
+        await JSONResponse(status_code=413, content={"detail": message}, headers={"Connection": "close"})(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self.reject(scope, receive, send, int(length))
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app answers to the aborted parse is replaced by the 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except BodyTooLarge:
+            pass
+        if exceeded:
+            await self.reject(scope, receive, send)
+
+
+# --------------------------------------------------------
+# Early checks
+# --------------------------------------------------------
+async def upload_size(upload) -> int:
+    """Size of an UploadFile without reading it into memory."""
+    if getattr(upload, "size", None) is not None:
+        return upload.size
+
+    def measure():
+        position = upload.file.tell()
+        upload.file.seek(0, os.SEEK_END)
+        size = upload.file.tell()
+        upload.file.seek(position)
+        return size
+    return await run_in_threadpool(measure)
+
+
+async def inspect_upload(upload, field: str) -> int:
+    """
+    Reject a missing, empty, oversized or non-PDF upload from its size and
+    first bytes, before the app reads it. The form has been received by
+    then; UploadLimitMiddleware bounds how much that can be. Returns the size.
+    """
+    if upload is None:
+        raise UploadRejected(400, f"{field} is required")
+
+    size = await upload_size(upload)
+    if size == 0:
+        raise UploadRejected(400, f"{field} is empty")
+    if size > UPLOAD_MAX_BYTES:
+        raise UploadRejected(413, f"{field} is {size} bytes; the limit is {UPLOAD_MAX_BYTES} bytes")
+
+    header = await upload.read(HEADER_WINDOW)
+    await upload.seek(0)
+    if PDF_MAGIC not in header:
+        raise UploadRejected(415, f"{field} is not a PDF")
+    return size
+
+
+# --------------------------------------------------------
+# Spooled uploads
+# --------------------------------------------------------
+class SpooledUpload:
+    """
+    An uploaded file read exactly once. Small files are held as bytes; larger
+    ones are copied to a named temp file, which the PDF pool can open by path
+    and which is mapped into memory (not copied) when a buffer is needed.
+    Call close() to remove the temp file.
+    """
+
+    def __init__(self, filename: str, content_type: str, size: int, data: bytes = None, path: str = None, owned: bool = True):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.data = data
+        self.path = path
+        self.owned = owned
+        self._file = None
+        self._map = None
+
+    @classmethod
+    async def from_upload(cls, upload, default_name: str):
+        filename = upload.filename or default_name
+        content_type = upload.content_type or "application/pdf"
+        size = await upload_size(upload)
+        await upload.seek(0)
+
+        if size <= UPLOAD_SPOOL_BYTES:
+            data = await upload.read()
+            return cls(filename, content_type, len(data), data=data)
+
+        def spool():
+            with tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", delete=False) as spooled:
+                shutil.copyfileobj(upload.file, spooled, COPY_CHUNK_SIZE)
+                return spooled.name, spooled.tell()
+        path, size = await run_in_threadpool(spool)
+        return cls(filename, content_type, size, path=path)
+
+    @classmethod
+    def from_file(cls, path: str, filename: str = None, content_type: str = "application/pdf"):
+        """A PDF that is already on disk; close() leaves the file in place."""
+        return cls(filename or os.path.basename(path), content_type, os.path.getsize(path), path=path, owned=False)
+
+    @property
+    def spooled(self) -> bool:
+        return self.path is not None
+
+    def buffer(self):
+        """The file contents as a zero-copy buffer (bytes, or a read-only mmap of the temp file)."""
+        if self.data is not None:
+            return memoryview(self.data)
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._map)
+
+    def source(self):
+        """What merge_pdfs_sync needs: the bytes, or the temp file path."""
+        return self.path if self.spooled else self.data
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A memoryview is still alive; the map goes with it
+                pass
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None and self.owned:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the compact application schema.
+
+Seeds the benchmark database with version 1 applications (analysis stored
+twice plus the raw transcript), measures collection size and a full scan,
+runs the migration, and measures again.
+
+Run from backend/:
+    BENCH_MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_compact_schema.py --applications 20000
+"""
+import asyncio
+import argparse
+
+from bench_utils import bench_database, backend_module, use_database, seed, timed, report
+
+
+async def collection_stats(db, name):
+    stats = await db.command("collStats", name)
+    return stats.get("size", 0), stats.get("storageSize", 0), stats.get("count", 0)
+
+
+async def full_scan(db):
+    count = 0
+    async for _ in db.applications.find({}):
+        count += 1
+    return count
+
+
+async def print_sizes(db, label):
+    size, storage, count = await collection_stats(db, "applications")
+    line = f"{label:<8} applications: {count} docs, {size / 1024 / 1024:8.1f} MiB data, {storage / 1024 / 1024:8.1f} MiB on disk"
+    print(line)
+    if "application_transcripts" in await db.list_collection_names():
+        size, storage, count = await collection_stats(db, "application_transcripts")
+        print(f"{'':<8} transcripts:  {count} docs, {size / 1024 / 1024:8.1f} MiB data, {storage / 1024 / 1024:8.1f} MiB on disk")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    db, _ = bench_database()
+    await db.application_transcripts.drop()
+    await seed(db, args.applications)
+
+    schema = backend_module("api.schema.schema")
+    use_database(db, "api.schema.schema")
+
+    await print_sizes(db, "before")
+    _, samples = await timed(lambda: full_scan(db), args.runs)
+    report("full scan before", samples)
+
+    await schema.migrate_applications()
+    # Release the space freed by the rewrite so storageSize is comparable
+    # (needs a self-managed mongod; managed clusters may refuse it)
+    try:
+        await db.command("compact", "applications")
+    except Exception as e:
+        print(f"compact skipped: {e}")
+
+    await print_sizes(db, "after")
+    _, samples = await timed(lambda: full_scan(db), args.runs)
+    report("full scan after", samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the reviewer queue (/api/users/filtered).
+
+Seeds the benchmark database with applications, then compares the original
+per-user / per-application find_one loop ("before") with the single
+aggregation pipeline in get_filtered_applications ("after"): latency and
+number of round trips to the server.
+
+Run from backend/:
+    BENCH_MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_filtered_applications.py --applications 100000
+"""
+import asyncio
+import argparse
+
+from bench_utils import bench_database, backend_module, use_database, seed, timed, report
+
+
+async def legacy_get_filtered_applications(db, bson_to_json):
+    """The reviewer queue as it was built before the aggregation pipeline."""
+    users_cursor = db.users.find({})
+    filtered_applications = []
+
+    async for user in users_cursor:
+        for app_id in user.get("applications", []):
+            app = await db.applications.find_one({"application_id": app_id})
+            if app and app.get("human_final") == False:
+                app_json = bson_to_json(app)
+                app_json["user_details"] = {
+                    "user_id": user.get("user_id"),
+                    "name": user.get("name"),
+                    "socialSecurityNumber": user.get("socialSecurityNumber"),
+                    "email": user.get("email"),
+                    "phone": user.get("phone")
+                }
+                filtered_applications.append(app_json)
+
+    return {"success": True, "applications": filtered_applications, "count": len(filtered_applications)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the existing benchmark data")
+    args = parser.parse_args()
+
+    db, counter = bench_database()
+    if not args.skip_seed:
+        await seed(db, args.applications)
+
+    read_module = backend_module("api.read.read")
+    use_database(db, "api.read.read")
+
+    # Indexes the queue query is designed to run on
+    await db.applications.create_index([("human_final", 1), ("created_at", 1)])
+    await db.applications.create_index("application_id", unique=True)
+    await db.users.create_index("applications")
+
+    counter.reset()
+    before, samples = await timed(lambda: legacy_get_filtered_applications(db, read_module.bson_to_json), args.runs)
+    report("before (N+1 find_one)", samples, counter.count // args.runs)
+
+    counter.reset()
+    after, samples = await timed(read_module.get_filtered_applications, args.runs)
+    report("after (aggregation)", samples, counter.count // args.runs)
+
+    print(f"\nqueue size: before {before['count']}, after {after['count']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
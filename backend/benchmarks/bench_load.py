@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: the FastAPI app (serve_app.py) against a local mongod
+or the in-memory store, with the model replaced by stub_model_server.py
+replaying recorded responses at a realistic token pace.
+
+Submissions and admin reads/writes run concurrently, each endpoint at its
+own open-loop arrival rate (requests per second, --rates), for --duration
+seconds. Reported per endpoint: requests, errors, throughput, p50/p95/p99
+latency and the peak RSS of the app (its PDF pool processes included)
+while that endpoint had requests in flight.
+
+Results are written to --output as JSON with the commit and configuration,
+so runs of different builds can be compared: --compare baseline.json
+prints the change per endpoint and exits 1 when a latency percentile got
+slower by more than --tolerance percent.
+
+Run from backend/:
+    python benchmarks/bench_load.py --store memory --duration 30 --output load.json
+    MONGO_TLS=false BENCH_MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_load.py --compare load.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+from bench_utils import BENCH_MONGO_URI, percentile
+from bench_upload_memory import make_pdf
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RATES = "submit=1,submit_async=0.5,applications=5,queue=2,users=2,application=5,approve=0.5"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+# --------------------------------------------------------
+# Processes
+# --------------------------------------------------------
+def start_process(script: str, args: list, env: dict) -> subprocess.Popen:
+    log_path = os.path.join(tempfile.gettempdir(), script.replace(".py", ".log"))
+    print(f"▶️ {script} (log: {log_path})")
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, script)] + args,
+                            cwd=BENCH_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"{url} exited with {process.returncode}; see its log")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise SystemExit(f"{url} did not come up within {timeout:.0f} s")
+
+
+def process_rss(pid: int) -> int:
+    """Resident bytes of a process and its children, from /proc."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            total += int(f.read().split()[1]) * PAGE_SIZE
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return total
+    return total + sum(process_rss(child) for child in children)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --------------------------------------------------------
+# Endpoints
+# --------------------------------------------------------
+class Workload:
+    """Request builders per endpoint; admin requests use ids of earlier submissions."""
+
+    def __init__(self, pdf_bytes: int):
+        self.pdf_bytes = pdf_bytes
+        self.application_ids = []
+
+    def form(self) -> dict:
+        ssn = f"9{random.randint(0, 99):02d}-{random.randint(10, 99)}-{random.randint(1000, 9999)}"
+        return {
+            "firstName": "Load", "lastName": f"Test{random.randint(1, 10**6)}", "dateOfBirth": "1975-06-01",
+            "address": "1 Bench Way", "city": "Springfield", "state": "IL", "zipCode": "62701",
+            "socialSecurityNumber": ssn,
+        }
+
+    def files(self) -> dict:
+        # Fresh random padding every time, so the analysis cache never hits
+        return {
+            "medicalRecordsFile": ("medical.pdf", make_pdf(self.pdf_bytes), "application/pdf"),
+            "incomeDocumentsFile": ("income.pdf", make_pdf(self.pdf_bytes // 4), "application/pdf"),
+        }
+
+    def request(self, endpoint: str):
+        """(method, path, keyword arguments for httpx) or None when there is nothing to request yet."""
+        if endpoint == "submit":
+            return "POST", "/api/benefit-application", {"data": self.form(), "files": self.files()}
+        if endpoint == "submit_async":
+            return "POST", "/api/benefit-application?mode=async", {"data": self.form(), "files": self.files()}
+        if endpoint == "applications":
+            return "GET", "/api/applications", {}
+        if endpoint == "queue":
+            return "GET", "/api/users/filtered", {}
+        if endpoint == "users":
+            return "GET", "/api/users/all", {}
+        if not self.application_ids:
+            return None
+        application_id = random.choice(self.application_ids)
+        if endpoint == "application":
+            return "GET", f"/api/application/{application_id}", {}
+        if endpoint == "approve":
+            return "PUT", f"/api/application/approve/{application_id}", {}
+        raise SystemExit(f"Unknown endpoint {endpoint!r}")
+
+    def record(self, endpoint: str, response: httpx.Response):
+        if endpoint == "submit" and response.status_code == 200:
+            application_id = response.json().get("application_id")
+            if application_id:
+                self.application_ids.append(application_id)
+
+
+def reports_failure(response: httpx.Response) -> bool:
+    """Some read endpoints answer 200 with {"success": false} (directly or under "data")."""
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    if not isinstance(body, dict):
+        return False
+    data = body.get("data")
+    return body.get("success") is False or (isinstance(data, dict) and data.get("success") is False)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_rss = 0
+        self.started = None
+        self.finished = None
+
+
+# --------------------------------------------------------
+# Load
+# --------------------------------------------------------
+async def drive(client, workload: Workload, endpoint: str, rate: float, duration: float, stats: EndpointStats, app_pid: int):
+    """Open-loop arrivals: a new request every ~1/rate s, whether or not earlier ones finished."""
+    tasks = []
+
+    async def one():
+        request = workload.request(endpoint)
+        if request is None:
+            return
+        method, path, kwargs = request
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            stats.latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400 or reports_failure(response):
+                stats.errors += 1
+            else:
+                workload.record(endpoint, response)
+        except httpx.HTTPError:
+            stats.errors += 1
+        finally:
+            # Short requests can fall between two samples of sample_rss
+            stats.peak_rss = max(stats.peak_rss, process_rss(app_pid))
+            stats.in_flight -= 1
+
+    stats.started = time.perf_counter()
+    deadline = stats.started + duration
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.ensure_future(one()))
+        # Exponential gaps: arrivals of independent clients
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    stats.finished = time.perf_counter()
+
+
+async def sample_rss(pid: int, stats: dict, peak: dict, interval: float = 0.05):
+    while True:
+        rss = process_rss(pid)
+        peak["rss"] = max(peak["rss"], rss)
+        for endpoint in stats.values():
+            if endpoint.in_flight:
+                endpoint.peak_rss = max(endpoint.peak_rss, rss)
+        await asyncio.sleep(interval)
+
+
+def summarize(stats: dict) -> dict:
+    results = {}
+    for endpoint, endpoint_stats in stats.items():
+        samples = endpoint_stats.latencies
+        elapsed = (endpoint_stats.finished or 0) - (endpoint_stats.started or 0)
+        ok = len(samples) - endpoint_stats.errors
+        results[endpoint] = {
+            "requests": len(samples),
+            "errors": endpoint_stats.errors,
+            "throughput_rps": round(ok / elapsed, 3) if elapsed > 0 else 0,
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "peak_rss_mb": round(endpoint_stats.peak_rss / 2**20, 1),
+        }
+    return results
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Print the change against a previous run; True when no percentile regressed past tolerance."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    ok = True
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb"):
+            before, after = previous.get(key) or 0, current[key]
+            change = (after - before) / before * 100 if before else 0
+            regressed = key.endswith("_ms") and change > tolerance
+            ok = ok and not regressed
+            changes.append(f"{key} {change:+6.1f}%{' !' if regressed else ''}")
+        print(f"  {endpoint:<14} " + "  ".join(changes))
+    return ok
+
+
+async def run(args) -> dict:
+    rates = {}
+    for item in args.rates.split(","):
+        endpoint, _, rate = item.partition("=")
+        if float(rate) > 0:
+            rates[endpoint.strip()] = float(rate)
+
+    env = dict(os.environ)
+    processes = []
+    model_url = args.model_url
+    if not model_url:
+        model_args = ["--port", str(args.model_port), "--ttft-ms", str(args.ttft_ms),
+                      "--tokens-per-second", str(args.tokens_per_second)]
+        if args.responses:
+            model_args += ["--responses", os.path.abspath(args.responses)]
+        processes.append(start_process("stub_model_server.py", model_args, env))
+        model_url = f"http://127.0.0.1:{args.model_port}"
+
+    env.update(ANTHROPIC_BASE_URL=model_url, CLAUDE_API_KEY=env.get("CLAUDE_API_KEY", "stub"), BENCH_MONGO_URI=args.mongo_uri)
+    app = start_process("serve_app.py", ["--store", args.store, "--port", str(args.app_port)], env)
+    processes.append(app)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+
+    try:
+        await wait_until_up(base_url + "/api/cache/stats", app)
+        workload = Workload(args.pdf_kb * 1024)
+        limits = httpx.Limits(max_connections=args.max_connections)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            # Admin endpoints need applications to look at
+            for _ in range(args.seed_submissions):
+                method, path, kwargs = workload.request("submit")
+                workload.record("submit", await client.request(method, path, **kwargs))
+
+            stats = {endpoint: EndpointStats() for endpoint in rates}
+            peak = {"rss": 0}
+            sampler = asyncio.ensure_future(sample_rss(app.pid, stats, peak))
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                drive(client, workload, endpoint, rate, args.duration, stats[endpoint], app.pid) for endpoint, rate in rates.items()
+            ))
+            sampler.cancel()
+
+        return {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "store": args.store, "duration": args.duration, "rates": rates, "pdf_kb": args.pdf_kb,
+                "ttft_ms": args.ttft_ms, "tokens_per_second": args.tokens_per_second,
+                "responses": args.responses, "seed_submissions": args.seed_submissions,
+            },
+            "wall_seconds": round(time.perf_counter() - started, 2),
+            "peak_rss_mb": round(peak["rss"] / 2**20, 1),
+            "endpoints": summarize(stats),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", choices=["mongod", "memory"], default="mongod")
+    parser.add_argument("--mongo-uri", default=BENCH_MONGO_URI)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per endpoint")
+    parser.add_argument("--rates", default=DEFAULT_RATES, help="endpoint=requests per second, comma separated")
+    parser.add_argument("--pdf-kb", type=int, default=200, help="medical records size per submission")
+    parser.add_argument("--seed-submissions", type=int, default=5)
+    parser.add_argument("--responses", help="JSONL of recorded responses for the stub model server")
+    parser.add_argument("--ttft-ms", type=float, default=800)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--model-url", help="use an already running model server instead of starting the stub")
+    parser.add_argument("--model-port", type=int, default=8788)
+    parser.add_argument("--app-port", type=int, default=8010)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed latency regression in percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'endpoint':<14} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS':>10}")
+    for endpoint, result in results["endpoints"].items():
+        print(f"{endpoint:<14} {result['requests']:>8} {result['errors']:>6} {result['throughput_rps']:>7.2f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['peak_rss_mb']:>7.1f} MB")
+    print(f"peak RSS {results['peak_rss_mb']} MB; results written to {args.output}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
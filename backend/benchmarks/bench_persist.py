@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the write path of a completed analysis.
+
+Runs concurrent submissions (several per SSN, so the same user is written
+from many coroutines at once) through the original sequential writes
+("before": insert application, find_one user, then update_one or insert_one)
+and through persist_application ("after": application, transcript and user
+upsert in one transaction). Reports round trips per submission, p50/p99
+latency and how many duplicate users each path created.
+
+Run from backend/ (use a replica set to exercise transactions):
+    BENCH_MONGO_URI=mongodb://localhost:27017/?replicaSet=rs0 python benchmarks/bench_persist.py --submissions 500
+"""
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timezone
+
+from bench_utils import bench_database, backend_module, use_database, make_analysis, percentile
+
+
+async def legacy_write(db, json_result, document, raw_response, name, ssn):
+    """The writes ai() made before persist_application."""
+    application_id = str(uuid.uuid4())
+    await db.applications.insert_one({
+        "application_id": application_id,
+        "documents": document,
+        "claude_confidence_level": json_result.get("confidence_level", 0),
+        "claude_summary": json_result.get("summary", ""),
+        "final_decision": json_result.get("recommendation", "UNKNOWN"),
+        "human_final": False,
+        "created_at": datetime.now(timezone.utc),
+        "raw_claude_response": raw_response,
+        "full_analysis": json_result
+    })
+    existing_user = await db.users.find_one({"socialSecurityNumber": ssn})
+    if existing_user:
+        await db.users.update_one({"socialSecurityNumber": ssn}, {"$addToSet": {"applications": application_id}})
+    else:
+        await db.users.insert_one({
+            "user_id": str(uuid.uuid4()),
+            "name": name,
+            "socialSecurityNumber": ssn,
+            "applications": [application_id],
+            "created_at": datetime.now(timezone.utc)
+        })
+
+
+async def run(name, db, counter, write, submissions, concurrency, ssns):
+    await db.users.drop()
+    await db.applications.drop()
+    await db.application_transcripts.drop()
+    if name == "after":
+        # persist_application relies on the unique SSN index
+        await db.users.create_index("socialSecurityNumber", unique=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    json_result = make_analysis("APPROVE")
+    document = {"document_id": "0" * 24, "filename": "combined_document.pdf", "document_type": "combined_document"}
+    raw_response = "<START_OUTPUT>{}<END_OUTPUT>" * 200
+
+    async def submit(index):
+        async with semaphore:
+            start = time.perf_counter()
+            await write(json_result, document, raw_response, "Bench Applicant", ssns[index % len(ssns)])
+            latencies.append(time.perf_counter() - start)
+
+    counter.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(submit(index) for index in range(submissions)))
+    elapsed = time.perf_counter() - started
+
+    users = await db.users.count_documents({})
+    print(
+        f"{name:<7} {submissions / elapsed:8.1f} writes/s   p50 {percentile(latencies, 50) * 1000:7.1f} ms   "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms   round trips/submission {counter.count / submissions:5.2f}   "
+        f"users {users} (expected {len(ssns)})"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=50, help="distinct SSNs the submissions are spread over")
+    args = parser.parse_args()
+
+    db, counter = bench_database()
+    ai_module = backend_module("api.ai.ai")
+    use_database(db, "api.ai.ai", "api.schema.schema")
+    ssns = [f"{index:09d}" for index in range(args.users)]
+
+    await run("before", db, counter,
+              lambda *write_args: legacy_write(db, *write_args),
+              args.submissions, args.concurrency, ssns)
+    await run("after", db, counter, ai_module.persist_application,
+              args.submissions, args.concurrency, ssns)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark for prompt loading and provider-side prompt caching.
+
+load_prompt: reading prompt.md on every submission ("before") against the
+mtime-checked in-memory copy ("after").
+
+run_analysis: submissions sent through a local stub of the Anthropic client
+with and without cache_control on the prompt block. The stub models the
+provider's prompt cache (a prefix up to a cache_control block is read from
+cache when seen before) and charges prefill time per uncached input token,
+so the report shows input/cached tokens per request and time to first token.
+
+Run from backend/:  python benchmarks/bench_prompt_cache.py [--submissions 50]
+"""
+import os
+import time
+import json
+import base64
+import asyncio
+import hashlib
+import argparse
+
+from bench_utils import backend_module, make_analysis, percentile
+
+# Rough tokenizer: ~4 characters per token for text, base64 documents are
+# counted on their decoded size
+CHARS_PER_TOKEN = 4
+
+
+class StubStream:
+    def __init__(self, prefill_seconds: float, response: str):
+        self.prefill_seconds = prefill_seconds
+        self.response = response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        await asyncio.sleep(self.prefill_seconds)
+        for index in range(0, len(self.response), 16):
+            yield self.response[index:index + 16]
+
+
+class StubMessages:
+    def __init__(self, client):
+        self.client = client
+
+    def stream(self, model, max_tokens, messages):
+        return self.client.open_stream(model, messages)
+
+
+class StubAnthropic:
+    """Just enough of AsyncAnthropic for run_analysis, with a prompt cache."""
+
+    def __init__(self, seconds_per_token: float, cached_token_discount: float = 0.1):
+        self.messages = StubMessages(self)
+        self.seconds_per_token = seconds_per_token
+        self.cached_token_discount = cached_token_discount
+        self.cache = set()
+        self.usage = []
+        self.response = "<START_OUTPUT>" + json.dumps(dict(make_analysis("APPROVE"), confidence_level=0.8)) + "<END_OUTPUT>"
+
+    @staticmethod
+    def block_tokens(block: dict) -> int:
+        if block["type"] == "text":
+            return len(block["text"]) // CHARS_PER_TOKEN
+        return len(base64.b64decode(block["source"]["data"])) // CHARS_PER_TOKEN
+
+    def open_stream(self, model: str, messages: list):
+        content = messages[0]["content"]
+        prefix = hashlib.sha256(model.encode())
+        tokens = cached = created = 0
+
+        for block in content:
+            prefix.update(json.dumps(block, sort_keys=True).encode())
+            tokens += self.block_tokens(block)
+            if "cache_control" in block:
+                key = prefix.hexdigest()
+                if key in self.cache:
+                    cached = tokens
+                else:
+                    self.cache.add(key)
+                    created = tokens
+
+        uncached = tokens - cached
+        self.usage.append({
+            "input_tokens": uncached - created,
+            "cache_creation_input_tokens": created,
+            "cache_read_input_tokens": cached,
+        })
+        prefill = (uncached + cached * self.cached_token_discount) * self.seconds_per_token
+        return StubStream(prefill, self.response)
+
+
+def bench_load_prompt(ai_module, iterations: int):
+    def legacy():
+        with open(ai_module.PROMPT_PATH, "r", encoding="utf-8") as f:
+            return f.read()
+
+    for name, load in (("before", legacy), ("after", ai_module.load_prompt)):
+        load()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            load()
+        per_call = (time.perf_counter() - start) / iterations * 1e6
+        print(f"load_prompt {name:<8} {per_call:8.1f} µs/call")
+
+
+async def bench_analysis(ai_module, submissions: int, seconds_per_token: float, cache_prompt: bool):
+    stub = StubAnthropic(seconds_per_token)
+    ai_module.client = stub
+    prompt = ai_module.load_prompt()
+
+    ttft = []
+    for index in range(submissions):
+        # Different documents every time, like real submissions
+        documents = [
+            ("application/pdf", base64.standard_b64encode(os.urandom(20000)).decode("utf-8")),
+            ("application/pdf", base64.standard_b64encode(os.urandom(8000)).decode("utf-8")),
+        ]
+        marks = {}
+        start = time.perf_counter()
+        await ai_module.run_analysis(
+            prompt, documents,
+            progress=lambda stage, data: marks.setdefault(stage, time.perf_counter()),
+            cache_prompt=cache_prompt
+        )
+        ttft.append(marks["first_tokens"] - start)
+
+    totals = {key: sum(usage[key] for usage in stub.usage) / submissions for key in stub.usage[0]}
+    label = "cached" if cache_prompt else "uncached"
+    print(
+        f"run_analysis {label:<9} TTFT p50 {percentile(ttft, 50) * 1000:7.1f} ms  p95 {percentile(ttft, 95) * 1000:7.1f} ms   "
+        f"input tokens/request: uncached {totals['input_tokens']:7.0f}  "
+        f"cache write {totals['cache_creation_input_tokens']:6.0f}  cache read {totals['cache_read_input_tokens']:6.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000, help="load_prompt calls per variant")
+    parser.add_argument("--seconds-per-token", type=float, default=0.00002,
+                        help="stub prefill time per uncached input token")
+    args = parser.parse_args()
+
+    ai_module = backend_module("api.ai.ai")
+
+    bench_load_prompt(ai_module, args.iterations)
+    print()
+    for cache_prompt in (False, True):
+        asyncio.run(bench_analysis(ai_module, args.submissions, args.seconds_per_token, cache_prompt))
+
+
+if __name__ == "__main__":
+    main()
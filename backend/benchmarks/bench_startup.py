@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long a new worker takes before it can serve.
+
+Two numbers per run, each measured in a fresh process:
+  import   seconds to `import main` (the module imports, without the
+           interpreter's own start)
+  ready    seconds from starting serve_app.py until the first successful
+           GET /api/applications (imports, lifespan startup with its pool
+           warm-up and index check, and the first read)
+
+Also recorded: which of the heavy libraries (anthropic, PyPDF2, reportlab)
+`import main` pulled in; they should only load on the paths that use them.
+
+Results are written to --output as JSON with the commit, and --compare
+exits 1 when the median of either number got slower by more than
+--tolerance percent, like bench_load.py.
+
+Run from backend/:
+    python benchmarks/bench_startup.py --store memory --runs 5 --output startup.json
+    MONGO_TLS=false python benchmarks/bench_startup.py --store mongod --compare startup.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+from bench_utils import BACKEND_DIR, BENCH_MONGO_URI, BENCH_DB_NAME, percentile
+from bench_load import start_process, git_commit
+
+HEAVY_MODULES = ("anthropic", "PyPDF2", "reportlab")
+
+IMPORT_SCRIPT = f"""
+import sys, json, time
+start = time.perf_counter()
+import main
+print(json.dumps({{"seconds": time.perf_counter() - start, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(env: dict) -> dict:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def measure_ready(args, env: dict, timeout: float = 120) -> float:
+    started = time.perf_counter()
+    app = start_process("serve_app.py", ["--store", args.store, "--port", str(args.app_port)], env)
+    url = f"http://127.0.0.1:{args.app_port}/api/applications?limit=1"
+    try:
+        async with httpx.AsyncClient() as client:
+            while time.perf_counter() - started < timeout:
+                if app.poll() is not None:
+                    raise SystemExit(f"serve_app.py exited with {app.returncode}; see its log")
+                try:
+                    response = await client.get(url, timeout=5)
+                    if response.status_code == 200 and response.json().get("success") is not False:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.01)
+        raise SystemExit(f"{url} did not answer within {timeout:.0f} s")
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    ok = True
+    for key in ("import_p50_ms", "ready_p50_ms"):
+        before, after = baseline.get(key) or 0, results[key]
+        change = (after - before) / before * 100 if before else 0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"  {key:<14} {before:9.1f} -> {after:9.1f} ms  {change:+6.1f}%{' !' if regressed else ''}")
+    return ok
+
+
+async def run(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("CLAUDE_API_KEY", "stub")
+    env.update(BENCH_MONGO_URI=args.mongo_uri, MONGO_URI=args.mongo_uri, MONGO_DB_NAME=BENCH_DB_NAME,
+               STORAGE_BACKEND="memory" if args.store == "memory" else "mongo")
+
+    imports, ready, heavy = [], [], set()
+    for run_number in range(args.runs):
+        result = measure_import(env)
+        imports.append(result["seconds"])
+        heavy.update(result["heavy"])
+        ready.append(await measure_ready(args, env))
+        print(f"run {run_number + 1}: import {imports[-1] * 1000:7.1f} ms   ready {ready[-1] * 1000:7.1f} ms")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"store": args.store, "runs": args.runs},
+        "import_p50_ms": round(percentile(imports, 50) * 1000, 1),
+        "import_max_ms": round(max(imports) * 1000, 1),
+        "ready_p50_ms": round(percentile(ready, 50) * 1000, 1),
+        "ready_max_ms": round(max(ready) * 1000, 1),
+        "heavy_modules_at_import": sorted(heavy),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", choices=["mongod", "memory"], default="mongod")
+    parser.add_argument("--mongo-uri", default=BENCH_MONGO_URI)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-port", type=int, default=8010)
+    parser.add_argument("--output", default="startup_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"import p50 {results['import_p50_ms']} ms (max {results['import_max_ms']})   "
+          f"ready p50 {results['ready_p50_ms']} ms (max {results['ready_max_ms']})")
+    if results["heavy_modules_at_import"]:
+        print(f"⚠️ Imported by `import main`: {', '.join(results['heavy_modules_at_import'])}")
+    print(f"results written to {args.output}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
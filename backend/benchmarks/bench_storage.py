@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the storage backends behind connectDB.db: the in-memory store
+(what the app costs on its own) against MongoDB at several connection pool
+sizes (what the database and the pool add on top).
+
+For each backend and pool size the benchmark seeds --applications
+applications, then runs --operations calls of each operation at every
+--concurrency level: persist_application (the write of a finished
+analysis), read_application_by_id, a read_all_applications page and the
+review queue (get_filtered_applications on a small pending set). Reported:
+operations per second and p50/p99 latency. When p99 climbs while ops/s
+stays flat as concurrency passes the pool size, requests are queueing for
+connections; size MONGO_MAX_POOL_SIZE for the requests one worker has in
+flight.
+
+Run from backend/ (mongomock-motor is needed for the memory backend):
+    python benchmarks/bench_storage.py --backends memory,mongo --pool-sizes 10,100 --concurrency 1,16,64
+    MONGO_TLS=false python benchmarks/bench_storage.py --backends mongo --compressors zlib
+"""
+import time
+import random
+import asyncio
+import argparse
+
+from bench_utils import BENCH_MONGO_URI, BENCH_DB_NAME, backend_module, use_database, seed, make_analysis, percentile
+
+BACKEND_MODULES = ("api.ai.ai", "api.read.read", "api.schema.schema")
+
+
+async def run_operation(name, operation, operations, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await operation(index)
+            latencies.append(time.perf_counter() - start)
+            if isinstance(result, dict) and result.get("success") is False:
+                raise RuntimeError(f"{name}: {result.get('error')}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(operations)))
+    elapsed = time.perf_counter() - started
+    return {
+        "ops_per_second": operations / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def bench_storage(storage, args):
+    ai_module = backend_module("api.ai.ai")
+    read_module = backend_module("api.read.read")
+    use_database(storage.db, *BACKEND_MODULES)
+    ai_module.transactions_supported = None if storage.supports_transactions else False
+
+    await storage.warm(min(args.warm, storage.describe().get("max_pool_size", 1)))
+    ssns = await seed(storage.db, args.applications, pending_ratio=args.pending_ratio)
+    application_ids = [app["application_id"] async for app in storage.db.applications.find({}, {"application_id": 1})]
+
+    json_result = make_analysis("APPROVE")
+    document = {"document_id": "0" * 24, "filename": "combined_document.pdf", "document_type": "combined_document"}
+    raw_response = "Reviewing the submitted records...\n" * 150 + "<START_OUTPUT>{}<END_OUTPUT>"
+
+    operations = {
+        "persist_application": lambda index: ai_module.persist_application(
+            json_result, document, raw_response, "Bench Applicant", random.choice(ssns)
+        ),
+        "read_application_by_id": lambda index: read_module.read_application_by_id(random.choice(application_ids)),
+        "read_all_applications": lambda index: read_module.read_all_applications(limit=50),
+        "get_filtered_applications": lambda index: read_module.get_filtered_applications(),
+    }
+
+    results = {}
+    for concurrency in args.concurrency:
+        for name, operation in operations.items():
+            count = args.operations if name != "get_filtered_applications" else max(1, args.operations // 20)
+            stats = await run_operation(name, operation, count, concurrency)
+            results[(name, concurrency)] = stats
+            print(
+                f"{storage.name:<6} pool {storage.describe().get('max_pool_size', '-')!s:>4}  c={concurrency:<4} {name:<26} "
+                f"{stats['ops_per_second']:9.1f} ops/s   p50 {stats['p50_ms']:8.2f} ms   p99 {stats['p99_ms']:8.2f} ms"
+            )
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="memory,mongo", help="comma separated: memory, mongo")
+    parser.add_argument("--pool-sizes", default="10,100", help="maxPoolSize values to try on mongo")
+    parser.add_argument("--min-pool-size", type=int, default=0)
+    parser.add_argument("--compressors", default="", help="wire compression for mongo, e.g. zstd,snappy,zlib")
+    parser.add_argument("--concurrency", default="1,16,64", help="operations in flight, comma separated")
+    parser.add_argument("--operations", type=int, default=1000, help="calls per operation and concurrency level")
+    parser.add_argument("--applications", type=int, default=5000, help="applications seeded per run")
+    parser.add_argument("--pending-ratio", type=float, default=0.02, help="share of seeded applications in the review queue")
+    parser.add_argument("--warm", type=int, default=10, help="connections opened before the first operation")
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+
+    # Loads the backend modules (and their default storage) before they are repointed
+    storage_module = backend_module("api.storage.storage")
+    backend_module("api.ai.ai")
+    backend_module("api.read.read")
+
+    for backend in args.backends.split(","):
+        backend = backend.strip()
+        if backend == "memory":
+            storages = [storage_module.create_storage("memory", db_name=BENCH_DB_NAME)]
+        else:
+            storages = [
+                storage_module.create_storage(
+                    "mongo", uri=BENCH_MONGO_URI, db_name=BENCH_DB_NAME,
+                    max_pool_size=int(size), min_pool_size=args.min_pool_size, compressors=args.compressors
+                )
+                for size in args.pool_sizes.split(",")
+            ]
+        for storage in storages:
+            try:
+                await bench_storage(storage, args)
+            finally:
+                storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Peak memory per submission for the upload pipeline, by file size.
+
+"before" is the original path: read() each upload into memory, base64 it
+with .decode(), merge the byte strings through BytesIO and store the merged
+bytes. "after" is the spooled pipeline: uploads above UPLOAD_SPOOL_BYTES are
+copied to temp files, hashed and base64-encoded from a read-only mmap, merged
+file to file and streamed into storage chunk by chunk.
+
+Both run the merge in this process so tracemalloc sees every stage (in the
+server it runs in the PDF pool). tracemalloc counts Python heap allocations;
+the mmap'd pages of spooled files are file-backed page cache and are not
+included.
+
+Run from backend/:  python benchmarks/bench_upload_memory.py [--sizes 1 10 40]
+"""
+import os
+import base64
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from io import BytesIO
+
+from starlette.datastructures import UploadFile, Headers
+from PyPDF2 import PdfWriter
+
+from bench_utils import backend_module
+
+FORM_DATA = {
+    "firstName": "John",
+    "lastName": "Doe",
+    "dateOfBirth": "1985-03-15",
+    "socialSecurityNumber": "123-45-6789",
+    "streetAddress": "123 Main Street",
+    "city": "Springfield",
+    "state": "IL",
+    "zipCode": "62701",
+}
+STORE_CHUNK = 255 * 1024
+
+
+def make_pdf(size: int) -> bytes:
+    """A one-page PDF padded to roughly `size` bytes with an embedded file."""
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    writer.add_attachment("padding.bin", os.urandom(size))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def make_upload(data: bytes, name: str) -> UploadFile:
+    """An UploadFile spooled the way Starlette's multipart parser does it."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(file=spooled, size=len(data), filename=name, headers=Headers({"content-type": "application/pdf"}))
+
+
+def drain(source):
+    """Stand-in for GridFS: consume the document one chunk at a time."""
+    while source.read(STORE_CHUNK):
+        pass
+
+
+async def before(ai_module, medical_upload, income_upload):
+    medical_bytes = await medical_upload.read()
+    income_bytes = await income_upload.read()
+    medical_base64 = base64.standard_b64encode(medical_bytes).decode("utf-8")
+    income_base64 = base64.standard_b64encode(income_bytes).decode("utf-8")
+    merged = ai_module.merge_pdfs_sync(FORM_DATA, [medical_bytes, income_bytes])
+    drain(BytesIO(merged))
+    return len(medical_base64) + len(income_base64)
+
+
+async def after(ai_module, medical_upload, income_upload):
+    uploads = backend_module("api.uploads.uploads")
+    medical = await uploads.SpooledUpload.from_upload(medical_upload, "medical.pdf")
+    income = await uploads.SpooledUpload.from_upload(income_upload, "income.pdf")
+    try:
+        ai_module.analysis_key(FORM_DATA, medical, income)
+        encoded = len(ai_module.encode_document(medical)) + len(ai_module.encode_document(income))
+
+        merged_path = None
+        if medical.spooled or income.spooled:
+            merged_fd, merged_path = tempfile.mkstemp(suffix=".pdf")
+            os.close(merged_fd)
+        merged = ai_module.merge_pdfs_sync(FORM_DATA, [medical.source(), income.source()], merged_path)
+        if merged_path:
+            with open(merged_path, "rb") as merged_file:
+                drain(merged_file)
+            os.unlink(merged_path)
+        else:
+            drain(BytesIO(merged))
+        return encoded
+    finally:
+        medical.close()
+        income.close()
+
+
+def measure(pipeline, ai_module, medical_pdf: bytes, income_pdf: bytes) -> float:
+    medical_upload = make_upload(medical_pdf, "medical.pdf")
+    income_upload = make_upload(income_pdf, "income.pdf")
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    asyncio.run(pipeline(ai_module, medical_upload, income_upload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    medical_upload.file.close()
+    income_upload.file.close()
+    return (peak - baseline) / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 40], help="medical records size in MB")
+    args = parser.parse_args()
+
+    ai_module = backend_module("api.ai.ai")
+    ai_module.load_prompt()
+    backend_module("api.ai.cover").get_cover_renderer()
+
+    print(f"{'medical + income':<20} {'before':>12} {'after':>12}")
+    for size_mb in args.sizes:
+        medical_pdf = make_pdf(size_mb * 1024 * 1024)
+        income_pdf = make_pdf(size_mb * 1024 * 1024 // 4)
+        label = f"{len(medical_pdf) / 2**20:.1f} + {len(income_pdf) / 2**20:.1f} MB"
+
+        peak_before = measure(before, ai_module, medical_pdf, income_pdf)
+        peak_after = measure(after, ai_module, medical_pdf, income_pdf)
+        print(f"{label:<20} {peak_before:9.1f} MB {peak_after:9.1f} MB   peak allocated per submission")
+
+
+if __name__ == "__main__":
+    main()
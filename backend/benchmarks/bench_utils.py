@@ -0,0 +1,213 @@
+"""
+Shared helpers for the database benchmarks: a monitored client pointed at a
+throwaway benchmark database, seed data shaped like real applications, and
+timing/percentile utilities.
+
+The benchmarks never touch the application database. Point them at a local
+mongod (or a scratch Atlas cluster) with BENCH_MONGO_URI.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import importlib
+from datetime import datetime, timezone, timedelta
+from pymongo import monitoring
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "api"))
+
+BENCH_MONGO_URI = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "claimd_bench")
+
+# connectDB refuses to import without MONGO_URI; the benchmarks swap in their
+# own database anyway, so the bench URI is good enough
+os.environ.setdefault("MONGO_URI", BENCH_MONGO_URI)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip)."""
+
+    def __init__(self):
+        self.count = 0
+        self.by_command = {}
+
+    def started(self, event):
+        self.count += 1
+        self.by_command[event.command_name] = self.by_command.get(event.command_name, 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.count = 0
+        self.by_command = {}
+
+
+def bench_database(**client_options):
+    """Return (db, counter) for the benchmark database."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(BENCH_MONGO_URI, event_listeners=[counter], **client_options)
+    return client[BENCH_DB_NAME], counter
+
+
+def backend_module(name: str):
+    """
+    Import a backend module by dotted path. The api packages re-export
+    functions with the same names as their modules, so plain attribute access
+    would return the function instead of the module.
+    """
+    importlib.import_module(name)
+    return sys.modules[name]
+
+
+def use_database(db, *module_names):
+    """Point the given backend modules at the benchmark database."""
+    for name in module_names:
+        backend_module(name).db = db
+
+
+# --------------------------------------------------------
+# Seed data
+# --------------------------------------------------------
+RECOMMENDATIONS = ["APPROVE", "REJECT", "FURTHER REVIEW"]
+
+PHASE_TEMPLATE = {
+    "status": "PASS",
+    "evaluation_complete": True,
+    "finding": "Applicant's reported earnings are below the substantial gainful activity threshold. " * 3,
+    "confidence_percent": 80,
+    "notes": "Based on the provided pay stubs and benefit statements only.",
+}
+
+
+def make_analysis(recommendation: str) -> dict:
+    """An analysis result with the same shape (and roughly the size) of a real one."""
+    return {
+        "recommendation": recommendation,
+        "confidence_level": round(random.uniform(0.4, 0.99), 2),
+        "summary": "The applicant presents with a long-standing documented impairment. " * 12,
+        "ssdi_amount": random.randint(800, 3500),
+        "assessment_type": "PRELIMINARY_MVP_SCREENING",
+        "assessment_date": "2025-10-25",
+        "personal_information": {"name": "Test Applicant", "date_of_birth": "1970-01-01", "current_age": 55},
+        "phase_1_current_work": dict(PHASE_TEMPLATE),
+        "phase_2_medical_severity": dict(PHASE_TEMPLATE, impairments=[{"diagnosis": "Lumbar degenerative disc disease"}]),
+        "phase_3_listings": dict(PHASE_TEMPLATE, listings_evaluated=[{"listing_number": "1.15"}]),
+        "phase_4_rfc": dict(PHASE_TEMPLATE, reason_cannot_assess="No work history provided"),
+        "phase_5_vocational": dict(PHASE_TEMPLATE, reason="Missing education and work history"),
+        "overall_assessment": {"reasoning": "Mixed evidence. " * 20, "key_strengths": ["Objective imaging"]},
+        "next_steps": {"action_required": "APPLY_WITH_SSA"},
+        "evidence_summary": {"available_evidence_strength": "ADEQUATE", "critical_gaps": []},
+    }
+
+
+def make_application(application_id: str, created_at: datetime, human_final: bool) -> dict:
+    """An application document in the shape save_application_to_db writes."""
+    analysis = make_analysis(random.choice(RECOMMENDATIONS))
+    raw_response = "Reviewing the submitted records...\n" * 150 + "<START_OUTPUT>" + str(analysis) + "<END_OUTPUT>"
+    return {
+        "application_id": application_id,
+        "documents": {"document_id": "0" * 24, "filename": "combined_document.pdf", "document_type": "combined_document"},
+        "claude_confidence_level": analysis["confidence_level"],
+        "claude_summary": analysis["summary"],
+        "final_decision": analysis["recommendation"],
+        "human_final": human_final,
+        "personal_information": analysis["personal_information"],
+        "assessment_type": analysis["assessment_type"],
+        "assessment_date": analysis["assessment_date"],
+        "phase_1_current_work": analysis["phase_1_current_work"],
+        "phase_2_medical_severity": analysis["phase_2_medical_severity"],
+        "phase_3_listings": analysis["phase_3_listings"],
+        "phase_4_rfc": analysis["phase_4_rfc"],
+        "phase_5_vocational": analysis["phase_5_vocational"],
+        "overall_assessment": analysis["overall_assessment"],
+        "next_steps": analysis["next_steps"],
+        "evidence_summary": analysis["evidence_summary"],
+        "created_at": created_at,
+        "raw_claude_response": raw_response,
+        "full_analysis": analysis,
+    }
+
+
+async def seed(db, applications: int, apps_per_user: int = 4, pending_ratio: float = 0.3, batch_size: int = 2000):
+    """
+    Drop and refill the users/applications collections of the benchmark
+    database. Returns the list of seeded user SSNs.
+    """
+    await db.users.drop()
+    await db.applications.drop()
+
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    ssns = []
+    app_batch, user_batch = [], []
+    user_apps = []
+
+    for index in range(applications):
+        application_id = str(uuid.uuid4())
+        created_at = start + timedelta(seconds=index * 30)
+        app_batch.append(make_application(application_id, created_at, random.random() >= pending_ratio))
+        user_apps.append(application_id)
+
+        if len(user_apps) == apps_per_user or index == applications - 1:
+            ssn = f"{len(ssns):09d}"
+            ssns.append(ssn)
+            user_batch.append({
+                "user_id": str(uuid.uuid4()),
+                "name": f"Applicant {len(ssns)}",
+                "socialSecurityNumber": ssn,
+                "applications": user_apps,
+                "created_at": created_at,
+            })
+            user_apps = []
+
+        if len(app_batch) >= batch_size:
+            await db.applications.insert_many(app_batch, ordered=False)
+            app_batch = []
+        if len(user_batch) >= batch_size:
+            await db.users.insert_many(user_batch, ordered=False)
+            user_batch = []
+
+    if app_batch:
+        await db.applications.insert_many(app_batch, ordered=False)
+    if user_batch:
+        await db.users.insert_many(user_batch, ordered=False)
+
+    print(f"Seeded {applications} applications for {len(ssns)} users into {BENCH_DB_NAME}")
+    return ssns
+
+
+# --------------------------------------------------------
+# Timing
+# --------------------------------------------------------
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def timed(coro_factory, runs: int = 5):
+    """Await coro_factory() `runs` times; returns (last result, list of seconds)."""
+    samples = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await coro_factory()
+        samples.append(time.perf_counter() - start)
+    return result, samples
+
+
+def report(name: str, samples: list, round_trips: int = None):
+    line = f"{name:<28} p50 {percentile(samples, 50) * 1000:9.1f} ms   p99 {percentile(samples, 99) * 1000:9.1f} ms"
+    if round_trips is not None:
+        line += f"   round trips {round_trips}"
+    print(line)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Run the backend for load tests, against a local mongod or an in-memory
+store. bench_load.py starts this in a subprocess; the model endpoint comes
+from ANTHROPIC_BASE_URL (the stub model server).
+
+--store mongod uses BENCH_MONGO_URI (set MONGO_TLS=false for a local
+mongod without TLS) and the BENCH_DB_NAME database. --store memory runs
+the backend with STORAGE_BACKEND=memory (see api/storage), which has no
+transactions, change streams or GridFS: the backend writes without
+transactions, /api/events polls, and PDFs are kept whole in the legacy
+`documents` collection.
+
+Run from backend/:  python benchmarks/serve_app.py [--store memory] [--port 8000]
+"""
+import os
+import argparse
+
+import uvicorn
+
+from bench_utils import BENCH_MONGO_URI, BENCH_DB_NAME, backend_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", choices=["mongod", "memory"], default="mongod")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    os.environ["MONGO_URI"] = BENCH_MONGO_URI
+    os.environ["MONGO_DB_NAME"] = BENCH_DB_NAME
+    os.environ["STORAGE_BACKEND"] = "memory" if args.store == "memory" else "mongo"
+
+    main_module = backend_module("main")
+    uvicorn.run(main_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
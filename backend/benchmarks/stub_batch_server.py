@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the provider's message batch API, for running
+ingest_backlog.py without an API key or real model calls.
+
+Implements create, retrieve and results of /v1/messages/batches. A batch
+stays "in_progress" for --processing-seconds, then every request has a
+result: a canned analysis in the output tags (see bench_utils.make_analysis),
+or, for the --error-rate / --expire-rate fraction of requests, an errored
+or expired result so the failure and requeue paths can be exercised.
+
+Run from backend/:
+    python benchmarks/stub_batch_server.py [--port 8787] [--processing-seconds 5]
+    python ingest_backlog.py local_storage --base-url http://127.0.0.1:8787 --poll-interval 1
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+
+from bench_utils import make_analysis, RECOMMENDATIONS
+
+app = FastAPI()
+batches = {}
+settings = {"processing_seconds": 5.0, "error_rate": 0.0, "expire_rate": 0.0}
+
+
+def timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def batch_view(batch: dict, base_url: str) -> dict:
+    ended = time.time() >= batch["ends_at"]
+    counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+    if ended:
+        for result in batch["results"]:
+            counts[result["result"]["type"]] += 1
+    else:
+        counts["processing"] = len(batch["results"])
+
+    return {
+        "id": batch["id"],
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": counts,
+        "created_at": timestamp(batch["created_at"]),
+        "expires_at": timestamp(batch["created_at"] + 86400),
+        "ended_at": timestamp(batch["ends_at"]) if ended else None,
+        "archived_at": None,
+        "cancel_initiated_at": None,
+        "results_url": f"{base_url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+    }
+
+
+def make_result(custom_id: str, model: str) -> dict:
+    roll = random.random()
+    if roll < settings["error_rate"]:
+        result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "Stub error"}}}
+    elif roll < settings["error_rate"] + settings["expire_rate"]:
+        result = {"type": "expired"}
+    else:
+        analysis = dict(make_analysis(random.choice(RECOMMENDATIONS)))
+        text = "Reviewing the submitted records...\n<START_OUTPUT>" + json.dumps(analysis) + "<END_OUTPUT>"
+        result = {
+            "type": "succeeded",
+            "message": {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": 1000, "output_tokens": len(text) // 4},
+            },
+        }
+    return {"custom_id": custom_id, "result": result}
+
+
+@app.post("/v1/messages/batches")
+async def create_batch(request: Request):
+    body = await request.json()
+    requests = body.get("requests") or []
+    if not requests:
+        raise HTTPException(status_code=400, detail="requests must not be empty")
+
+    now = time.time()
+    batch = {
+        "id": f"msgbatch_{uuid.uuid4().hex}",
+        "created_at": now,
+        "ends_at": now + settings["processing_seconds"],
+        "results": [make_result(item["custom_id"], item["params"].get("model", "stub")) for item in requests],
+    }
+    batches[batch["id"]] = batch
+    print(f"📝 {batch['id']}: {len(requests)} requests")
+    return batch_view(batch, str(request.base_url).rstrip("/"))
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_batch(batch_id: str, request: Request):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="batch not found")
+    return batch_view(batches[batch_id], str(request.base_url).rstrip("/"))
+
+
+@app.get("/v1/messages/batches/{batch_id}/results")
+async def batch_results(batch_id: str):
+    batch = batches.get(batch_id)
+    if batch is None or time.time() < batch["ends_at"]:
+        raise HTTPException(status_code=404, detail="results not available")
+    # Like the real API, results are not in request order
+    results = list(batch["results"])
+    random.shuffle(results)
+    body = "".join(json.dumps(result) + "\n" for result in results)
+    return Response(content=body, media_type="application/binary")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--processing-seconds", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--expire-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings.update(processing_seconds=args.processing_seconds, error_rate=args.error_rate, expire_rate=args.expire_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
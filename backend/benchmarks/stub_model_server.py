@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Messages API that replays recorded model responses,
+for load tests that must not depend on an API key or the real model.
+
+POST /v1/messages answers with one of the recorded `raw_claude_response`
+texts, streamed as server-sent events in the provider's format. Pacing
+follows the real service: a time to first token that grows with the input
+size, then --tokens-per-second output tokens (about 4 characters each).
+
+Responses come from a JSONL file with one {"raw_claude_response": "..."}
+per line. --record writes such a file from the transcripts of an existing
+database (MONGO_URI / MONGO_DB_NAME); without --responses, synthetic
+responses shaped like real ones are used.
+
+Run from backend/:
+    python benchmarks/stub_model_server.py [--port 8788] [--responses responses.jsonl]
+    python benchmarks/stub_model_server.py --record responses.jsonl --limit 200
+"""
+import json
+import uuid
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+
+from bench_utils import make_analysis, RECOMMENDATIONS
+
+CHARS_PER_TOKEN = 4
+
+app = FastAPI()
+settings = {
+    "responses": [],
+    "ttft_seconds": 0.8,
+    "prefill_tokens_per_second": 20000.0,
+    "tokens_per_second": 80.0,
+    "tokens_per_event": 4,
+}
+
+
+def synthetic_responses(count: int = 20) -> list:
+    """Responses with the size and shape of real ones: reasoning text, then the tagged JSON."""
+    return [
+        "Reviewing the submitted records...\n" * random.randint(40, 160)
+        + "<START_OUTPUT>\n" + json.dumps(make_analysis(random.choice(RECOMMENDATIONS)), indent=2) + "\n<END_OUTPUT>"
+        for _ in range(count)
+    ]
+
+
+def load_responses(path: str) -> list:
+    responses = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                responses.append(json.loads(line)["raw_claude_response"])
+    return responses
+
+
+async def record_responses(path: str, limit: int) -> int:
+    """Write the transcripts stored in the database to a responses file."""
+    from bench_utils import backend_module
+
+    schema = backend_module("api.schema.schema")
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        async for transcript in schema.db.application_transcripts.find({}, {"application_id": 1}).limit(limit):
+            raw = await schema.load_transcript(transcript["application_id"])
+            if raw and "<START_OUTPUT>" in raw:
+                f.write(json.dumps({"raw_claude_response": raw}) + "\n")
+                count += 1
+    return count
+
+
+def input_tokens(body: dict) -> int:
+    tokens = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) else content
+        for block in blocks:
+            if block.get("type") == "text":
+                tokens += len(block["text"]) // CHARS_PER_TOKEN
+            elif block.get("type") == "document":
+                # base64 is 4/3 the size of the document
+                tokens += len(block.get("source", {}).get("data", "")) * 3 // 4 // CHARS_PER_TOKEN
+    return tokens
+
+
+def sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def stream_response(body: dict, text: str, prompt_tokens: int):
+    message_id = f"msg_{uuid.uuid4().hex}"
+    output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+    yield sse("message_start", {"type": "message_start", "message": {
+        "id": message_id, "type": "message", "role": "assistant", "model": body.get("model", "stub"),
+        "content": [], "stop_reason": None, "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": 1},
+    }})
+    await asyncio.sleep(settings["ttft_seconds"] + prompt_tokens / settings["prefill_tokens_per_second"])
+
+    yield sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+    step = settings["tokens_per_event"] * CHARS_PER_TOKEN
+    delay = settings["tokens_per_event"] / settings["tokens_per_second"]
+    for offset in range(0, len(text), step):
+        yield sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": text[offset:offset + step]}})
+        await asyncio.sleep(delay)
+    yield sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": output_tokens}})
+    yield sse("message_stop", {"type": "message_stop"})
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    text = random.choice(settings["responses"])
+    prompt_tokens = input_tokens(body)
+
+    if body.get("stream"):
+        return StreamingResponse(stream_response(body, text, prompt_tokens), media_type="text/event-stream")
+
+    await asyncio.sleep(settings["ttft_seconds"] + prompt_tokens / settings["prefill_tokens_per_second"]
+                        + len(text) / CHARS_PER_TOKEN / settings["tokens_per_second"])
+    return JSONResponse({
+        "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": body.get("model", "stub"),
+        "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+        "usage": {"input_tokens": prompt_tokens, "output_tokens": len(text) // CHARS_PER_TOKEN},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--responses", help="JSONL file of recorded responses")
+    parser.add_argument("--ttft-ms", type=float, default=800, help="time to first token before prefill")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000)
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="output pacing")
+    parser.add_argument("--record", metavar="PATH", help="write the stored transcripts to PATH and exit")
+    parser.add_argument("--limit", type=int, default=200, help="transcripts to record")
+    args = parser.parse_args()
+
+    if args.record:
+        count = asyncio.run(record_responses(args.record, args.limit))
+        print(f"✅ Recorded {count} responses to {args.record}")
+        return
+
+    settings.update(
+        responses=load_responses(args.responses) if args.responses else synthetic_responses(),
+        ttft_seconds=args.ttft_ms / 1000,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+    )
+    print(f"📝 Replaying {len(settings['responses'])} responses at {args.tokens_per_second:g} tokens/s")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# import_legacy.py -- Load the file-based intake archive (local_storage) into MongoDB
+# Groups the metadata JSON and PDFs by upload timestamp into claims, merges
+# each claim's PDFs into one GridFS document and inserts the applications
+# and user links in batches. Claims already imported are skipped, so the
+# import can be re-run after an interruption.
+#
+#   python import_legacy.py [local_storage] [--batch-size 100] [--workers 4] [--dry-run]
+
+import asyncio
+import argparse
+from api.ai.ai import shutdown_pdf_pool
+from api.indexes.indexes import ensure_indexes
+from api.legacy.legacy import import_legacy, LEGACY_IMPORT_BATCH_SIZE, LEGACY_IMPORT_WORKERS
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import the legacy local_storage archive")
+    parser.add_argument("root", nargs="?", default="local_storage")
+    parser.add_argument("--batch-size", type=int, default=LEGACY_IMPORT_BATCH_SIZE, help="applications per insert_many")
+    parser.add_argument("--workers", type=int, default=LEGACY_IMPORT_WORKERS, help="claims merged and stored at once")
+    parser.add_argument("--dry-run", action="store_true", help="list the claims that would be imported")
+    args = parser.parse_args()
+
+    # The unique legacy_id index is what makes repeated imports idempotent
+    await ensure_indexes()
+    try:
+        summary = await import_legacy(args.root, args.batch_size, args.workers, args.dry_run)
+    finally:
+        shutdown_pdf_pool()
+
+    print(f"✅ {summary['claims']} claims: {summary['imported']} imported, {summary['already_imported']} already imported, "
+          f"{summary['failed']} failed, {summary['incomplete']} incomplete submissions skipped")
+    if "claims_per_second" in summary:
+        print(f"⏱️ {summary['seconds']} s, {summary['claims_per_second']} claims/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
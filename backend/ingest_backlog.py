@@ -0,0 +1,52 @@
+# ingest_backlog.py -- Analyze a backlog of claim packets through the message batch API
+# Finds every form_submission_*.json (plus the PDFs it lists) under a
+# directory, submits the analyses as message batches, waits for them and
+# saves the results like interactive submissions. Re-run the same command
+# to resume after an interruption; saved packets are skipped.
+#
+#   python ingest_backlog.py local_storage [--batch-size 1000] [--poll-interval 60]
+#   python ingest_backlog.py packets/ --base-url http://127.0.0.1:8787   (stub batch server)
+
+import os
+import asyncio
+import argparse
+import anthropic
+from api.ai.ai import get_client, shutdown_pdf_pool
+from api.indexes.indexes import ensure_indexes
+from api.backlog.backlog import (
+    ingest_backlog, BACKLOG_BATCH_SIZE, BACKLOG_BATCH_MAX_BYTES, BACKLOG_POLL_INTERVAL, BACKLOG_SAVE_CONCURRENCY
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory of claim packets through the message batch API")
+    parser.add_argument("directory", help="directory holding form_submission_*.json files and their PDFs")
+    parser.add_argument("--batch-size", type=int, default=BACKLOG_BATCH_SIZE, help="requests per batch")
+    parser.add_argument("--max-batch-bytes", type=int, default=BACKLOG_BATCH_MAX_BYTES, help="request data per batch")
+    parser.add_argument("--poll-interval", type=float, default=BACKLOG_POLL_INTERVAL, help="seconds between status checks")
+    parser.add_argument("--concurrency", type=int, default=BACKLOG_SAVE_CONCURRENCY, help="claims saved at once")
+    parser.add_argument("--retry-failed", action="store_true", help="submit packets that failed in an earlier run again")
+    parser.add_argument("--base-url", help="batch API base URL, e.g. a local stub batch server")
+    args = parser.parse_args()
+
+    if args.base_url:
+        batch_client = anthropic.AsyncAnthropic(api_key=os.getenv("CLAUDE_API_KEY") or "stub", base_url=args.base_url)
+    else:
+        batch_client = get_client()
+
+    await ensure_indexes()
+    try:
+        counts = await ingest_backlog(
+            batch_client, args.directory, args.batch_size, args.max_batch_bytes,
+            args.poll_interval, args.concurrency, args.retry_failed
+        )
+    finally:
+        shutdown_pdf_pool()
+
+    print("✅ Backlog: " + ", ".join(f"{count} {status}" for status, count in counts.items() if count))
+    if counts["failed"]:
+        print("⚠️ Failed packets are listed in the backlog_packets collection; re-run with --retry-failed to submit them again")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,13 +2,25 @@
 # main.py -- Main Program for Backend
 
 # Import Separate Files
-from api.ai.ai import ai
-from api.read.read import read, read_application_by_id, read_all_applications, read_applications_by_user_ssn, update_application_status, read_all_users, get_filtered_applications, approve_application, deny_application
+from api.ai.ai import ai, shutdown_pdf_pool, get_client
+from api.read.read import stream_read, read_application_by_id, read_application_transcript, read_all_applications, read_applications_by_user_ssn, update_application_status, read_all_users, get_filtered_applications, approve_application, deny_application, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.documents.documents import open_document, parse_range
+from api.indexes.indexes import ensure_indexes
+from api.cache.cache import response_cache, application_tag, APPLICATIONS_TAG, QUEUE_TAG, USERS_TAG
+from api.events.events import application_events, submission_events, event_hub
+from api.uploads.uploads import inspect_upload, UploadRejected, UploadLimitMiddleware
+from api.jobs.jobs import enqueue_job, get_job_status, start_workers, stop_workers, JOB_WORKERS
+from api.metrics.metrics import render as render_metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from connectDB import open_storage, close_storage
 
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import Modules
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Header
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import uvicorn
 from pydantic import BaseModel
 from typing import Any, Dict
@@ -28,19 +40,75 @@ class WriteResponse(BaseModel):
     recommendation: str
     ssdi_amount: float
 
-app = FastAPI()
+# Open the database connections (MONGO_WARM_CONNECTIONS of them, so the
+# first requests do not each pay for a connection), make sure the MongoDB
+# indexes exist (ENSURE_INDEXES=false to leave that to manage_indexes.py),
+# then start the background job workers for async-mode submissions
+# (JOB_WORKERS=0 when running them with worker.py). The model SDK is loaded
+# in a thread meanwhile, so the worker serves reads without waiting for it.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_client = asyncio.get_running_loop().run_in_executor(None, get_client)
+    await open_storage()
+    if os.getenv("ENSURE_INDEXES", "true").lower() != "false":
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            print(f"⚠️ Could not ensure indexes: {e}")
+    if JOB_WORKERS > 0:
+        start_workers(JOB_WORKERS)
+    try:
+        yield
+    finally:
+        await stop_workers()
+        await event_hub.stop()
+        shutdown_pdf_pool()
+        await asyncio.gather(model_client, return_exceptions=True)
+        close_storage()
+
+app = FastAPI(lifespan=lifespan)
 
+# 413 for submissions over UPLOAD_BODY_MAX_BYTES before the form is parsed
+# (added first so the CORS headers still wrap the 413)
+app.add_middleware(UploadLimitMiddleware, paths=("/api/benefit-application",))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the stage timings
+    expose_headers=["Server-Timing"],
 )
+# Requests in flight, per-route latency and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+def application_summary(form_data: dict, result: dict) -> dict:
+    """Response body for a processed submission"""
+    return {
+        "success": True,
+        "message": "Application processed successfully",
+        "application_id": result.get("application_id"),
+        "cached": result.get("cached", False),
+        "analysis": result.get("result", {}),
+        "applicant": {
+            "name": f"{form_data['firstName']} {form_data['lastName']}",
+            "ssn": form_data["socialSecurityNumber"]
+        }
+    }
 
 # REQUEST: MultiStepForm data with file uploads
 # RESPONSE: Processing results with MongoDB document IDs
 # FUNCTIONALITY: Process form data and upload to MongoDB with ordered fields
+#                With ?mode=async the upload is queued and a 202 with a job id
+#                is returned immediately; poll /api/jobs/{job_id} for the result.
+#                With ?mode=stream the response is a text/event-stream of stage
+#                events (upload_received, analysis_started, first_tokens,
+#                phase_completed, documents_stored, application_saved) ending
+#                in "complete" with the usual body, or "error".
+#                A resubmission of identical files and form data returns the
+#                earlier application ("cached": true); ?fresh=true forces a new
+#                analysis.
 @app.post("/api/benefit-application")
 async def handle_benefit_application(
     firstName: str = Form(...),
@@ -52,7 +120,9 @@ async def handle_benefit_application(
     zipCode: str = Form(...),
     socialSecurityNumber: str = Form(...),
     medicalRecordsFile: UploadFile = File(None),
-    incomeDocumentsFile: UploadFile = File(None)
+    incomeDocumentsFile: UploadFile = File(None),
+    mode: str = Query("sync"),
+    fresh: bool = Query(False)
 ):
     try:
         form_data = {
@@ -66,11 +136,42 @@ async def handle_benefit_application(
             "socialSecurityNumber": socialSecurityNumber,
         }
         
+        # Reject missing, oversized or non-PDF files before processing them
+        try:
+            await inspect_upload(medicalRecordsFile, "medicalRecordsFile")
+            await inspect_upload(incomeDocumentsFile, "incomeDocumentsFile")
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+        
+        if mode == "async":
+            job_id = await enqueue_job(form_data, medicalRecordsFile, incomeDocumentsFile, use_cache=not fresh)
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "success": True,
+                    "message": "Application queued for processing",
+                    "job_id": job_id,
+                    "status": "queued",
+                    "status_url": f"/api/jobs/{job_id}"
+                }
+            )
+        
+        if mode == "stream":
+            return StreamingResponse(
+                submission_events(
+                    lambda progress: ai(form_data, medicalRecordsFile, incomeDocumentsFile, progress, use_cache=not fresh),
+                    lambda result: application_summary(form_data, result)
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
         # Call AI function
         result = await ai(
             form_data,
             medicalRecordsFile,
-            incomeDocumentsFile
+            incomeDocumentsFile,
+            use_cache=not fresh
         )
         
         # Check if AI processing was successful
@@ -78,20 +179,7 @@ async def handle_benefit_application(
             error_msg = result.get("error", "Unknown error") if result else "No response from AI"
             raise HTTPException(status_code=500, detail=error_msg)
         
-        # Extract the JSON result from AI analysis
-        json_result = result.get("result", {})
-        application_id = result.get("application_id")
-        
-        return {
-            "success": True,
-            "message": "Application processed successfully",
-            "application_id": application_id,
-            "analysis": json_result,
-            "applicant": {
-                "name": f"{firstName} {lastName}",
-                "ssn": socialSecurityNumber
-            }
-        }
+        return application_summary(form_data, result)
             
     except HTTPException:
         raise
@@ -99,35 +187,61 @@ async def handle_benefit_application(
         print(f"Error in benefit application endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# REQUEST: Job ID returned by an async-mode submission
+# RESPONSE: Job status (queued/running/done/failed) and result when done
+# FUNCTIONALITY: Poll background processing of a submission
+@app.get("/api/jobs/{job_id}")
+async def getJobStatus(job_id: str):
+    result = await get_job_status(job_id)
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("error", "Job not found"))
+    
+    return ReadResponse(data=result)
+
 # REQUEST: SSN to look up
-# RESPONSE: Data from database
+# RESPONSE: Data from database, streamed as one chunked JSON document
 # FUNCTIONALITY: Read existing application data
-@app.post("/api/read", response_model=ReadResponse)
+@app.post("/api/read")
 async def mainRead():
-    result = await read()
-    
-    return ReadResponse(data=result)
+    return StreamingResponse(stream_read(), media_type="application/json")
 
-# REQUEST: Get all applications for admin dashboard
-# RESPONSE: All applications from database
-# FUNCTIONALITY: Read all applications for admin dashboard
+# REQUEST: Page size, cursor from the previous page, optional fields list
+# RESPONSE: One page of applications (list-view columns by default) and next_cursor
+# FUNCTIONALITY: Read applications for admin dashboard, newest first
 @app.get("/api/applications")
-async def getAllApplications():
-    result = await read_all_applications()
-    return ReadResponse(data=result)
+async def getAllApplications(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str = Query(None),
+    fields: str = Query(None)
+):
+    body, result = await response_cache.get_or_load(
+        ("applications", limit, after, fields),
+        [APPLICATIONS_TAG],
+        lambda: read_all_applications(limit, after, fields)
+    )
+    
+    if body is None:
+        raise HTTPException(status_code=400, detail=result.get("error", "Failed to read applications"))
+    
+    return Response(content=body, media_type="application/json")
 
 # REQUEST: Get all users for debugging
 # RESPONSE: All users from database
 # FUNCTIONALITY: Debug endpoint to see all users
 @app.get("/api/users/all")
 async def getAllUsers():
-    result = await read_all_users()
-    return result
+    body, result = await response_cache.get_or_load(("users",), [USERS_TAG], read_all_users, envelope=False)
+    if body is None:
+        return result
+    return Response(content=body, media_type="application/json")
 
 @app.get("/api/users/filtered")
 async def getFilteredApplications():
-    result = await get_filtered_applications()
-    return result
+    body, result = await response_cache.get_or_load(("queue",), [QUEUE_TAG], get_filtered_applications, envelope=False)
+    if body is None:
+        return result
+    return Response(content=body, media_type="application/json")
 
 @app.put("/api/application/approve/{application_id}")
 async def approveApplication(application_id: str):
@@ -164,13 +278,96 @@ async def getUserApplications(ssn: str):
 # FUNCTIONALITY: Read a single application by ID
 @app.get("/api/application/{application_id}")
 async def getApplicationById(application_id: str):
-    result = await read_application_by_id(application_id)
+    body, result = await response_cache.get_or_load(
+        ("application", application_id),
+        [application_tag(application_id)],
+        lambda: read_application_by_id(application_id)
+    )
     
-    if not result.get("success"):
+    if body is None:
         raise HTTPException(status_code=404, detail=result.get("error", "Application not found"))
     
+    return Response(content=body, media_type="application/json")
+
+# REQUEST: Application ID to look up
+# RESPONSE: Raw model output stored for the application
+# FUNCTIONALITY: Load the transcript from cold storage on request
+@app.get("/api/application/{application_id}/transcript")
+async def getApplicationTranscript(application_id: str):
+    result = await read_application_transcript(application_id)
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=404, detail=result.get("error", "Transcript not found"))
+    
     return ReadResponse(data=result)
 
+# REQUEST: Document ID (from an application's document_url), optional Range header
+# RESPONSE: The PDF, streamed in chunks (206 Partial Content for ranges)
+# FUNCTIONALITY: Serve stored PDFs without loading them into memory
+@app.get("/api/document/{document_id}")
+async def getDocument(document_id: str, range: str = Header(None)):
+    document = await open_document(document_id)
+    
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No document found with ID {document_id}")
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'inline; filename="{document.filename}"'
+    }
+    
+    try:
+        byte_range = parse_range(range, document.length)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{document.length}"})
+    
+    if document.length == 0:
+        return Response(content=b"", media_type=document.content_type, headers=headers)
+    
+    if byte_range is None:
+        start, end = 0, document.length - 1
+        status_code = 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{document.length}"
+    
+    headers["Content-Length"] = str(end - start + 1)
+    
+    return StreamingResponse(
+        document.iter_range(start, end),
+        status_code=status_code,
+        media_type=document.content_type,
+        headers=headers
+    )
+
+# REQUEST: Optional Last-Event-ID header (sent by EventSource on reconnect)
+# RESPONSE: text/event-stream of application.created / application.updated events
+# FUNCTIONALITY: Push reviewer queue changes instead of having dashboards poll
+@app.get("/api/events")
+async def getApplicationEvents(last_event_id: str = Header(None)):
+    return StreamingResponse(
+        application_events(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# REQUEST: None
+# RESPONSE: Hit/miss/eviction counters of the admin read cache
+# FUNCTIONALITY: Monitor the read cache
+@app.get("/api/cache/stats")
+async def getCacheStats():
+    return ReadResponse(data=response_cache.snapshot())
+
+# REQUEST: None
+# RESPONSE: Prometheus text format
+# FUNCTIONALITY: Per-stage submission latency, MongoDB time per admin read,
+#                request latency per route, and in-flight and queue gauges
+#                (for this worker process)
+@app.get("/metrics")
+async def getMetrics():
+    return Response(content=await render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # REQUEST: Application ID and status to update
 # RESPONSE: Success/failure message
 # FUNCTIONALITY: Update application status (approve/deny)
@@ -0,0 +1,40 @@
+# manage_indexes.py -- Create the MongoDB indexes and check the hot query plans
+#
+#   python manage_indexes.py            create missing indexes
+#   python manage_indexes.py --force    re-apply every index definition
+#   python manage_indexes.py --explain  also print query plans; exits 1 on COLLSCAN
+
+import sys
+import asyncio
+import argparse
+from api.indexes.indexes import ensure_indexes, explain_hot_queries, INDEX_VERSION
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manage MongoDB indexes")
+    parser.add_argument("--force", action="store_true", help="re-apply all index definitions")
+    parser.add_argument("--explain", action="store_true", help="report explain() plans for the hot queries")
+    args = parser.parse_args()
+
+    result = await ensure_indexes(force=args.force)
+    print(f"Index version: {result['version']} (latest {INDEX_VERSION})")
+    for name in result["created"]:
+        print(f"   ensured {name}")
+    for error in result["errors"]:
+        print(f"❌ {error['index']}: {error['error']}")
+
+    exit_code = 0 if result["success"] else 1
+
+    if args.explain:
+        print("\nQuery plans:")
+        for plan in await explain_hot_queries():
+            marker = "❌ COLLSCAN" if plan["collscan"] else "✅"
+            print(f"   {marker:<11} {plan['query']:<30} {' > '.join(plan['stages'])}")
+            if plan["collscan"]:
+                exit_code = 1
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,23 @@
+# migrate_schema.py -- Convert stored applications to the compact schema
+# Moves raw model transcripts into application_transcripts (compressed) and
+# drops the duplicated full_analysis copy. Safe to run more than once.
+#
+#   python migrate_schema.py [--batch-size 500] [--dry-run]
+
+import asyncio
+import argparse
+from api.schema.schema import migrate_applications, SCHEMA_VERSION
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migrate applications to the compact schema")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    migrated = await migrate_applications(args.batch_size, args.dry_run)
+    print(f"✅ {migrated} applications {'need' if args.dry_run else 'moved'} to schema version {SCHEMA_VERSION}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
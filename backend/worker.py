@@ -0,0 +1,28 @@
+# worker.py -- Standalone job worker
+# Runs the background job pool without the HTTP server, so queued
+# /api/benefit-application?mode=async submissions can be processed by
+# dedicated processes: `python worker.py`
+
+import asyncio
+from api.ai.ai import shutdown_pdf_pool
+from api.jobs.jobs import start_workers, stop_workers, JOB_WORKERS
+from connectDB import open_storage, close_storage
+
+
+async def main():
+    await open_storage()
+    start_workers(JOB_WORKERS)
+    try:
+        # Run until interrupted
+        await asyncio.Event().wait()
+    finally:
+        await stop_workers()
+        shutdown_pdf_pool()
+        close_storage()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("👋 Job worker stopped")
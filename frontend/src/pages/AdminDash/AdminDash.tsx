@@ -38,9 +38,9 @@ export default function AdminDash() {
   const [filterRecommendation, setFilterRecommendation] = useState<string>('all');
 
   useEffect(() => {
-    const fetchApplications = async () => {
+    const fetchApplications = async (showLoading = true) => {
       try {
-        setLoading(true);
+        if (showLoading) setLoading(true);
         
         // Fetch filtered applications (human_final = False)
         const response = await fetch('http://localhost:8000/api/users/filtered', {
@@ -98,6 +98,20 @@ export default function AdminDash() {
     };
 
     fetchApplications();
+
+    // Live queue updates: decided applications drop out, new ones trigger a refetch
+    const events = new EventSource('http://localhost:8000/api/events');
+    events.addEventListener('application.created', () => {
+      fetchApplications(false);
+    });
+    events.addEventListener('application.updated', (event) => {
+      const change = JSON.parse((event as MessageEvent).data);
+      if (change.human_final) {
+        setApplications(current => current.filter(app => app.application_id !== change.application_id));
+      }
+    });
+
+    return () => events.close();
   }, []);
 
   const getRecommendationColor = (recommendation: string) => {
@@ -36,6 +36,12 @@ export default function ApplicationDetail() {
         const data = await api.getApplicationById(applicationId);
         setApplication(data);
 
+        // Stream the PDF from the backend when it has a document URL
+        if (data?.document_url) {
+          setPdfSrc(data.document_url);
+          return;
+        }
+
         let base64: string | null = null;
         const doc = data.document;
 
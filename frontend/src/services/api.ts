@@ -2,6 +2,7 @@
 export interface Application {
   application_id: string;
   document: string;
+  document_url?: string;
   claude_confidence_level: number;
   claude_summary: string;
   claude_recommendation: 'approve' | 'deny' | 'further_review';
@@ -186,6 +187,7 @@ export const api = {
         return {
           application_id: app.application_id,
           document: app.document,
+          document_url: app.document_url ? `http://localhost:8000${app.document_url}` : undefined,
           claude_confidence_level: app.claude_confidence_level,
           claude_summary: app.claude_summary,
           claude_recommendation: recommendation,
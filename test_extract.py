@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for the document pre-stage (backend/api/ai/extract.py): pages
+that carry evidence must reach the model, only empty pages are dropped
+"""
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from api.ai.extract import prepare_documents
+
+
+def make_pdf(*pages):
+    """One PDF page per drawing function, each called with a reportlab canvas"""
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for draw in pages:
+        draw(pdf)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def short_text(pdf):
+    pdf.drawString(72, 720, "Diagnosis: ALS, stage 3")
+
+
+def vector_drawing(pdf):
+    # A hand-drawn chart: lines and a filled bar, no text and no images
+    pdf.line(72, 500, 400, 500)
+    pdf.line(72, 500, 72, 700)
+    pdf.rect(100, 500, 40, 150, fill=1)
+
+
+def blank(pdf):
+    pass
+
+
+def test_short_text_page_is_sent_as_text():
+    result = prepare_documents([("medical_records.pdf", make_pdf(short_text, blank))])
+
+    assert result["stats"]["text_pages"] == 1
+    assert result["stats"]["blank_pages"] == 1
+    texts = [data for kind, data in result["blocks"] if kind == "text"]
+    assert len(texts) == 1 and "Diagnosis: ALS, stage 3" in texts[0]
+
+
+def test_vector_only_page_is_sent_as_pdf():
+    result = prepare_documents([("medical_records.pdf", make_pdf(vector_drawing))])
+
+    assert result["blocks"], "a drawn page must reach the model"
+    assert result["stats"]["blank_pages"] == 0
+    assert result["stats"]["scanned_pages"] == 1
+
+
+def test_all_blank_file_is_sent_unchanged():
+    result = prepare_documents([("medical_records.pdf", make_pdf(blank, blank))])
+
+    assert result["blocks"] == [("original", 0)]
+
+
+if __name__ == "__main__":
+    for test in (test_short_text_page_is_sent_as_text, test_vector_only_page_is_sent_as_pdf, test_all_blank_file_is_sent_unchanged):
+        test()
+        print(f"✅ {test.__name__}")